@@ -1,5 +1,10 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -8,13 +13,20 @@ from fastapi.security import OAuth2PasswordBearer
 # Configuración
 SECRET_KEY = "tu_clave_secreta"  # Cambiar en producción
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Cada cuántas horas se eliminan los tokens de refresco vencidos (0 = nunca, ver main.py)
+REFRESH_TOKEN_PURGE_INTERVAL_HOURS = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_HOURS", "24"))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 # Actualizar la configuración de CryptContext
+# min_rounds hace que verify_and_update marque para rehash los hashes con menos rondas
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12  # Añadir esta configuración específica
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
 )
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -22,12 +34,49 @@ def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    print("Password raw:", repr(password))
-    print("Password bytes length:", len(password.encode('utf-8')))
-    print("Password type:", type(password))
-    print("Password value:", password)
     return pwd_context.hash(password)
 
+# --- Pool de hashing ---
+# bcrypt es costoso en CPU; se ejecuta en un pool de hilos acotado (bcrypt libera
+# el GIL) para no ocupar el event loop ni el threadpool de las demás rutas.
+# Si hay más operaciones pendientes que hilos + cola, se rechaza de inmediato.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "16"))
+
+class PasswordHasherBusy(Exception):
+    """No hay capacidad en el pool de hashing para aceptar otra operación."""
+
+class PasswordHasherPool:
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        # Solo se modifica desde el event loop, no necesita lock
+        if self.pending >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+password_pool = PasswordHasherPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_DEPTH)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(pwd_context.hash, password)
+
+async def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña en el pool. Si el hash usa parámetros obsoletos
+    según pwd_context, devuelve también el hash nuevo para guardarlo.
+    """
+    return await password_pool.run(pwd_context.verify_and_update, password, hashed_password)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -35,6 +84,17 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def generate_refresh_token() -> str:
+    """Token de refresco aleatorio y opaco; en la base de datos solo se guarda su hash."""
+    return secrets.token_urlsafe(48)
+
+def hash_refresh_token(token: str) -> str:
+    # Basta con SHA-256: el token tiene 384 bits aleatorios, no hace falta bcrypt
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def refresh_token_expiration() -> datetime:
+    return datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
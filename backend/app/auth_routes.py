@@ -1,29 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import crud, schemas
-from app.deps import get_db
-from app.auth import create_access_token
+import time
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud_async, schemas
+from app.auth import create_access_token, password_pool, PasswordHasherBusy
+from app.database import get_async_db
+from app.deps import CurrentUser, get_current_user
+from app.metrics import login_latency
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter()
 
-@router.post("/signup", response_model=schemas.Token)
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-
-    print("=== SIGNUP ===")
-    print("Email recibido:", user.email)
-    print("Password recibido:", user.password)
-    print("Longitud del password:", len(user.password))
-    print(type(user.password))
+def busy_exception():
+    return HTTPException(
+        status_code=429,
+        detail="Demasiadas solicitudes de autenticación, intente de nuevo en unos segundos",
+        headers={"Retry-After": "1"}
+    )
 
+@router.post("/signup", response_model=schemas.Token)
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_user = crud.create_user(db, user)
+        db_user = await crud_async.create_user(db, user)
         access_token = create_access_token(data={"sub": db_user.email})
+        refresh_token = await crud_async.create_refresh_token(db, db_user.id)
         return {
             "access_token": access_token,
             "token_type": "bearer",
-            "username": db_user.username
+            "username": db_user.username,
+            "refresh_token": refresh_token
         }
+    except PasswordHasherBusy:
+        raise busy_exception()
     except IntegrityError:
         raise HTTPException(
             status_code=400,
@@ -31,13 +38,63 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
         )
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, user_credentials.email, user_credentials.password)
+async def login(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    start = time.perf_counter()
+    try:
+        user = await crud_async.authenticate_user(db, user_credentials.email, user_credentials.password)
+    except PasswordHasherBusy:
+        raise busy_exception()
+    finally:
+        login_latency.observe((time.perf_counter() - start) * 1000)
     if not user:
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
     access_token = create_access_token(data={"sub": user.email})
+    refresh_token = await crud_async.create_refresh_token(db, user.id)
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "username": user.username
-    }
\ No newline at end of file
+        "username": user.username,
+        "refresh_token": refresh_token
+    }
+
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh(body: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Renueva la sesión con un token de refresco: lo rota y emite un access token
+    nuevo sin pasar por la verificación de contraseña.
+    """
+    rotated = await crud_async.rotate_refresh_token(db, body.refresh_token)
+    if not rotated:
+        raise HTTPException(
+            status_code=401,
+            detail="Token de refresco inválido o vencido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    email, username, refresh_token = rotated
+    return {
+        "access_token": create_access_token(data={"sub": email}),
+        "token_type": "bearer",
+        "username": username,
+        "refresh_token": refresh_token
+    }
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    await crud_async.revoke_refresh_token(db, body.refresh_token)
+    return None
+
+@router.get("/metrics")
+def auth_metrics(current_user: CurrentUser = Depends(get_current_user)):
+    """
+    Latencia de login (últimas 1000 peticiones) y estado del pool de bcrypt.
+    Requiere sesión: no se expone la carga del servidor a cualquiera.
+    """
+    return {
+        "login": login_latency.snapshot(),
+        "password_pool": {
+            "workers": password_pool.workers,
+            "queue_depth": password_pool.queue_depth,
+            "pending": password_pool.pending,
+            "rejected": password_pool.rejected
+        }
+    }
@@ -0,0 +1,84 @@
+"""
+Lote de operaciones sobre contactos (create, patch y delete) en una sola petición.
+
+Los contactos afectados se cargan con una única consulta IN, cada operación se
+valida contra el estado que dejan las anteriores del mismo lote y todas las
+válidas se aplican con un solo commit. Las inválidas no detienen el lote: se
+informan en el resultado de su posición.
+"""
+import os
+from typing import List
+from sqlalchemy.orm import Session
+from app import crud, schemas
+from app.importer import IMPORTABLE_FIELDS, validate_row
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "1000"))
+
+def _unknown_fields(data: dict) -> List[dict]:
+    return [
+        {"field": key, "message": "Campo no permitido en el lote"}
+        for key in data
+        if key not in IMPORTABLE_FIELDS
+    ]
+
+def apply_operations(db: Session, operations: List[schemas.BatchOperation], user_id: int) -> dict:
+    target_ids = [op.id for op in operations if op.op != "create" and op.id is not None]
+    contactos = crud.get_contacts_by_ids(db, target_ids, user_id)
+    # Estado de cada contacto tras las operaciones anteriores del lote
+    estado = {
+        contacto_id: {field: getattr(contacto, field) for field in IMPORTABLE_FIELDS}
+        for contacto_id, contacto in contactos.items()
+    }
+
+    results, creates, created_at, updates, deletes = [], [], [], [], []
+    for index, operation in enumerate(operations):
+        result = {"index": index, "op": operation.op, "id": operation.id}
+        results.append(result)
+        data = operation.data or {}
+
+        if operation.op == "create":
+            errors = _unknown_fields(data)
+            contacto, validation_errors = validate_row(data) if not errors else (None, errors)
+            if validation_errors:
+                result.update(status=422, errors=validation_errors)
+                continue
+            creates.append(contacto)
+            created_at.append(result)
+            continue
+
+        if operation.id is None:
+            result.update(status=422, errors=[{"field": "id", "message": "El id es requerido"}])
+            continue
+        if operation.id not in estado:
+            result.update(status=404, errors=[{"field": "id", "message": "Contacto no encontrado"}])
+            continue
+
+        if operation.op == "delete":
+            deletes.append(contactos[operation.id])
+            del estado[operation.id]
+            result.update(status=204)
+            continue
+
+        errors = _unknown_fields(data) or (
+            [{"field": None, "message": "No hay campos para actualizar"}] if not data else []
+        )
+        if not errors:
+            merged, errors = validate_row({**estado[operation.id], **data})
+        if errors:
+            result.update(status=422, errors=errors)
+            continue
+        cambios = {key: merged[key] for key in data}
+        estado[operation.id].update(cambios)
+        updates.append((contactos[operation.id], cambios))
+        result.update(status=200, contacto=contactos[operation.id])
+
+    created = crud.apply_contact_changes(db, user_id, creates, updates, deletes)
+    for result, contacto in zip(created_at, created):
+        result.update(status=201, id=contacto.id, contacto=contacto)
+
+    succeeded = sum(1 for result in results if result["status"] < 400)
+    return {
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
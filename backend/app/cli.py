@@ -0,0 +1,186 @@
+"""
+Comandos de mantenimiento de la base de datos.
+
+Uso (desde la carpeta backend):
+    python -m app.cli reindex-search
+    python -m app.cli repair-counts
+    python -m app.cli purge-refresh-tokens
+    python -m app.cli repair-rating-stats
+    python -m app.cli rebuild-rating-rollups
+    python -m app.cli generate-thumbnails [--force]
+    python -m app.cli migrate-image-store
+    python -m app.cli gc-uploads [--dry-run] [--grace-hours 24]
+    python -m app.cli purge-outbox [--retention-days 30]
+"""
+import argparse
+from app.database import SessionLocal, engine, upgrade_schema
+from app.models_db import Base
+from app import crud, search, counters, rating_stats, rollups, images, models_db, outbox, upload_gc
+
+def reindex_search(args):
+    db = SessionLocal()
+    try:
+        total = search.rebuild_index(db)
+        print(f"Índice de búsqueda reconstruido: {total} contactos indexados")
+    finally:
+        db.close()
+
+def repair_counts(args):
+    db = SessionLocal()
+    try:
+        total = counters.rebuild_counts(db)
+        print(f"Contadores recalculados: {total} combinaciones de usuario/tipo/detalle")
+    finally:
+        db.close()
+
+def purge_refresh_tokens(args):
+    db = SessionLocal()
+    try:
+        total = crud.purge_expired_refresh_tokens(db)
+        print(f"Tokens de refresco vencidos eliminados: {total}")
+    finally:
+        db.close()
+
+def repair_rating_stats(args):
+    db = SessionLocal()
+    try:
+        total = rating_stats.rebuild_stats(db)
+        print(f"Agregados de calificaciones recalculados: {total} contactos con calificaciones")
+    finally:
+        db.close()
+
+def rebuild_rating_rollups(args):
+    db = SessionLocal()
+    try:
+        total = rollups.rebuild_rollups(db)
+        print(f"Series de calificaciones reconstruidas: {total} periodos")
+    finally:
+        db.close()
+
+def generate_thumbnails(args):
+    db = SessionLocal()
+    try:
+        query = db.query(models_db.Contact.id, models_db.Contact.imagen).filter(
+            models_db.Contact.imagen.isnot(None)
+        )
+        if not args.force:
+            query = query.filter(models_db.Contact.thumbnails.is_(None))
+        pendientes = query.order_by(models_db.Contact.id).all()
+    finally:
+        db.close()
+
+    generadas = sum(
+        1 for contact_id, imagen in pendientes
+        if images.process_contact_image(contact_id, imagen)
+    )
+    print(f"Miniaturas generadas: {generadas} de {len(pendientes)} imágenes")
+
+def migrate_image_store(args):
+    db = SessionLocal()
+    try:
+        resultado = images.migrate_legacy_images(db)
+        print(
+            f"Imágenes migradas: {resultado['migradas']} rutas antiguas en "
+            f"{resultado['archivos']} archivos; {resultado['faltantes']} contactos con archivo faltante"
+        )
+    finally:
+        db.close()
+    # Las imágenes migradas necesitan miniaturas con su nuevo nombre
+    generate_thumbnails(argparse.Namespace(force=False))
+
+def gc_uploads(args):
+    db = SessionLocal()
+    try:
+        r = upload_gc.collect_garbage(db, grace_hours=args.grace_hours, dry_run=args.dry_run)
+    finally:
+        db.close()
+    accion = "Se eliminarían" if r["dry_run"] else "Eliminados"
+    print(
+        f"{accion}: {r['huerfanos']} fotos huérfanas, {r['miniaturas']} miniaturas y "
+        f"{r['temporales']} temporales de {r['revisados']} archivos revisados "
+        f"({r['bytes'] / (1024 * 1024):.1f} MB)"
+    )
+
+def purge_outbox(args):
+    db = SessionLocal()
+    try:
+        total = outbox.purge_dead(db, retention_days=args.retention_days)
+        print(f"Mensajes dead eliminados de la bandeja de salida: {total}")
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "reindex-search",
+        help="Reconstruye el índice de texto completo de contactos"
+    ).set_defaults(func=reindex_search)
+
+    subparsers.add_parser(
+        "repair-counts",
+        help="Recalcula los contadores de contactos por tipo y detalle"
+    ).set_defaults(func=repair_counts)
+
+    subparsers.add_parser(
+        "purge-refresh-tokens",
+        help="Elimina los tokens de refresco vencidos"
+    ).set_defaults(func=purge_refresh_tokens)
+
+    subparsers.add_parser(
+        "repair-rating-stats",
+        help="Recalcula el conteo, la suma y el promedio de calificaciones por contacto y categoría"
+    ).set_defaults(func=repair_rating_stats)
+
+    subparsers.add_parser(
+        "rebuild-rating-rollups",
+        help="Reconstruye las series por día, semana y mes desde la tabla de calificaciones"
+    ).set_defaults(func=rebuild_rating_rollups)
+
+    thumbnails_parser = subparsers.add_parser(
+        "generate-thumbnails",
+        help="Genera las miniaturas de las fotos de contacto existentes"
+    )
+    thumbnails_parser.add_argument(
+        "--force", action="store_true",
+        help="Regenera también las que ya tienen miniaturas"
+    )
+    thumbnails_parser.set_defaults(func=generate_thumbnails)
+
+    subparsers.add_parser(
+        "migrate-image-store",
+        help="Pasa las fotos existentes al almacenamiento por contenido y une los duplicados"
+    ).set_defaults(func=migrate_image_store)
+
+    gc_parser = subparsers.add_parser(
+        "gc-uploads",
+        help="Elimina de uploads/ las fotos sin contacto, sus miniaturas y los temporales abandonados"
+    )
+    gc_parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Solo informa lo que se eliminaría"
+    )
+    gc_parser.add_argument(
+        "--grace-hours", type=float, default=None,
+        help="Antigüedad mínima de los archivos a eliminar (por defecto UPLOAD_GC_GRACE_HOURS)"
+    )
+    gc_parser.set_defaults(func=gc_uploads)
+
+    purge_parser = subparsers.add_parser(
+        "purge-outbox",
+        help="Elimina los correos dead antiguos y sus adjuntos"
+    )
+    purge_parser.add_argument(
+        "--retention-days", type=float, default=None,
+        help="Días desde el último intento (por defecto EMAIL_DEAD_RETENTION_DAYS)"
+    )
+    purge_parser.set_defaults(func=purge_outbox)
+
+    args = parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
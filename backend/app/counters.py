@@ -0,0 +1,109 @@
+from enum import Enum
+from typing import Optional
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from . import models_db
+from .database import upsert
+
+# Contadores de contactos por (usuario, tipo_contacto, detalle_tipo).
+# crud los ajusta dentro de la misma transacción que crea, modifica o elimina
+# el contacto, así el total del listado y las facetas no necesitan COUNT(*).
+
+def facet_key(value) -> str:
+    """Normaliza un tipo/detalle (enum, str o None) al valor guardado en la tabla."""
+    if isinstance(value, Enum):
+        return value.value
+    return value or ""
+
+def adjust(db: Session, owner_id: int, tipo_contacto, detalle_tipo, delta: int) -> None:
+    """Suma `delta` al contador de la combinación indicada (no hace commit)."""
+    stmt = upsert(db.get_bind())(models_db.ContactCount).values(
+        owner_id=owner_id,
+        tipo_contacto=facet_key(tipo_contacto),
+        detalle_tipo=facet_key(detalle_tipo),
+        total=delta,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["owner_id", "tipo_contacto", "detalle_tipo"],
+        set_={"total": models_db.ContactCount.total + stmt.excluded.total},
+    ))
+
+def move(db: Session, owner_id: int, old_tipo, old_detalle, new_tipo, new_detalle) -> None:
+    """Traslada un contacto de una combinación tipo/detalle a otra."""
+    if (facet_key(old_tipo), facet_key(old_detalle)) == (facet_key(new_tipo), facet_key(new_detalle)):
+        return
+    adjust(db, owner_id, old_tipo, old_detalle, -1)
+    adjust(db, owner_id, new_tipo, new_detalle, 1)
+
+def count_contacts(
+    db: Session,
+    owner_id: int,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None
+) -> int:
+    """Total de contactos del usuario, opcionalmente filtrado por tipo y detalle."""
+    query = db.query(func.coalesce(func.sum(models_db.ContactCount.total), 0)).filter(
+        models_db.ContactCount.owner_id == owner_id
+    )
+    if tipo_contacto:
+        query = query.filter(models_db.ContactCount.tipo_contacto == tipo_contacto)
+    if detalle_tipo:
+        query = query.filter(models_db.ContactCount.detalle_tipo == detalle_tipo)
+    return query.scalar()
+
+def get_facets(db: Session, owner_id: int) -> dict:
+    """Conteos por tipo y por detalle dentro de cada tipo."""
+    rows = db.query(models_db.ContactCount).filter(
+        models_db.ContactCount.owner_id == owner_id,
+        models_db.ContactCount.total > 0
+    ).order_by(
+        models_db.ContactCount.tipo_contacto,
+        models_db.ContactCount.detalle_tipo
+    ).all()
+
+    tipos = {}
+    for row in rows:
+        tipo = tipos.setdefault(row.tipo_contacto, {
+            "tipo_contacto": row.tipo_contacto or None,
+            "total": 0,
+            "detalles": []
+        })
+        tipo["total"] += row.total
+        tipo["detalles"].append({
+            "detalle_tipo": row.detalle_tipo or None,
+            "total": row.total
+        })
+
+    return {
+        "total": sum(tipo["total"] for tipo in tipos.values()),
+        "tipos": list(tipos.values())
+    }
+
+def rebuild_counts(db: Session) -> int:
+    """
+    Recalcula todos los contadores a partir de la tabla contacts.
+    Devuelve el número de combinaciones escritas.
+    """
+    db.query(models_db.ContactCount).delete()
+    tipo = func.coalesce(models_db.Contact.tipo_contacto, "")
+    detalle = func.coalesce(models_db.Contact.detalle_tipo, "")
+    result = db.execute(
+        insert(models_db.ContactCount).from_select(
+            ["owner_id", "tipo_contacto", "detalle_tipo", "total"],
+            select(models_db.Contact.owner_id, tipo, detalle, func.count())
+            .group_by(models_db.Contact.owner_id, tipo, detalle)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+def backfill_counts(db: Session) -> int:
+    """
+    Llena los contadores si la tabla está vacía pero ya hay contactos (base
+    de datos anterior a los contadores). Se llama al iniciar la aplicación.
+    """
+    if db.query(models_db.ContactCount).first() is not None:
+        return 0
+    if db.query(models_db.Contact.id).first() is None:
+        return 0
+    return rebuild_counts(db)
@@ -1,9 +1,12 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from app import models_db, schemas
+from app import models_db, schemas, search, counters, rating_stats, rollups, images, storage
 from app.auth import get_password_hash, verify_password
 from pathlib import Path
-from sqlalchemy import func
+from sqlalchemy import false, func, insert, select
+from typing import List, Optional
+from collections import Counter
+from datetime import datetime
 
 def get_contact(db: Session, contacto_id: int, user_id: int):
     """
@@ -22,14 +25,111 @@ def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100):
         models_db.ContactModel.owner_id == user_id
     ).offset(skip).limit(limit).all()
 
-def create_contact(db: Session, contacto: schemas.ContactCreate, user_id: int):
+def query_contacts(
+    db: Session,
+    user_id: int,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None
+):
     """
-    Crea un nuevo contacto asociado a un usuario.
+    Construye la consulta de contactos de un usuario con los filtros del listado.
+    Con `q` se usa el índice de texto completo y los resultados se ordenan por relevancia.
+    """
+    query = db.query(models_db.Contact).filter(
+        models_db.Contact.owner_id == user_id
+    )
+
+    if q and q.strip():
+        if not search.is_enabled(db):
+            query = query.filter(
+                (models_db.Contact.nombre.ilike(f"%{q}%")) |
+                (models_db.Contact.email.ilike(f"%{q}%")) |
+                (models_db.Contact.telefono.ilike(f"%{q}%"))
+            )
+        elif search.phone_digits(q):
+            # Un teléfono se busca también como subcadena, sin orden por relevancia
+            query = query.filter(
+                models_db.Contact.telefono.like(f"%{search.phone_digits(q)}%") |
+                models_db.Contact.id.in_(select(search.match_subquery(q).c.contact_id))
+            )
+        elif search.build_match_query(q):
+            matches = search.match_subquery(q)
+            query = query.join(
+                matches, matches.c.contact_id == models_db.Contact.id
+            ).order_by(matches.c.rank)
+        else:
+            # Solo signos de puntuación: no hay nada que buscar
+            query = query.filter(false())
+
+    if tipo_contacto:
+        query = query.filter(models_db.Contact.tipo_contacto == tipo_contacto)
+
+    if detalle_tipo:
+        query = query.filter(models_db.Contact.detalle_tipo == detalle_tipo)
+
+    return query
+
+def get_leaderboard(
+    db: Session,
+    user_id: int,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None,
+    worst: bool = False,
+    min_ratings: int = 1,
+    limit: int = 20
+):
+    """
+    Los `limit` contactos mejor (o peor) calificados del usuario con al menos
+    `min_ratings` calificaciones. El orden por average_rating dentro de
+    (owner_id[, tipo_contacto]) lo resuelven ix_contacts_owner_average_rating e
+    ix_contacts_owner_tipo_average_rating como un recorrido de rango del índice.
+    """
+    Contact = models_db.Contact
+    query = db.query(Contact).filter(
+        Contact.owner_id == user_id,
+        Contact.average_rating.isnot(None),
+        Contact.ratings_count >= min_ratings
+    )
+    if tipo_contacto:
+        query = query.filter(Contact.tipo_contacto == tipo_contacto)
+    if detalle_tipo:
+        query = query.filter(Contact.detalle_tipo == detalle_tipo)
+    if worst:
+        query = query.order_by(Contact.average_rating, Contact.id)
+    else:
+        query = query.order_by(Contact.average_rating.desc(), Contact.id.desc())
+    return query.limit(limit).all()
+
+def count_contacts(
+    db: Session,
+    query,
+    user_id: int,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None
+) -> int:
+    """
+    Total de contactos para los filtros del listado.
+    Sin búsqueda de texto se lee de los contadores por tipo/detalle en vez de hacer COUNT(*).
+    """
+    if q and q.strip():
+        return query.order_by(None).count()
+    return counters.count_contacts(db, user_id, tipo_contacto, detalle_tipo)
+
+def create_contact(db: Session, contacto: schemas.ContactCreate, user_id: int, imagen_size: Optional[int] = None):
+    """
+    Crea un nuevo contacto asociado a un usuario. `imagen_size` es el tamaño de
+    una imagen subida que aún no está en su ruta definitiva.
     """
     try:
         contact_dict = contacto.dict()
         db_contact = models_db.Contact(**contact_dict, owner_id=user_id)
         db.add(db_contact)
+        db.flush()
+        search.index_contact(db, db_contact)
+        counters.adjust(db, user_id, db_contact.tipo_contacto, db_contact.detalle_tipo, 1)
+        storage.acquire(db, db_contact.imagen, imagen_size)
         db.commit()
         db.refresh(db_contact)
         return db_contact
@@ -37,7 +137,105 @@ def create_contact(db: Session, contacto: schemas.ContactCreate, user_id: int):
         db.rollback()
         raise Exception(f"Error al crear el contacto en la base de datos: {str(e)}")
 
-def update_contact(db: Session, contacto_id: int, datos: schemas.ContactUpdate, user_id: int):
+def bulk_create_contacts(db: Session, contactos: List[dict], user_id: int) -> List[int]:
+    """
+    Inserta un bloque de contactos ya validados con un solo INSERT múltiple,
+    los indexa y ajusta los contadores en la misma transacción.
+    Devuelve los ids en el mismo orden.
+    """
+    if not contactos:
+        return []
+    rows = [{**contacto, "owner_id": user_id} for contacto in contactos]
+    try:
+        ids = db.scalars(
+            insert(models_db.Contact).returning(
+                models_db.Contact.id, sort_by_parameter_order=True
+            ),
+            rows
+        ).all()
+        for row, contact_id in zip(rows, ids):
+            row["id"] = contact_id
+        search.index_contacts(db, rows)
+
+        por_tipo = Counter(
+            (row.get("tipo_contacto"), row.get("detalle_tipo")) for row in rows
+        )
+        for (tipo, detalle), total in por_tipo.items():
+            counters.adjust(db, user_id, tipo, detalle, total)
+        db.commit()
+        return ids
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error al importar contactos: {str(e)}")
+
+def get_contacts_by_ids(db: Session, contacto_ids, user_id: int) -> dict:
+    """
+    Obtiene con una sola consulta IN los contactos del usuario entre `contacto_ids`.
+    Devuelve {id: contacto}; los ids ajenos o inexistentes no aparecen.
+    """
+    if not contacto_ids:
+        return {}
+    contactos = db.query(models_db.Contact).filter(
+        models_db.Contact.owner_id == user_id,
+        models_db.Contact.id.in_(set(contacto_ids))
+    ).all()
+    return {contacto.id: contacto for contacto in contactos}
+
+def apply_contact_changes(
+    db: Session,
+    user_id: int,
+    creates: List[dict],
+    updates: List[tuple],
+    deletes: list
+):
+    """
+    Aplica en una sola transacción un lote ya validado: `creates` son dicts de
+    contactos nuevos, `updates` pares (contacto, cambios) y `deletes` contactos
+    cargados con get_contacts_by_ids. Devuelve los contactos creados en orden.
+    """
+    deltas = Counter()
+    try:
+        created = [models_db.Contact(**data, owner_id=user_id) for data in creates]
+        db.add_all(created)
+        for contacto in created:
+            deltas[(counters.facet_key(contacto.tipo_contacto), counters.facet_key(contacto.detalle_tipo))] += 1
+
+        for contacto, cambios in updates:
+            deltas[(counters.facet_key(contacto.tipo_contacto), counters.facet_key(contacto.detalle_tipo))] -= 1
+            for key, value in cambios.items():
+                setattr(contacto, key, value)
+            deltas[(counters.facet_key(contacto.tipo_contacto), counters.facet_key(contacto.detalle_tipo))] += 1
+
+        for contacto in deletes:
+            deltas[(counters.facet_key(contacto.tipo_contacto), counters.facet_key(contacto.detalle_tipo))] -= 1
+            db.delete(contacto)
+        db.flush()
+
+        deleted_ids = {contacto.id for contacto in deletes}
+        updated = {contacto.id: contacto for contacto, _ in updates if contacto.id not in deleted_ids}
+        search.remove_contacts(db, list(updated) + list(deleted_ids))
+        search.index_contacts(db, [
+            {field: getattr(contacto, field) for field in ("id",) + search.SEARCH_FIELDS}
+            for contacto in created + list(updated.values())
+        ])
+        for (tipo, detalle), delta in deltas.items():
+            if delta:
+                counters.adjust(db, user_id, tipo, detalle, delta)
+        imagenes = [
+            contacto.imagen for contacto in deletes
+            if storage.release(db, contacto.imagen)
+        ]
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error al aplicar el lote de contactos: {str(e)}")
+
+    # Las imágenes sin referencias solo se borran tras el commit
+    for imagen in imagenes:
+        images.delete_image(imagen)
+    return created
+
+def update_contact(db: Session, contacto_id: int, datos: schemas.ContactUpdate, user_id: int, imagen_size: Optional[int] = None):
     """
     Actualiza un contacto si existe y pertenece al usuario.
     """
@@ -45,17 +243,36 @@ def update_contact(db: Session, contacto_id: int, datos: schemas.ContactUpdate,
     if not contacto_db:
         return None
     
+    old_tipo, old_detalle = contacto_db.tipo_contacto, contacto_db.detalle_tipo
+    old_imagen = contacto_db.imagen
     for key, value in datos.dict(exclude_unset=True).items():
         setattr(contacto_db, key, value)
+    imagen_cambiada = contacto_db.imagen != old_imagen
+    if imagen_cambiada:
+        # Las miniaturas de la imagen nueva se generan en segundo plano
+        contacto_db.thumbnails = None
     
     try:
+        search.index_contact(db, contacto_db)
+        counters.move(
+            db, user_id, old_tipo, old_detalle,
+            contacto_db.tipo_contacto, contacto_db.detalle_tipo
+        )
+        borrar_anterior = False
+        if imagen_cambiada:
+            storage.acquire(db, contacto_db.imagen, imagen_size)
+            borrar_anterior = storage.release(db, old_imagen)
         db.commit()
         db.refresh(contacto_db)
-        return contacto_db
     except Exception as e:
         db.rollback()
         raise Exception(f"Error al actualizar el contacto: {str(e)}")
 
+    # La imagen anterior solo se borra si ningún otro contacto la usa
+    if borrar_anterior:
+        images.delete_image(old_imagen)
+    return contacto_db
+
 def delete_contact(db: Session, contacto_id: int, user_id: int):
     """
     Elimina un contacto por ID si existe y pertenece al usuario.
@@ -64,17 +281,16 @@ def delete_contact(db: Session, contacto_id: int, user_id: int):
     if not contacto_db:
         return None
     
-    # Si el contacto tiene una imagen, eliminarla
-    if contacto_db.imagen:
-        try:
-            imagen_path = Path("uploads") / Path(contacto_db.imagen).name
-            if imagen_path.exists():
-                imagen_path.unlink()
-        except Exception as e:
-            print(f"Error al eliminar imagen: {str(e)}")
-    
+    search.remove_contact(db, contacto_db.id)
+    counters.adjust(db, user_id, contacto_db.tipo_contacto, contacto_db.detalle_tipo, -1)
+    imagen = contacto_db.imagen
+    borrar_imagen = storage.release(db, imagen)
     db.delete(contacto_db)
     db.commit()
+
+    # Si era la última referencia a la imagen, eliminar el archivo
+    if borrar_imagen:
+        images.delete_image(imagen)
     return contacto_db
 
 def get_user_by_email(db: Session, email: str):
@@ -84,12 +300,6 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models_db.User).filter(models_db.User.email == email).first()
 
 def create_user(db: Session, user: schemas.UserCreate):
-    
-    print("=== create_user ===")
-    print("Password recibido en CRUD:", user.password)
-    print("Tipo:", type(user.password))
-    print("Longitud:", len(user.password))
-    
     hashed_password = get_password_hash(user.password)
     db_user = models_db.User(
         email=user.email,
@@ -107,36 +317,60 @@ def authenticate_user(db: Session, email: str, password: str):
         return None
     return user
 
-def create_rating(db: Session, rating: schemas.RatingCreate, contact_id: int):
-    db_rating = models_db.Rating(**rating.dict(), contact_id=contact_id)
-    db.add(db_rating)
+def purge_expired_refresh_tokens(db: Session) -> int:
+    """
+    Elimina los tokens de refresco vencidos. Los revocados se conservan hasta
+    su vencimiento para poder detectar su reutilización.
+    """
+    deleted = db.query(models_db.RefreshToken).filter(
+        models_db.RefreshToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
     db.commit()
-    db.refresh(db_rating)
-    return db_rating
-
-def update_contact_rating(db: Session, contact_id: int, new_rating: float):
-    contact = db.query(models_db.Contact).filter(models_db.Contact.id == contact_id).first()
-    if contact:
-        # Calcular el nuevo promedio
-        ratings_count = db.query(models_db.Rating).filter(
-            models_db.Rating.contact_id == contact_id
-        ).count()
-        
-        if ratings_count > 0:
-            total_rating = db.query(func.sum(models_db.Rating.calificacion)).filter(
-                models_db.Rating.contact_id == contact_id
-            ).scalar() or 0
-            contact.average_rating = total_rating / ratings_count
-        else:
-            contact.average_rating = new_rating
-            
+    return deleted
+
+def add_ratings(db: Session, contact_id: int, ratings: List[schemas.RatingCreate], user_id: int):
+    """
+    Inserta las calificaciones con un solo INSERT múltiple y actualiza los
+    agregados del contacto y las series por periodo en la misma transacción.
+    Todas comparten la misma fecha (una sesión de calificación).
+    """
+    fecha = datetime.utcnow()
+    rows = [{**rating.model_dump(), "contact_id": contact_id, "fecha": fecha} for rating in ratings]
+    try:
+        db_ratings = db.scalars(
+            insert(models_db.Rating).returning(models_db.Rating, sort_by_parameter_order=True),
+            rows
+        ).all()
+        rating_stats.record(db, contact_id, rows)
+        rollups.record(db, user_id, contact_id, rows)
         db.commit()
-        return contact
+        return db_ratings
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error al guardar las calificaciones: {str(e)}")
+
+def query_ratings(
+    db: Session,
+    contact_id: int,
+    categoria: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+):
+    """
+    Consulta de las calificaciones de un contacto, opcionalmente filtrada por
+    categoría y por rango de fechas [desde, hasta), de la más reciente a la más antigua.
+    """
+    query = db.query(models_db.Rating).filter(models_db.Rating.contact_id == contact_id)
+    if categoria:
+        query = query.filter(models_db.Rating.categoria == categoria)
+    if desde:
+        query = query.filter(models_db.Rating.fecha >= desde)
+    if hasta:
+        query = query.filter(models_db.Rating.fecha < hasta)
+    return query.order_by(models_db.Rating.fecha.desc(), models_db.Rating.id.desc())
 
 def get_contact_ratings(db: Session, contact_id: int):
     """
     Obtiene todas las calificaciones de un contacto específico.
     """
-    return db.query(models_db.Rating).filter(
-        models_db.Rating.contact_id == contact_id
-    ).order_by(models_db.Rating.fecha.desc()).all()
+    return query_ratings(db, contact_id).all()
@@ -0,0 +1,194 @@
+"""
+Versiones asíncronas de las funciones de crud para las rutas `async def`.
+
+Las lecturas simples usan select() con AsyncSession. Las escrituras reutilizan
+la lógica de crud (índice de búsqueda, contadores) mediante AsyncSession.run_sync:
+la función síncrona se ejecuta con una Session cuyas consultas se esperan sobre
+aiosqlite, de modo que el event loop no se bloquea durante la E/S.
+"""
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import auth, batch, crud, models_db, outbox, schemas
+
+async def get_contact(db: AsyncSession, contacto_id: int, user_id: int):
+    """
+    Obtiene un contacto por su ID y verifica que pertenezca al usuario.
+    """
+    result = await db.execute(
+        select(models_db.Contact).filter(
+            models_db.Contact.id == contacto_id,
+            models_db.Contact.owner_id == user_id
+        )
+    )
+    return result.scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """
+    Obtiene un usuario por su email
+    """
+    result = await db.execute(
+        select(models_db.User).filter(models_db.User.email == email)
+    )
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    """
+    Crea un usuario; el hash de la contraseña se calcula en el pool de bcrypt.
+    """
+    hashed_password = await auth.hash_password_async(user.password)
+    db_user = models_db.User(
+        email=user.email,
+        username=user.username,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    await db.commit()
+    return db_user
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    """
+    Verifica las credenciales en el pool de bcrypt. Si el hash guardado usa
+    parámetros obsoletos se reemplaza por uno nuevo tras un login correcto.
+    """
+    user = await get_user_by_email(db, email)
+    if not user:
+        return None
+    valid, new_hash = await auth.verify_and_update_password(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+async def create_refresh_token(db: AsyncSession, user_id: int) -> str:
+    """
+    Emite un token de refresco para el usuario y devuelve el valor en claro.
+    """
+    token = auth.generate_refresh_token()
+    db.add(models_db.RefreshToken(
+        user_id=user_id,
+        token_hash=auth.hash_refresh_token(token),
+        expires_at=auth.refresh_token_expiration()
+    ))
+    await db.commit()
+    return token
+
+async def rotate_refresh_token(db: AsyncSession, token: str):
+    """
+    Valida un token de refresco por su hash (consulta indexada, sin bcrypt),
+    lo revoca y emite uno nuevo. Devuelve (email, username, nuevo_token) o None.
+    Si se presenta un token ya rotado se revocan todos los tokens del usuario.
+    """
+    result = await db.execute(
+        select(models_db.RefreshToken, models_db.User.email, models_db.User.username)
+        .join(models_db.User, models_db.User.id == models_db.RefreshToken.user_id)
+        .filter(models_db.RefreshToken.token_hash == auth.hash_refresh_token(token))
+    )
+    row = result.first()
+    if row is None:
+        return None
+    stored, email, username = row
+    now = datetime.utcnow()
+
+    if stored.revoked_at is not None:
+        await db.execute(
+            update(models_db.RefreshToken)
+            .where(
+                models_db.RefreshToken.user_id == stored.user_id,
+                models_db.RefreshToken.revoked_at.is_(None)
+            )
+            .values(revoked_at=now)
+        )
+        await db.commit()
+        return None
+    if stored.expires_at <= now:
+        return None
+
+    # UPDATE condicional: si dos peticiones usan el mismo token a la vez solo una lo rota
+    claimed = await db.execute(
+        update(models_db.RefreshToken)
+        .where(
+            models_db.RefreshToken.id == stored.id,
+            models_db.RefreshToken.revoked_at.is_(None)
+        )
+        .values(revoked_at=now)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        return None
+
+    new_token = auth.generate_refresh_token()
+    replacement = models_db.RefreshToken(
+        user_id=stored.user_id,
+        token_hash=auth.hash_refresh_token(new_token),
+        expires_at=auth.refresh_token_expiration()
+    )
+    db.add(replacement)
+    await db.flush()
+    await db.execute(
+        update(models_db.RefreshToken)
+        .where(models_db.RefreshToken.id == stored.id)
+        .values(replaced_by_id=replacement.id)
+    )
+    await db.commit()
+    return email, username, new_token
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> bool:
+    """
+    Revoca un token de refresco. Devuelve False si no existía o ya estaba revocado.
+    """
+    result = await db.execute(
+        update(models_db.RefreshToken)
+        .where(
+            models_db.RefreshToken.token_hash == auth.hash_refresh_token(token),
+            models_db.RefreshToken.revoked_at.is_(None)
+        )
+        .values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def create_contact(db: AsyncSession, contacto: schemas.ContactCreate, user_id: int, imagen_size=None):
+    return await db.run_sync(crud.create_contact, contacto, user_id, imagen_size)
+
+async def update_contact(db: AsyncSession, contacto_id: int, datos: schemas.ContactUpdate, user_id: int, imagen_size=None):
+    return await db.run_sync(crud.update_contact, contacto_id, datos, user_id, imagen_size)
+
+async def delete_contact(db: AsyncSession, contacto_id: int, user_id: int):
+    return await db.run_sync(crud.delete_contact, contacto_id, user_id)
+
+async def apply_contact_batch(db: AsyncSession, operations, user_id: int):
+    return await db.run_sync(batch.apply_operations, operations, user_id)
+
+async def add_ratings(db: AsyncSession, contact_id: int, ratings, user_id: int):
+    return await db.run_sync(crud.add_ratings, contact_id, ratings, user_id)
+
+# La bandeja de salida se convierte a esquema dentro de run_sync para que los
+# destinatarios se carguen con la sesión síncrona.
+async def enqueue_email(db: AsyncSession, owner_id: int, subject: str, body: str, recipients, attachments):
+    def run(session):
+        message = outbox.enqueue(session, owner_id, subject, body, recipients, attachments)
+        return schemas.OutboxMessage.model_validate(outbox.get_message(session, owner_id, message.id))
+    return await db.run_sync(run)
+
+async def get_outbox_message(db: AsyncSession, owner_id: int, message_id: int):
+    def run(session):
+        message = outbox.get_message(session, owner_id, message_id)
+        return schemas.OutboxMessage.model_validate(message) if message else None
+    return await db.run_sync(run)
+
+async def list_dead_emails(db: AsyncSession, owner_id: int, skip: int, limit: int):
+    def run(session):
+        return [
+            schemas.OutboxMessage.model_validate(message)
+            for message in outbox.list_dead(session, owner_id, skip, limit)
+        ]
+    return await db.run_sync(run)
+
+async def requeue_email(db: AsyncSession, owner_id: int, message_id: int):
+    def run(session):
+        message, requeued = outbox.requeue(session, owner_id, message_id)
+        return (schemas.OutboxMessage.model_validate(message) if message else None), requeued
+    return await db.run_sync(run)
@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 from dotenv import load_dotenv
 import os
 
@@ -8,13 +12,85 @@ load_dotenv()  # carga variables de .env
 
 SQLALCHEMY_DATABASE_URL = os.getenv('DATABASE_URL')
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Perfil de SQLite aplicado a cada conexión nueva. Cada PRAGMA se puede
+# ajustar por entorno; un valor vacío deja el valor por defecto de SQLite.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": os.getenv("DB_BUSY_TIMEOUT_MS", "5000"),
+    "cache_size": os.getenv("DB_CACHE_SIZE", "-64000"),      # negativo = KiB (64 MB)
+    "mmap_size": os.getenv("DB_MMAP_SIZE", "268435456"),     # 256 MB
+    "temp_store": os.getenv("DB_TEMP_STORE", "MEMORY"),
+    # SQLite no aplica las claves foráneas (ni ON DELETE CASCADE) si no se activan
+    "foreign_keys": os.getenv("DB_FOREIGN_KEYS", "ON"),
+}
+
+# Tamaño del pool de conexiones (no aplica a SQLite en memoria)
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def engine_options(url) -> dict:
+    """Argumentos de create_engine según el tipo de base de datos."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return dict(POOL_OPTIONS)
+    options = {"connect_args": {"check_same_thread": False}}
+    if url.database and url.database != ":memory:":
+        options.update(POOL_OPTIONS)
+    return options
+
+def configure_engine(sync_engine):
+    """Registra el perfil de PRAGMAs en un motor SQLite (síncrono o el sync_engine de uno asíncrono)."""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", apply_sqlite_pragmas)
+    return sync_engine
+
+engine = configure_engine(
+    create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 )
 
 # Crea la fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str):
+    """Usa el driver asíncrono equivalente (sqlite -> sqlite+aiosqlite)."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+# Motor y sesiones asíncronas para las rutas `async def`: las consultas
+# se esperan con await en lugar de bloquear el event loop de uvicorn.
+async_engine = create_async_engine(
+    to_async_url(SQLALCHEMY_DATABASE_URL), **engine_options(SQLALCHEMY_DATABASE_URL)
+)
+configure_engine(async_engine.sync_engine)
+
+# expire_on_commit=False: los objetos devueltos se serializan después del
+# commit, fuera de la sesión, y no pueden recargarse de forma perezosa.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+def upsert(bind):
+    """
+    insert() del dialecto con on_conflict_do_update (SQLite y PostgreSQL), para
+    sumar a contadores con clave compuesta en una sola sentencia atómica: leer
+    la fila y luego insertarla choca con la clave primaria si dos
+    transacciones crean la misma fila a la vez.
+    """
+    return postgresql.insert if bind.dialect.name == "postgresql" else sqlite.insert
+
 # Base para modelos ORM
 Base = declarative_base()
 
@@ -25,3 +101,29 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency asíncrona de FastAPI
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def upgrade_schema(bind):
+    """
+    Añade a las tablas existentes las columnas e índices declarados en los
+    modelos que aún no existan. create_all solo crea tablas nuevas completas,
+    así que las bases de datos existentes los reciben aquí. Las columnas nuevas
+    deben ser nulables o tener server_default.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                with bind.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -1,25 +1,48 @@
-from app.database import SessionLocal
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from .database import get_db
-from . import crud
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+from .database import get_async_db, get_db
+from . import crud_async, models_db
 from .auth import SECRET_KEY, ALGORITHM
+from .cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@dataclass(frozen=True)
+class CurrentUser:
+    """Usuario autenticado, resuelto una sola vez por petición."""
+    id: int
+    email: str
+    username: str
+
+# Usuarios resueltos por el "sub" del token. Se invalidan al modificar o
+# eliminar el usuario (ver los eventos de abajo), pero solo en este proceso:
+# con varios workers, un usuario eliminado o modificado en otro sigue
+# autenticado aquí hasta USER_CACHE_TTL_SECONDS. USER_CACHE_TTL_SECONDS=0
+# desactiva la caché.
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "30")),
+)
+
+@event.listens_for(models_db.User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    user_cache.invalidate(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        user_cache.invalidate(old_email)
+
+@event.listens_for(models_db.User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    user_cache.invalidate(target.email)
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -33,12 +56,18 @@ async def get_current_user(
         if email is None:
             raise credentials_exception
             
+        current_user = user_cache.get(email)
+        if current_user is not None:
+            return current_user
+
         # Verifica que el usuario existe en la base de datos
-        user = crud.get_user_by_email(db, email)
+        user = await crud_async.get_user_by_email(db, email)
         if user is None:
             raise credentials_exception
-            
-        return email
+
+        current_user = CurrentUser(id=user.id, email=user.email, username=user.username)
+        user_cache.set(email, current_user)
+        return current_user
         
     except JWTError:
         raise credentials_exception
@@ -1,16 +1,309 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from typing import List
+"""
+Envío de correo por SMTP con un pool de conexiones reutilizables.
+
+smtplib es bloqueante, así que cada envío se ejecuta en un pool de hilos
+propio (como el de bcrypt en auth.py) y nunca en el event loop. Las conexiones
+quedan abiertas y autenticadas entre envíos: una conexión inactiva más de
+SMTP_IDLE_CHECK_SECONDS se comprueba con NOOP antes de usarla y, si el
+servidor la cerró, se abre otra. Todas las operaciones de red tienen el
+timeout SMTP_TIMEOUT.
+
+Los mensajes se transmiten por bloques (iter_message): la estructura MIME
+se genera con el paquete email y cada adjunto se lee del disco y se codifica
+en base64 mientras se envía el DATA, así que la memoria por envío no depende
+del tamaño de los adjuntos.
+
+La configuración se lee de variables de entorno:
+    SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_FROM,
+    SMTP_STARTTLS (true/false), SMTP_SSL (true/false), SMTP_TIMEOUT,
+    SMTP_POOL_SIZE, SMTP_IDLE_CHECK_SECONDS, SMTP_MAX_MESSAGES_PER_CONNECTION
+"""
+import asyncio
+import base64
 import os
+import queue
+import re
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email import policy
+from email.message import EmailMessage
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# Múltiplo de 57 bytes: cada bloque se codifica en líneas base64 completas de 76 caracteres
+ATTACHMENT_CHUNK_SIZE = 57 * 1152
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+@dataclass
+class SMTPSettings:
+    host: str = "localhost"
+    port: int = 587
+    username: Optional[str] = None
+    password: Optional[str] = None
+    sender: str = "no-reply@localhost"
+    starttls: bool = True
+    use_ssl: bool = False
+    timeout: float = 10.0
+    pool_size: int = 2
+    idle_check_seconds: float = 30.0
+    # Algunos servidores cortan la sesión tras N mensajes; 0 = sin límite
+    max_messages_per_connection: int = 100
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        username = os.getenv("SMTP_USERNAME") or None
+        return cls(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=username,
+            password=os.getenv("SMTP_PASSWORD") or None,
+            sender=os.getenv("SMTP_FROM") or username or "no-reply@localhost",
+            starttls=_env_bool("SMTP_STARTTLS", "true"),
+            use_ssl=_env_bool("SMTP_SSL", "false"),
+            timeout=float(os.getenv("SMTP_TIMEOUT", "10")),
+            pool_size=int(os.getenv("SMTP_POOL_SIZE", "2")),
+            idle_check_seconds=float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30")),
+            max_messages_per_connection=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")),
+        )
+
+class SMTPPoolTimeout(Exception):
+    """No se liberó ninguna conexión SMTP dentro del timeout."""
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+class SMTPConnectionPool:
+    def __init__(self, settings: SMTPSettings):
+        self.settings = settings
+        self.executor = ThreadPoolExecutor(max_workers=settings.pool_size, thread_name_prefix="smtp")
+        self._slots = threading.BoundedSemaphore(settings.pool_size)
+        self._idle = queue.LifoQueue()
+        self.connections_opened = 0
+
+    # --- Se ejecutan en los hilos del pool ---
+    def _connect(self) -> _Connection:
+        s = self.settings
+        context = ssl.create_default_context()
+        if s.use_ssl:
+            smtp = smtplib.SMTP_SSL(s.host, s.port, timeout=s.timeout, context=context)
+        else:
+            smtp = smtplib.SMTP(s.host, s.port, timeout=s.timeout)
+        try:
+            smtp.ehlo()
+            if s.starttls and not s.use_ssl:
+                smtp.starttls(context=context)
+                smtp.ehlo()
+            if s.username:
+                smtp.login(s.username, s.password or "")
+        except BaseException:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return _Connection(smtp)
+
+    def _is_alive(self, conn: _Connection) -> bool:
+        if time.monotonic() - conn.last_used < self.settings.idle_check_seconds:
+            return True
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self) -> _Connection:
+        if not self._slots.acquire(timeout=self.settings.timeout):
+            raise SMTPPoolTimeout("No hay conexiones SMTP disponibles")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_alive(conn):
+                    return conn
+                conn.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn: _Connection, broken: bool = False) -> None:
+        limit = self.settings.max_messages_per_connection
+        if broken or (limit and conn.sent >= limit):
+            conn.close()
+        else:
+            conn.last_used = time.monotonic()
+            self._idle.put(conn)
+        self._slots.release()
+
+    def _with_connection(self, fn: Callable[[smtplib.SMTP], dict]) -> dict:
+        """Ejecuta fn(smtp) con una conexión del pool; si el servidor la cerró, reintenta una vez con otra."""
+        for attempt in range(2):
+            conn = self._checkout()
+            try:
+                refused = fn(conn.smtp)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._checkin(conn, broken=True)
+                if attempt:
+                    raise
+                continue
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # El servidor respondió: la sesión sigue siendo válida tras RSET
+                try:
+                    conn.smtp.rset()
+                    self._checkin(conn)
+                except (smtplib.SMTPException, OSError):
+                    self._checkin(conn, broken=True)
+                raise
+            except BaseException:
+                self._checkin(conn, broken=True)
+                raise
+            conn.sent += 1
+            self._checkin(conn)
+            return refused
+
+    def _send(self, msg, recipients: List[str]) -> dict:
+        return self._with_connection(lambda smtp: smtp.send_message(msg, to_addrs=recipients))
+
+    def _send_stream(self, sender: str, recipients: List[str], chunks: Callable[[], Iterable[bytes]]) -> dict:
+        return self._with_connection(lambda smtp: _stream_transaction(smtp, sender, recipients, chunks()))
+
+    # --- API asíncrona ---
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def send_message(self, msg, recipients: List[str]) -> dict:
+        """Devuelve los destinatarios rechazados ({email: (código, mensaje)})."""
+        return await self.run(self._send, msg, recipients)
+
+    async def send_stream(self, sender: str, recipients: List[str], chunks: Callable[[], Iterable[bytes]]) -> dict:
+        """
+        Como send_message, pero el DATA se envía bloque a bloque desde
+        chunks() (ver iter_message). chunks se llama de nuevo si hay que
+        reintentar con otra conexión.
+        """
+        return await self.run(self._send_stream, sender, recipients, chunks)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool: Optional[SMTPConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Pool compartido de la aplicación; se crea con la configuración del entorno al primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool(SMTPSettings.from_env())
+        return _pool
+
+def close_smtp_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def _stream_transaction(smtp: smtplib.SMTP, sender: str, recipients: List[str], chunks: Iterable[bytes]) -> dict:
+    """MAIL, RCPT y DATA como smtplib.SMTP.sendmail, pero enviando el DATA por bloques."""
+    smtp.ehlo_or_helo_if_needed()
+    code, resp = smtp.mail(sender)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+    refused = {}
+    for recipient in recipients:
+        code, resp = smtp.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, resp)
+    if len(refused) == len(recipients):
+        raise smtplib.SMTPRecipientsRefused(refused)
+    code, resp = smtp.docmd("data")
+    if code != 354:
+        raise smtplib.SMTPDataError(code, resp)
+    for chunk in chunks:
+        smtp.send(chunk)
+    smtp.send(b".\r\n")
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+def _attachment_parts(attachments: Optional[list]) -> Iterator[tuple]:
+    # Rutas o tuplas (ruta, nombre a mostrar)
+    for attachment in attachments or []:
+        yield attachment if isinstance(attachment, tuple) else (attachment, os.path.basename(attachment))
+
+def _encode_file(file_path: str) -> Iterator[bytes]:
+    with open(file_path, "rb") as f:
+        while chunk := f.read(ATTACHMENT_CHUNK_SIZE):
+            yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+def iter_message(
+    sender: str,
+    recipients: List[str],
+    subject: str,
+    message: str,
+    attachments: Optional[list] = None
+) -> Iterator[bytes]:
+    """
+    Genera el mensaje MIME listo para el DATA de SMTP (CRLF y puntos
+    escapados). Cabeceras y cuerpo se construyen con EmailMessage; el
+    contenido de cada adjunto se sustituye por un marcador y al recorrer
+    el esqueleto se reemplaza por el archivo codificado por bloques.
+    """
+    msg = EmailMessage()
+    msg['From'] = sender
+    msg['To'] = ', '.join(recipients)
+    msg['Subject'] = subject
+    msg.set_content(message)
+
+    files = list(_attachment_parts(attachments))
+    markers = []
+    if files:
+        msg.make_mixed()
+        for index, (file_path, filename) in enumerate(files):
+            part = EmailMessage()
+            part['Content-Type'] = 'application/octet-stream'
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+            part['Content-Transfer-Encoding'] = 'base64'
+            marker = f"ATTACHMENT-{index}-{os.urandom(8).hex()}"
+            part.set_payload(marker)
+            msg.attach(part)
+            markers.append(marker.encode())
+
+    skeleton = msg.as_bytes(policy=policy.SMTP)
+    for marker, (file_path, _) in zip(markers, files):
+        head, skeleton = skeleton.split(marker, 1)
+        yield re.sub(rb"(?m)^\.", b"..", head)
+        # Las líneas base64 nunca empiezan por punto
+        yield from _encode_file(file_path)
+        # encodebytes ya terminó la última línea
+        skeleton = skeleton[2:] if skeleton.startswith(b"\r\n") else skeleton
+    if not skeleton.endswith(b"\r\n"):
+        skeleton += b"\r\n"
+    yield re.sub(rb"(?m)^\.", b"..", skeleton)
 
 class EmailSender:
-    def __init__(self):
-        self.email = "camilo.molano.moreno@gmail.com"
-        self.password = "gzyn cxqt aqck amvz"
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+    def __init__(self, pool: Optional[SMTPConnectionPool] = None):
+        self.pool = pool or get_smtp_pool()
+        self.email = self.pool.settings.sender
 
     async def send_email(
         self,
@@ -19,28 +312,11 @@ class EmailSender:
         message: str,
         attachments: List[str] = None
     ):
-        msg = MIMEMultipart()
-        msg['From'] = self.email
-        msg['To'] = ', '.join(recipients)
-        msg['Subject'] = subject
-
-        # Añadir el cuerpo del mensaje
-        msg.attach(MIMEText(message, 'plain'))
-
-        # Añadir archivos adjuntos si existen
-        if attachments:
-            for file_path in attachments:
-                with open(file_path, 'rb') as f:
-                    part = MIMEApplication(f.read(), Name=os.path.basename(file_path))
-                    part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-                    msg.attach(part)
-
-        # Enviar el email
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
+            # Los adjuntos se leen y codifican en los hilos del pool mientras se envían
+            await self.pool.send_stream(self.email, recipients, lambda: iter_message(
+                self.email, recipients, subject, message, attachments
+            ))
             return True
         except Exception as e:
-            raise Exception(f"Error al enviar el email: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error al enviar el email: {str(e)}")
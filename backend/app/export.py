@@ -0,0 +1,156 @@
+"""
+Exportación de contactos en streaming (CSV, NDJSON y vCard).
+
+Las filas se leen con yield_per desde un cursor del servidor como tuplas
+(sin objetos ORM ni validación de esquemas) y se escriben en bloques, de
+modo que la memoria no depende del tamaño de la agenda.
+"""
+import csv
+import io
+import json
+import re
+import zlib
+from typing import Callable, Iterator, Optional
+from sqlalchemy.orm import Session
+from app import crud, models_db
+
+FIELDS = [
+    "id", "nombre", "telefono", "email", "direccion", "lugar",
+    "tipo_contacto", "tipo_contacto_otro", "detalle_tipo", "detalle_tipo_otro",
+    "average_rating",
+]
+
+# Mismas cabeceras y separador que el CSV que genera el frontend
+CSV_HEADERS = [
+    "ID", "Nombre", "Teléfono", "Email", "Dirección", "Lugar",
+    "Tipo de Contacto", "Tipo de Contacto (Otro)", "Detalle del Tipo",
+    "Detalle del Tipo (Otro)", "Calificación Promedio",
+]
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "vcf": ("text/vcard; charset=utf-8", "vcf"),
+}
+
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+# Un valor que empieza por estos caracteres se evalúa como fórmula en Excel/LibreOffice
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# "+" seguido solo de dígitos es un teléfono, no una fórmula: se deja intacto
+# para que el CSV exportado se pueda volver a importar
+_PHONE_NUMBER = re.compile(r"\+[0-9]+")
+
+def iter_rows(
+    session_factory: Callable[[], Session],
+    owner_id: int,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None
+) -> Iterator[tuple]:
+    """
+    Recorre los contactos filtrados del usuario como tuplas en el orden de FIELDS.
+    Abre su propia sesión con `session_factory`: la de la petición ya está
+    cerrada cuando se envía el cuerpo.
+    """
+    db = session_factory()
+    try:
+        query = crud.query_contacts(db, owner_id, q, tipo_contacto, detalle_tipo)
+        columns = [getattr(models_db.Contact, field) for field in FIELDS]
+        query = query.with_entities(*columns).order_by(None).order_by(models_db.Contact.id)
+        for row in query.yield_per(YIELD_PER):
+            yield tuple(row)
+    finally:
+        db.close()
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not _PHONE_NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\n")
+    buffer.write("\ufeff")  # BOM para que Excel reconozca UTF-8
+    writer.writerow(CSV_HEADERS)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n"
+
+def _vcard_escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+    )
+
+def _vcard_lines(rows):
+    for row in rows:
+        contact = dict(zip(FIELDS, row))
+        lines = [
+            "BEGIN:VCARD",
+            "VERSION:3.0",
+            f"FN:{_vcard_escape(contact['nombre'] or '')}",
+            f"N:{_vcard_escape(contact['nombre'] or '')};;;;",
+        ]
+        if contact["telefono"]:
+            lines.append(f"TEL;TYPE=CELL:{_vcard_escape(contact['telefono'])}")
+        if contact["email"]:
+            lines.append(f"EMAIL;TYPE=INTERNET:{_vcard_escape(contact['email'])}")
+        if contact["direccion"] or contact["lugar"]:
+            lines.append(
+                f"ADR;TYPE=WORK:;;{_vcard_escape(contact['direccion'] or '')};"
+                f"{_vcard_escape(contact['lugar'] or '')};;;"
+            )
+        categorias = [
+            _vcard_escape(contact[field])
+            for field in ("tipo_contacto", "detalle_tipo")
+            if contact[field]
+        ]
+        if categorias:
+            lines.append(f"CATEGORIES:{','.join(categorias)}")
+        lines.append("END:VCARD")
+        yield "\r\n".join(lines) + "\r\n"
+
+_WRITERS = {
+    "csv": _csv_lines,
+    "ndjson": _ndjson_lines,
+    "vcf": _vcard_lines,
+}
+
+def _chunked(pieces: Iterator[str]) -> Iterator[bytes]:
+    """Agrupa las líneas en bloques de ~CHUNK_SIZE bytes."""
+    parts, size = [], 0
+    for piece in pieces:
+        data = piece.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = contenedor gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(rows: Iterator[tuple], export_format: str, gzip: bool = False) -> Iterator[bytes]:
+    chunks = _chunked(_WRITERS[export_format](rows))
+    return _gzipped(chunks) if gzip else chunks
@@ -0,0 +1,176 @@
+"""
+Miniaturas de las fotos de contacto.
+
+Tras guardar una imagen, una tarea en segundo plano genera un juego de
+miniaturas cuadradas (THUMBNAIL_SIZES) en el formato original y en WebP dentro
+de uploads/thumbs/, y las registra en contacts.thumbnails solo si el contacto
+sigue teniendo esa misma imagen. Las miniaturas se nombran con el hash de la
+imagen, así que los contactos que comparten foto comparten miniaturas.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import update
+from app import models_db, storage
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = storage.UPLOAD_DIR / "thumbs"
+
+# Lado en píxeles de cada variante (las fotos se muestran como avatares cuadrados)
+THUMBNAIL_SIZES = {
+    "sm": int(os.getenv("THUMBNAIL_SIZE_SM", "64")),
+    "md": int(os.getenv("THUMBNAIL_SIZE_MD", "160")),
+    "lg": int(os.getenv("THUMBNAIL_SIZE_LG", "480")),
+}
+JPEG_QUALITY = int(os.getenv("THUMBNAIL_JPEG_QUALITY", "82"))
+WEBP_QUALITY = int(os.getenv("THUMBNAIL_WEBP_QUALITY", "80"))
+
+def _variant_paths(imagen: str, size: str):
+    stem = Path(imagen).stem
+    # Las imágenes con transparencia o animación se reducen a PNG; el resto a JPEG
+    fallback_ext = ".jpg" if Path(imagen).suffix.lower() in (".jpg", ".jpeg") else ".png"
+    return THUMBNAIL_DIR / f"{stem}_{size}{fallback_ext}", THUMBNAIL_DIR / f"{stem}_{size}.webp"
+
+def _url(path: Path) -> str:
+    return storage.image_url(path.relative_to(storage.UPLOAD_DIR).as_posix())
+
+def _existing_variants(imagen: str) -> Optional[dict]:
+    variants = {}
+    for size in THUMBNAIL_SIZES:
+        fallback_path, webp_path = _variant_paths(imagen, size)
+        if not (fallback_path.exists() and webp_path.exists()):
+            return None
+        with Image.open(fallback_path) as thumb:
+            width, height = thumb.size
+        variants[size] = {
+            "url": _url(fallback_path),
+            "webp": _url(webp_path),
+            "width": width,
+            "height": height,
+        }
+    return variants
+
+def generate_variants(imagen: str, force: bool = False) -> dict:
+    """
+    Genera las miniaturas de `imagen` y devuelve
+    {tamaño: {"url", "webp", "width", "height"}}. Si ya existen (otra
+    referencia a la misma imagen) las reutiliza salvo que `force` sea True.
+    Lanza ValueError si el archivo no es una imagen válida.
+    """
+    if not force and storage.content_hash(imagen):
+        existing = _existing_variants(imagen)
+        if existing:
+            return existing
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        with Image.open(storage.local_path(imagen)) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ("RGBA", "LA", "P")
+            base = original.convert("RGBA" if has_alpha else "RGB")
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"No se pudo leer la imagen {imagen}: {e}")
+
+    variants = {}
+    for size, side in THUMBNAIL_SIZES.items():
+        thumb = ImageOps.fit(base, (side, side), Image.LANCZOS)
+        fallback_path, webp_path = _variant_paths(imagen, size)
+        if fallback_path.suffix == ".jpg":
+            thumb.convert("RGB").save(fallback_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            thumb.save(fallback_path, "PNG", optimize=True)
+        thumb.save(webp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        variants[size] = {
+            "url": _url(fallback_path),
+            "webp": _url(webp_path),
+            "width": thumb.width,
+            "height": thumb.height,
+        }
+    return variants
+
+def remove_variants(imagen: Optional[str]) -> None:
+    """Elimina las miniaturas de una imagen (si existen)."""
+    if not imagen:
+        return
+    for size in THUMBNAIL_SIZES:
+        for path in _variant_paths(imagen, size):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("No se pudo eliminar la miniatura %s: %s", path, e)
+
+def delete_image(imagen: Optional[str]) -> None:
+    """Elimina del disco una imagen sin referencias y sus miniaturas."""
+    if not imagen:
+        return
+    try:
+        storage.local_path(imagen).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("No se pudo eliminar la imagen %s: %s", imagen, e)
+    remove_variants(imagen)
+
+def process_contact_image(contact_id: int, imagen: str, force: bool = False) -> bool:
+    """
+    Tarea en segundo plano: genera las miniaturas y las registra en el
+    contacto. Si la imagen del contacto cambió mientras tanto (o el contacto
+    se eliminó) y nadie más la usa, descarta las miniaturas generadas.
+    """
+    try:
+        variants = generate_variants(imagen, force)
+    except Exception as e:
+        logger.warning("No se generaron miniaturas para el contacto %s: %s", contact_id, e)
+        return False
+
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(models_db.Contact)
+            .where(models_db.Contact.id == contact_id, models_db.Contact.imagen == imagen)
+            .values(thumbnails=variants)
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return True
+        if not storage.is_referenced(db, imagen):
+            remove_variants(imagen)
+        return False
+    finally:
+        db.close()
+
+def migrate_legacy_images(db) -> dict:
+    """
+    Pasa las imágenes con nombre antiguo (<usuario>_<nombre>_<aleatorio>.<ext>)
+    al almacenamiento por contenido: reescribe contacts.imagen, une los
+    duplicados en un solo archivo, recalcula las referencias y borra los
+    archivos antiguos y sus miniaturas. Las miniaturas nuevas quedan pendientes
+    (thumbnails en None).
+    """
+    Contact = models_db.Contact
+    contactos = db.query(Contact).filter(Contact.imagen.isnot(None)).all()
+    nuevas, faltantes = {}, 0
+    for contacto in contactos:
+        if storage.content_hash(contacto.imagen):
+            continue
+        antigua = contacto.imagen
+        if antigua not in nuevas:
+            path = storage.local_path(antigua)
+            if not path.exists():
+                faltantes += 1
+                continue
+            with path.open("rb") as fileobj:
+                nuevas[antigua] = storage.save_file(fileobj, path.suffix)
+        contacto.imagen = nuevas[antigua]
+        contacto.thumbnails = None
+    db.commit()
+    storage.rebuild_refcounts(db)
+
+    for antigua in nuevas:
+        delete_image(antigua)
+    return {
+        "migradas": len(nuevas),
+        "archivos": len(set(nuevas.values())),
+        "faltantes": faltantes,
+    }
@@ -0,0 +1,210 @@
+"""
+Importación masiva de contactos desde CSV, NDJSON o vCard.
+
+El archivo se lee en streaming fila a fila; cada fila se valida con
+schemas.ContactCreate y TIPO_DETALLE_MAPPING y las válidas se insertan en
+bloques de IMPORT_CHUNK_SIZE, cada uno en su propia transacción.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import re
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app import crud, schemas
+from app.database import SessionLocal
+from app.export import CSV_HEADERS, FIELDS, FORMULA_PREFIXES
+from app.jobs import Job, finish_job
+from app.models import TIPO_DETALLE_MAPPING
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Archivos más grandes se procesan en segundo plano y se consulta su progreso
+IMPORT_SYNC_MAX_BYTES = int(os.getenv("IMPORT_SYNC_MAX_BYTES", str(1024 * 1024)))
+MAX_REPORTED_ERRORS = 1000
+
+FORMAT_BY_EXTENSION = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".vcf": "vcf",
+    ".vcard": "vcf",
+}
+
+IMPORTABLE_FIELDS = {
+    "nombre", "telefono", "email", "direccion", "lugar", "tipo_contacto",
+    "tipo_contacto_otro", "detalle_tipo", "detalle_tipo_otro",
+}
+
+# Acepta tanto los nombres de campo como las cabeceras del CSV exportado
+HEADER_TO_FIELD = {field: field for field in IMPORTABLE_FIELDS}
+HEADER_TO_FIELD.update({
+    header: field
+    for header, field in zip(CSV_HEADERS, FIELDS)
+    if field in IMPORTABLE_FIELDS
+})
+
+_PHONE_SEPARATORS = re.compile(r"[\s().-]")
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    if requested:
+        return requested
+    return FORMAT_BY_EXTENSION.get(Path(filename or "").suffix.lower())
+
+def _clean(data: dict) -> dict:
+    cleaned = {}
+    for key, value in data.items():
+        field = HEADER_TO_FIELD.get((key or "").strip())
+        if field is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            # Deshace el escape de fórmulas que añade la exportación CSV
+            if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+                value = value[1:]
+        cleaned[field] = value if value not in ("", None) else None
+    if cleaned.get("telefono"):
+        cleaned["telefono"] = _PHONE_SEPARATORS.sub("", str(cleaned["telefono"]))
+    return cleaned
+
+def _parse_csv(text) -> Iterator[Tuple[int, dict]]:
+    header_line = text.readline()
+    delimiter = ";" if header_line.count(";") >= header_line.count(",") else ","
+    reader = csv.DictReader(itertools.chain([header_line], text), delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num, row
+
+def _parse_ndjson(text) -> Iterator[Tuple[int, dict]]:
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        yield line_number, data if isinstance(data, dict) else None
+
+def _vcard_unescape(value: str) -> str:
+    return (
+        value.replace("\\n", "\n").replace("\\N", "\n")
+        .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+    )
+
+def _vcard_lines(text) -> Iterator[Tuple[int, str]]:
+    """Une las líneas plegadas (las que empiezan con espacio o tabulación)."""
+    current, start = None, 0
+    for line_number, line in enumerate(text, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, line_number
+    if current is not None:
+        yield start, current
+
+def _parse_vcard(text) -> Iterator[Tuple[int, dict]]:
+    card, start = None, 0
+    for line_number, line in _vcard_lines(text):
+        name, _, value = line.partition(":")
+        prop = name.split(";")[0].upper()
+        if prop == "BEGIN":
+            card, start = {}, line_number
+        elif prop == "END" and card is not None:
+            yield start, card
+            card = None
+        elif card is None:
+            continue
+        elif prop == "FN":
+            card["nombre"] = _vcard_unescape(value)
+        elif prop == "TEL" and "telefono" not in card:
+            card["telefono"] = value
+        elif prop == "EMAIL" and "email" not in card:
+            card["email"] = value
+        elif prop == "ADR":
+            parts = re.split(r"(?<!\\);", value)
+            parts += [""] * (7 - len(parts))
+            card["direccion"] = _vcard_unescape(parts[2])
+            card["lugar"] = _vcard_unescape(parts[3])
+        elif prop == "CATEGORIES":
+            categorias = [_vcard_unescape(c) for c in re.split(r"(?<!\\),", value)]
+            card["tipo_contacto"] = categorias[0]
+            if len(categorias) > 1:
+                card["detalle_tipo"] = categorias[1]
+
+_PARSERS = {
+    "csv": _parse_csv,
+    "ndjson": _parse_ndjson,
+    "vcf": _parse_vcard,
+}
+
+def parse_rows(fileobj: BinaryIO, import_format: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Recorre el archivo como (número de línea, datos del contacto).
+    Los datos son None si la fila no se pudo leer.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    for line_number, data in _PARSERS[import_format](text):
+        yield line_number, _clean(data) if data is not None else None
+
+def validate_row(data: dict):
+    """Devuelve (datos listos para insertar, None) o (None, lista de errores)."""
+    try:
+        contacto = schemas.ContactCreate(**data)
+    except ValidationError as e:
+        return None, [
+            {"field": str(error["loc"][-1]) if error["loc"] else None, "message": error["msg"]}
+            for error in e.errors()
+        ]
+    tipo, detalle = contacto.tipo_contacto, contacto.detalle_tipo
+    if tipo and detalle and detalle not in TIPO_DETALLE_MAPPING[tipo]:
+        return None, [{
+            "field": "detalle_tipo",
+            "message": f"'{detalle.value}' no corresponde al tipo '{tipo.value}'"
+        }]
+    return contacto.model_dump(mode="json", exclude={"imagen"}), None
+
+def _report_error(job: Job, line_number: int, errors) -> None:
+    job.failed += 1
+    if len(job.errors) < MAX_REPORTED_ERRORS:
+        job.errors.append({"row": line_number, "errors": errors})
+    else:
+        job.errors_truncated += 1
+
+def import_contacts(db: Session, job: Job, fileobj: BinaryIO, import_format: str) -> Job:
+    """Procesa el archivo completo actualizando el progreso en `job`."""
+    job.status = "running"
+    chunk = []
+    try:
+        for line_number, data in parse_rows(fileobj, import_format):
+            job.processed += 1
+            if data is None:
+                _report_error(job, line_number, [{"field": None, "message": "Fila con formato inválido"}])
+                continue
+            contacto, errors = validate_row(data)
+            if errors:
+                _report_error(job, line_number, errors)
+                continue
+            chunk.append(contacto)
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                job.succeeded += len(crud.bulk_create_contacts(db, chunk, job.owner_id))
+                chunk = []
+        job.succeeded += len(crud.bulk_create_contacts(db, chunk, job.owner_id))
+        finish_job(job)
+    except Exception as e:
+        finish_job(job, "failed", f"Error al importar: {str(e)}")
+    return job
+
+def run_import_job(job: Job, path: str, import_format: str) -> None:
+    """Tarea en segundo plano: importa desde un archivo temporal y lo elimina."""
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as fileobj:
+            import_contacts(db, job, fileobj, import_format)
+    finally:
+        db.close()
+        os.remove(path)
@@ -0,0 +1,51 @@
+"""
+Registro en memoria de trabajos en segundo plano (importaciones, etc.).
+
+Los trabajos viven en el proceso que los creó; el cliente consulta su
+progreso con el id devuelto al encolarlos.
+"""
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MAX_JOBS = 500
+
+@dataclass
+class Job:
+    id: str
+    owner_id: int
+    kind: str
+    status: str = "pending"          # pending | running | done | failed
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    errors_truncated: int = 0
+    message: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+_jobs: Dict[str, Job] = {}
+_lock = threading.Lock()
+
+def create_job(owner_id: int, kind: str) -> Job:
+    job = Job(id=uuid.uuid4().hex, owner_id=owner_id, kind=kind)
+    with _lock:
+        # Se descartan los trabajos más antiguos para acotar la memoria
+        while len(_jobs) >= MAX_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+        _jobs[job.id] = job
+    return job
+
+def get_job(job_id: str, owner_id: int) -> Optional[Job]:
+    job = _jobs.get(job_id)
+    if job is None or job.owner_id != owner_id:
+        return None
+    return job
+
+def finish_job(job: Job, status: str = "done", message: Optional[str] = None) -> None:
+    job.status = status
+    job.message = message
+    job.finished_at = datetime.utcnow()
@@ -0,0 +1,123 @@
+"""
+Combinación de correspondencia: un correo personalizado por contacto.
+
+La plantilla (asunto y cuerpo) usa marcadores como {nombre} o {lugar}; los
+contactos se leen con los mismos filtros del listado en bloques por id
+(MAIL_MERGE_CHUNK_SIZE), cada bloque se renderiza y se encola en la bandeja
+de salida en una transacción, y se descarta antes de leer el siguiente. Así
+la memoria no depende del número de destinatarios. La entrega la hace el
+worker de outbox.py, que respeta EMAIL_RATE_PER_SECOND.
+"""
+import os
+import string
+from typing import Iterator, List, Optional
+from app import crud, models_db, outbox
+from app.database import SessionLocal
+from app.jobs import Job, finish_job
+
+MAIL_MERGE_CHUNK_SIZE = int(os.getenv("MAIL_MERGE_CHUNK_SIZE", "500"))
+
+MERGE_FIELDS = (
+    "nombre", "email", "telefono", "direccion", "lugar",
+    "tipo_contacto", "tipo_contacto_otro", "detalle_tipo", "detalle_tipo_otro",
+)
+
+def template_errors(template: str) -> List[str]:
+    """
+    Errores de la plantilla: llaves mal cerradas, marcadores desconocidos o
+    con formato ({nombre:>20}, {nombre!r}). Solo se admite {campo}.
+    """
+    try:
+        fields = [
+            (field, spec, conversion)
+            for _, field, spec, conversion in string.Formatter().parse(template)
+            if field is not None
+        ]
+    except ValueError as e:
+        return [f"Plantilla inválida: {e}"]
+    errors = []
+    for field, spec, conversion in dict.fromkeys(fields):
+        if field not in MERGE_FIELDS:
+            errors.append(f"Marcador desconocido {{{field}}}. Use: {', '.join(MERGE_FIELDS)}")
+        elif spec or conversion:
+            errors.append(f"El marcador {{{field}}} no admite formato; use {{{field}}}")
+    return errors
+
+def render(template: str, contact: dict) -> str:
+    """Sustituye cada {campo} por su valor ("" si no tiene). No aplica formatos."""
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append(literal)
+        if field is not None:
+            value = contact.get(field)
+            parts.append("" if value is None else str(value))
+    return "".join(parts)
+
+def iter_chunks(
+    owner_id: int,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None,
+    chunk_size: Optional[int] = None
+) -> Iterator[List[dict]]:
+    """
+    Recorre los contactos filtrados en bloques ordenados por id (paginación por
+    clave, sin cursor abierto entre bloques).
+    """
+    chunk_size = chunk_size or MAIL_MERGE_CHUNK_SIZE
+    columns = [models_db.Contact.id] + [getattr(models_db.Contact, field) for field in MERGE_FIELDS]
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            query = crud.query_contacts(db, owner_id, q, tipo_contacto, detalle_tipo)
+            rows = (
+                query.with_entities(*columns)
+                .filter(models_db.Contact.id > last_id)
+                .order_by(None).order_by(models_db.Contact.id)
+                .limit(chunk_size).all()
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [dict(zip(MERGE_FIELDS, row[1:])) for row in rows]
+    finally:
+        db.close()
+
+def run_merge_job(
+    job: Job,
+    subject: str,
+    template: str,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None
+) -> Job:
+    """
+    Tarea en segundo plano: encola un correo por contacto con email. En `job`,
+    processed cuenta los contactos leídos, succeeded los encolados y failed
+    los omitidos por no tener email.
+    """
+    job.status = "running"
+    db = SessionLocal()
+    try:
+        for contacts in iter_chunks(job.owner_id, q, tipo_contacto, detalle_tipo):
+            job.processed += len(contacts)
+            messages = [
+                {
+                    "email": contact["email"],
+                    # Un salto de línea en los datos del contacto no puede llegar a la cabecera
+                    "subject": " ".join(render(subject, contact).splitlines()),
+                    "body": render(template, contact),
+                }
+                for contact in contacts if contact["email"]
+            ]
+            job.failed += len(contacts) - len(messages)
+            job.succeeded += outbox.enqueue_many(db, job.owner_id, messages, merge_id=job.id)
+            # El worker empieza a entregar mientras se encolan los siguientes bloques
+            outbox.notify()
+        finish_job(job)
+    except Exception as e:
+        finish_job(job, "failed", f"Error en la combinación de correspondencia: {str(e)}")
+    finally:
+        db.close()
+    return job
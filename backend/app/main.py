@@ -1,20 +1,70 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
-from app.database import engine
+from app.database import SessionLocal, engine, upgrade_schema
 from app.models_db import Base
 from app.routes import router as contactos_router
 from app.auth_routes import router as auth_router  # Añadir esta línea
+from app.static import ImageFiles
+from app import counters, crud, outbox, rating_stats, rollups, search, upload_gc
+from app.auth import REFRESH_TOKEN_PURGE_INTERVAL_HOURS
+from app.email_utils import close_smtp_pool
+
+logger = logging.getLogger(__name__)
 
 # --- Crea tablas en la base de datos al iniciar ---
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+# --- Llena las tablas derivadas que una base de datos anterior no tenía ---
+with SessionLocal() as db:
+    search.backfill_index(db)
+    counters.backfill_counts(db)
+    rating_stats.backfill_stats(db)
+    rollups.backfill_rollups(db)
+
+def purge_refresh_tokens() -> int:
+    with SessionLocal() as db:
+        return crud.purge_expired_refresh_tokens(db)
+
+async def purge_refresh_tokens_periodically(interval_hours: float) -> None:
+    """Tarea en segundo plano de la aplicación: elimina los tokens de refresco vencidos."""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            total = await run_in_threadpool(purge_refresh_tokens)
+            logger.info("Tokens de refresco vencidos eliminados: %s", total)
+        except Exception as e:
+            logger.warning("La limpieza de tokens de refresco falló: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Limpieza periódica de uploads/ (desactivada si UPLOAD_GC_INTERVAL_HOURS es 0)
+    gc_task = None
+    if upload_gc.UPLOAD_GC_INTERVAL_HOURS > 0:
+        gc_task = asyncio.create_task(upload_gc.run_periodically(upload_gc.UPLOAD_GC_INTERVAL_HOURS))
+    # Limpieza periódica de tokens de refresco (desactivada si REFRESH_TOKEN_PURGE_INTERVAL_HOURS es 0)
+    tokens_task = None
+    if REFRESH_TOKEN_PURGE_INTERVAL_HOURS > 0:
+        tokens_task = asyncio.create_task(purge_refresh_tokens_periodically(REFRESH_TOKEN_PURGE_INTERVAL_HOURS))
+    # Worker de la bandeja de salida de correo (EMAIL_WORKER_ENABLED)
+    email_task = asyncio.create_task(outbox.run_worker()) if outbox.EMAIL_WORKER_ENABLED else None
+    yield
+    for task in (gc_task, tokens_task, email_task):
+        if task:
+            task.cancel()
+    # Cierra las conexiones SMTP abiertas del pool
+    close_smtp_pool()
 
-app = FastAPI(title="API Contactos MVP")
+app = FastAPI(title="API Contactos MVP", lifespan=lifespan)
 
 # --- Middleware CORS (ajusta el origen según necesites) ---
 app.add_middleware(
@@ -30,7 +80,8 @@ uploads_dir = Path("uploads")
 uploads_dir.mkdir(exist_ok=True)
 
 # Montar el directorio de uploads para servir archivos estáticos
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# (con Cache-Control, ETag y negociación de WebP, ver app/static.py)
+app.mount("/uploads", ImageFiles(directory="uploads"), name="uploads")
 
 # --- Handlers de errores de validación y HTTP ---
 @app.exception_handler(RequestValidationError)
@@ -54,6 +105,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(Exception)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Text, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -15,12 +15,19 @@ class Rating(Base):
     
     contact = relationship("Contact", back_populates="ratings")
 
+    # Historial por contacto ordenado por fecha (el id va implícito en SQLite)
+    __table_args__ = (
+        Index("ix_ratings_contact_fecha", "contact_id", "fecha"),
+    )
+
 class Contact(Base):
     __tablename__ = "contacts"
 
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String)
     imagen = Column(Text, nullable=True)
+    # Miniaturas generadas en segundo plano a partir de imagen (ver images.py)
+    thumbnails = Column(JSON(none_as_null=True), nullable=True)
     telefono = Column(String)
     email = Column(String, nullable=True)
     direccion = Column(String, nullable=True)
@@ -33,6 +40,19 @@ class Contact(Base):
     owner = relationship("User", back_populates="contacts")
     ratings = relationship("Rating", back_populates="contact", cascade="all, delete")
     average_rating = Column(Float, nullable=True)
+    # Agregados de calificaciones: average_rating = ratings_sum / ratings_count
+    ratings_count = Column(Integer, nullable=False, default=0, server_default="0")
+    ratings_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_stats = relationship("ContactRatingStat", cascade="all, delete")
+    rating_rollups = relationship("RatingRollup", cascade="all, delete")
+
+    # Índices para el listado paginado por cursor (el id va implícito en SQLite)
+    __table_args__ = (
+        Index("ix_contacts_owner_nombre", "owner_id", "nombre"),
+        Index("ix_contacts_owner_average_rating", "owner_id", "average_rating"),
+        # Ranking por tipo: top-N como recorrido de rango del índice
+        Index("ix_contacts_owner_tipo_average_rating", "owner_id", "tipo_contacto", "average_rating"),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -42,3 +62,130 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     contacts = relationship("Contact", back_populates="owner")
+
+class RefreshToken(Base):
+    """
+    Token de refresco rotativo. Solo se guarda el SHA-256 del token; cada uso lo
+    revoca y emite uno nuevo (replaced_by_id).
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, ForeignKey("refresh_tokens.id"), nullable=True)
+
+class ContactCount(Base):
+    """
+    Contador de contactos por usuario, tipo y detalle.
+    Los valores nulos se guardan como "" para poder formar la clave primaria.
+    """
+    __tablename__ = "contact_counts"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tipo_contacto = Column(String, primary_key=True, default="")
+    detalle_tipo = Column(String, primary_key=True, default="")
+    total = Column(Integer, nullable=False, default=0)
+
+class ContactRatingStat(Base):
+    """
+    Agregados de calificaciones por contacto y categoría (tabla materializada
+    para los scorecards). Se actualizan en la misma transacción que inserta
+    las calificaciones.
+    """
+    __tablename__ = "contact_rating_stats"
+
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), primary_key=True)
+    categoria = Column(String, primary_key=True)
+    ratings_count = Column(Integer, nullable=False, default=0)
+    ratings_sum = Column(Integer, nullable=False, default=0)
+    min_rating = Column(Integer, nullable=True)
+    max_rating = Column(Integer, nullable=True)
+    last_rated_at = Column(DateTime, nullable=True)
+
+class RatingRollup(Base):
+    """
+    Calificaciones por contacto, categoría y periodo (día, semana o mes) para
+    las series de tendencia. owner_id se guarda para consultar todo el usuario
+    sin unir con contacts.
+    """
+    __tablename__ = "rating_rollups"
+
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), primary_key=True)
+    categoria = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)   # day | week | month
+    bucket_start = Column(Date, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    ratings_count = Column(Integer, nullable=False, default=0)
+    ratings_sum = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_rating_rollups_owner_granularity_bucket", "owner_id", "granularity", "bucket_start"),
+    )
+
+class StoredImage(Base):
+    """
+    Imagen guardada por contenido (uploads/ab/cd/<sha256>.<ext>) y cuántos
+    contactos la usan. El archivo se borra cuando refcount llega a cero.
+    """
+    __tablename__ = "stored_images"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)      # Relativa a uploads/
+    size = Column(Integer, nullable=True)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxMessage(Base):
+    """
+    Correo pendiente de envío (bandeja de salida). El worker de outbox.py lo
+    entrega en segundo plano y reintenta con espera exponencial; tras
+    EMAIL_MAX_ATTEMPTS intentos queda en estado "dead".
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | sending | sent | partial | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    # Trabajo de combinación de correspondencia que generó el mensaje (ver mail_merge.py)
+    merge_id = Column(String(32), nullable=True)
+
+    recipients = relationship("OutboxRecipient", cascade="all, delete-orphan", order_by="OutboxRecipient.id")
+    attachments = relationship("OutboxAttachment", cascade="all, delete-orphan", order_by="OutboxAttachment.id")
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_email_outbox_owner_status", "owner_id", "status"),
+        Index("ix_email_outbox_merge_status", "merge_id", "status"),
+    )
+
+class OutboxRecipient(Base):
+    __tablename__ = "email_outbox_recipients"
+
+    id = Column(Integer, primary_key=True)
+    message_id = Column(Integer, ForeignKey("email_outbox.id", ondelete="CASCADE"), nullable=False, index=True)
+    email = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | sent | failed
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+class OutboxAttachment(Base):
+    """Adjunto guardado en EMAIL_OUTBOX_DIR hasta que el correo se entrega."""
+    __tablename__ = "email_outbox_attachments"
+
+    id = Column(Integer, primary_key=True)
+    message_id = Column(Integer, ForeignKey("email_outbox.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String, nullable=False)   # Nombre original (el del cliente)
+    path = Column(String, nullable=False)       # Nombre único dentro de EMAIL_OUTBOX_DIR
+    size = Column(Integer, nullable=True)
@@ -0,0 +1,404 @@
+"""
+Bandeja de salida de correo.
+
+POST /send-email guarda el mensaje, sus destinatarios y sus adjuntos
+(enqueue) y responde 202; el worker (run_worker, iniciado en main.py) los
+entrega en segundo plano con el pool SMTP de email_utils:
+
+- Reclama hasta EMAIL_WORKER_CONCURRENCY mensajes vencidos con un UPDATE
+  condicional, de modo que dos workers no envían el mismo mensaje. Un
+  mensaje que quedó en "sending" más de EMAIL_LOCK_TIMEOUT_SECONDS (el
+  proceso se detuvo a mitad de envío) se vuelve a reclamar.
+- Cada destinatario tiene su estado: los rechazos 5xx lo marcan "failed";
+  los 4xx y los fallos de conexión lo dejan "pending" para el reintento.
+- Los envíos se limitan a EMAIL_RATE_PER_SECOND mensajes por segundo
+  (0 = sin límite) para no superar la cuota del servidor SMTP.
+- Los reintentos esperan EMAIL_RETRY_BASE_SECONDS * 2^(intento - 1), hasta
+  EMAIL_RETRY_MAX_SECONDS. Tras EMAIL_MAX_ATTEMPTS el mensaje queda "dead"
+  (dead-letter) y se puede reencolar con requeue.
+
+Los mensajes "dead" se eliminan, con sus adjuntos, EMAIL_DEAD_RETENTION_DAYS
+días después del último intento (purge_dead, desde el worker o la CLI).
+
+Los adjuntos se reciben por bloques en EMAIL_OUTBOX_DIR (fuera de uploads/,
+que es público) con nombres únicos, hasta EMAIL_ATTACHMENT_MAX_BYTES por
+archivo y EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES por mensaje, y se borran cuando
+el mensaje se entrega. Al enviar se codifican en base64 mientras se
+transmiten (email_utils.iter_message), sin cargarlos enteros en memoria.
+"""
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+from app import email_utils, models_db
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DIR = Path(os.getenv("EMAIL_OUTBOX_DIR", "outbox"))
+EMAIL_WORKER_ENABLED = os.getenv("EMAIL_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+EMAIL_WORKER_CONCURRENCY = int(os.getenv("EMAIL_WORKER_CONCURRENCY", "4"))
+EMAIL_WORKER_POLL_SECONDS = float(os.getenv("EMAIL_WORKER_POLL_SECONDS", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+EMAIL_LOCK_TIMEOUT_SECONDS = float(os.getenv("EMAIL_LOCK_TIMEOUT_SECONDS", "600"))
+EMAIL_RATE_PER_SECOND = float(os.getenv("EMAIL_RATE_PER_SECOND", "0"))
+EMAIL_ATTACHMENT_MAX_BYTES = int(os.getenv("EMAIL_ATTACHMENT_MAX_BYTES", str(10 * 1024 * 1024)))
+EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES = int(os.getenv("EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES", str(25 * 1024 * 1024)))
+# 0 conserva los mensajes "dead" indefinidamente
+EMAIL_DEAD_RETENTION_DAYS = float(os.getenv("EMAIL_DEAD_RETENTION_DAYS", "30"))
+EMAIL_PURGE_INTERVAL_SECONDS = 3600
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+class RateLimiter:
+    """Espacia las llamadas a acquire() para no pasar de `rate` por segundo."""
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # Sin await entre leer y reservar el turno: no necesita lock en el event loop
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + 1 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+_rate_limiter = RateLimiter(EMAIL_RATE_PER_SECOND)
+
+def new_attachment_path() -> Path:
+    """Ruta única en la bandeja de salida para guardar un adjunto."""
+    OUTBOX_DIR.mkdir(parents=True, exist_ok=True)
+    return OUTBOX_DIR / uuid.uuid4().hex
+
+class AttachmentTooLarge(ValueError):
+    """Los adjuntos superan EMAIL_ATTACHMENT_MAX_BYTES o EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES."""
+
+def _write_chunk(buffer, chunk: bytes) -> None:
+    buffer.write(chunk)
+
+async def spool_attachments(
+    uploads,
+    max_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None
+) -> List[dict]:
+    """
+    Copia los UploadFile a la bandeja de salida por bloques (lectura asíncrona,
+    escritura en el threadpool) y devuelve filename, path y size de cada uno.
+    Si alguno supera los límites lanza AttachmentTooLarge y borra lo copiado.
+    """
+    max_bytes = EMAIL_ATTACHMENT_MAX_BYTES if max_bytes is None else max_bytes
+    max_total_bytes = EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES if max_total_bytes is None else max_total_bytes
+    saved, total = [], 0
+    try:
+        for upload in uploads:
+            path = new_attachment_path()
+            saved.append({"filename": upload.filename, "path": path.name, "size": 0})
+            with open(path, "wb") as buffer:
+                while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                    saved[-1]["size"] += len(chunk)
+                    total += len(chunk)
+                    if saved[-1]["size"] > max_bytes:
+                        raise AttachmentTooLarge(
+                            f"El adjunto {upload.filename} supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB"
+                        )
+                    if total > max_total_bytes:
+                        raise AttachmentTooLarge(
+                            f"Los adjuntos superan en total {max_total_bytes // (1024 * 1024)} MB"
+                        )
+                    await run_in_threadpool(_write_chunk, buffer, chunk)
+    except BaseException:
+        _remove_files(attachment["path"] for attachment in saved)
+        raise
+    return saved
+
+def _remove_files(paths) -> None:
+    for path in paths:
+        try:
+            (OUTBOX_DIR / path).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("No se pudo eliminar el adjunto %s: %s", path, e)
+
+def retry_delay(attempts: int) -> float:
+    """Espera antes del siguiente intento (exponencial con un 10 % de variación)."""
+    delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.9, 1.1)
+
+# ------------------ Encolar y consultar ------------------
+def header_error(value: str) -> Optional[str]:
+    """Mensaje de error si `value` no puede ir en una cabecera (saltos de línea)."""
+    if "\r" in value or "\n" in value:
+        return "No puede contener saltos de línea"
+    return None
+
+def enqueue(
+    db: Session,
+    owner_id: int,
+    subject: str,
+    body: str,
+    recipients: List[str],
+    attachments: Optional[List[dict]] = None
+) -> models_db.OutboxMessage:
+    """
+    Guarda el mensaje en la bandeja de salida. `attachments` son dicts con
+    filename, path (relativa a OUTBOX_DIR) y size de archivos ya escritos.
+    """
+    message = models_db.OutboxMessage(
+        owner_id=owner_id,
+        subject=subject,
+        body=body,
+        recipients=[models_db.OutboxRecipient(email=email) for email in dict.fromkeys(recipients)],
+        attachments=[models_db.OutboxAttachment(**attachment) for attachment in attachments or []],
+    )
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    return message
+
+def enqueue_many(db: Session, owner_id: int, messages: List[dict], merge_id: Optional[str] = None) -> int:
+    """
+    Encola en una sola transacción mensajes de un destinatario (dicts con
+    subject, body y email). Devuelve cuántos se guardaron.
+    """
+    db.add_all([
+        models_db.OutboxMessage(
+            owner_id=owner_id,
+            subject=message["subject"],
+            body=message["body"],
+            merge_id=merge_id,
+            recipients=[models_db.OutboxRecipient(email=message["email"])],
+        )
+        for message in messages
+    ])
+    db.commit()
+    # Los objetos ya no se necesitan: no se acumulan en la sesión
+    db.expunge_all()
+    return len(messages)
+
+def merge_counts(db: Session, merge_id: str) -> dict:
+    """Mensajes de una combinación de correspondencia por estado."""
+    Message = models_db.OutboxMessage
+    return dict(db.execute(
+        select(Message.status, func.count()).where(Message.merge_id == merge_id).group_by(Message.status)
+    ).all())
+
+def _owned(db: Session, owner_id: int):
+    return db.query(models_db.OutboxMessage).options(
+        selectinload(models_db.OutboxMessage.recipients)
+    ).filter(models_db.OutboxMessage.owner_id == owner_id)
+
+def get_message(db: Session, owner_id: int, message_id: int):
+    return _owned(db, owner_id).filter(models_db.OutboxMessage.id == message_id).first()
+
+def list_dead(db: Session, owner_id: int, skip: int = 0, limit: int = 50):
+    """Mensajes que agotaron los reintentos, del más reciente al más antiguo."""
+    return (
+        _owned(db, owner_id)
+        .filter(models_db.OutboxMessage.status == "dead")
+        .order_by(models_db.OutboxMessage.id.desc())
+        .offset(skip).limit(limit).all()
+    )
+
+def requeue(db: Session, owner_id: int, message_id: int):
+    """
+    Vuelve a encolar un mensaje "dead", incluidos sus destinatarios fallidos.
+    Devuelve (mensaje, reencolado); el mensaje es None si no existe.
+    """
+    message = get_message(db, owner_id, message_id)
+    if message is None or message.status != "dead":
+        return message, False
+    for recipient in message.recipients:
+        if recipient.status == "failed":
+            recipient.status, recipient.last_error = "pending", None
+    message.status = "pending"
+    message.attempts = 0
+    message.next_attempt_at = datetime.utcnow()
+    db.commit()
+    return get_message(db, owner_id, message_id), True
+
+def purge_dead(db: Session, retention_days: Optional[float] = None) -> int:
+    """
+    Elimina los mensajes "dead" cuyo último intento fue hace más de
+    `retention_days` (EMAIL_DEAD_RETENTION_DAYS) y sus adjuntos. Los que
+    nadie reencoló no se vuelven a enviar. Devuelve cuántos eliminó.
+    """
+    retention_days = EMAIL_DEAD_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    messages = db.query(models_db.OutboxMessage).options(
+        selectinload(models_db.OutboxMessage.attachments)
+    ).filter(
+        models_db.OutboxMessage.status == "dead",
+        models_db.OutboxMessage.next_attempt_at < cutoff
+    ).all()
+    remove_files = [a.path for message in messages for a in message.attachments]
+    for message in messages:
+        db.delete(message)
+    db.commit()
+    _remove_files(remove_files)
+    return len(messages)
+
+# ------------------ Entrega ------------------
+def claim_due(db: Session, limit: int) -> List[int]:
+    """Reclama hasta `limit` mensajes vencidos y devuelve sus ids."""
+    now = datetime.utcnow()
+    Message = models_db.OutboxMessage
+    stale = now - timedelta(seconds=EMAIL_LOCK_TIMEOUT_SECONDS)
+    due = or_(
+        (Message.status == "pending") & (Message.next_attempt_at <= now),
+        (Message.status == "sending") & (Message.locked_at < stale),
+    )
+    candidates = db.scalars(
+        select(Message.id).where(due).order_by(Message.next_attempt_at).limit(limit)
+    ).all()
+    claimed = []
+    for message_id in candidates:
+        result = db.execute(
+            update(Message).where(Message.id == message_id, due)
+            .values(status="sending", locked_at=now)
+        )
+        if result.rowcount == 1:
+            claimed.append(message_id)
+    db.commit()
+    return claimed
+
+def load_for_delivery(db: Session, message_id: int) -> dict:
+    message = db.get(models_db.OutboxMessage, message_id)
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "to": [r.email for r in message.recipients],
+        "pending": [r.email for r in message.recipients if r.status == "pending"],
+        "attachments": [(str(OUTBOX_DIR / a.path), a.filename) for a in message.attachments],
+    }
+
+def record_result(
+    db: Session,
+    message_id: int,
+    delivered: List[str],
+    failed: dict,
+    error: Optional[str] = None
+) -> str:
+    """
+    Registra un intento: `delivered` se marcan enviados, `failed`
+    ({email: error}) fallidos definitivamente y el resto sigue pendiente.
+    Devuelve el nuevo estado del mensaje.
+    """
+    now = datetime.utcnow()
+    message = db.get(models_db.OutboxMessage, message_id)
+    for recipient in message.recipients:
+        if recipient.email in delivered:
+            recipient.status, recipient.sent_at, recipient.last_error = "sent", now, None
+        elif recipient.email in failed:
+            recipient.status, recipient.last_error = "failed", failed[recipient.email]
+
+    message.attempts += 1
+    message.locked_at = None
+    statuses = {recipient.status for recipient in message.recipients}
+    remove_files = []
+    if "pending" not in statuses:
+        if statuses == {"failed"}:
+            message.status = "dead"
+        else:
+            message.status = "sent" if statuses == {"sent"} else "partial"
+            message.sent_at = now
+            remove_files = [a.path for a in message.attachments]
+        message.last_error = error or next(iter(failed.values()), None)
+    elif message.attempts >= EMAIL_MAX_ATTEMPTS:
+        message.status = "dead"
+        message.last_error = error
+    else:
+        message.status = "pending"
+        message.next_attempt_at = now + timedelta(seconds=retry_delay(message.attempts))
+        message.last_error = error
+    status = message.status
+    db.commit()
+    _remove_files(remove_files)
+    return status
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+async def deliver(message_id: int, pool: Optional[email_utils.SMTPConnectionPool] = None) -> str:
+    """Intenta entregar un mensaje ya reclamado a sus destinatarios pendientes."""
+    pool = pool or email_utils.get_smtp_pool()
+    data = await run_in_threadpool(_with_session, load_for_delivery, message_id)
+    pending = data["pending"]
+    delivered, failed, error = [], {}, None
+    await _rate_limiter.acquire()
+    try:
+        # Se vuelve a generar en cada intento de conexión: los adjuntos se leen al enviarlos
+        refused = await pool.send_stream(pool.settings.sender, pending, lambda: email_utils.iter_message(
+            pool.settings.sender, data["to"], data["subject"], data["body"], data["attachments"]
+        ))
+    except smtplib.SMTPRecipientsRefused as e:
+        refused = e.recipients
+    except smtplib.SMTPResponseException as e:
+        refused = {}
+        error = f"{e.smtp_code} {e.smtp_error!r}"
+        if e.smtp_code >= 500:
+            failed = {email: error for email in pending}
+        pending = []
+    except Exception as e:
+        refused, pending, error = {}, [], str(e) or e.__class__.__name__
+    for email in pending:
+        if email not in refused:
+            delivered.append(email)
+        elif refused[email][0] >= 500:
+            failed[email] = f"{refused[email][0]} {refused[email][1]!r}"
+    return await run_in_threadpool(
+        _with_session, record_result, message_id, delivered, failed, error
+    )
+
+async def deliver_due(pool: Optional[email_utils.SMTPConnectionPool] = None, limit: Optional[int] = None) -> int:
+    """Reclama y entrega en paralelo los mensajes vencidos. Devuelve cuántos procesó."""
+    ids = await run_in_threadpool(_with_session, claim_due, limit or EMAIL_WORKER_CONCURRENCY)
+    await asyncio.gather(*(deliver(message_id, pool) for message_id in ids))
+    return len(ids)
+
+# ------------------ Worker ------------------
+_wakeup: Optional[asyncio.Event] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def notify() -> None:
+    """Despierta al worker tras encolar; se puede llamar desde cualquier hilo."""
+    if _wakeup is not None:
+        _worker_loop.call_soon_threadsafe(_wakeup.set)
+
+async def run_worker(poll_seconds: float = EMAIL_WORKER_POLL_SECONDS) -> None:
+    """Tarea en segundo plano de la aplicación: entrega los mensajes vencidos."""
+    global _wakeup, _worker_loop
+    _worker_loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    next_purge = 0.0
+    while True:
+        try:
+            while await deliver_due() == EMAIL_WORKER_CONCURRENCY:
+                pass
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + EMAIL_PURGE_INTERVAL_SECONDS
+                await run_in_threadpool(_with_session, purge_dead)
+        except Exception as e:
+            logger.warning("El worker de correo falló: %s", e)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
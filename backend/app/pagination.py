@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from . import models_db
+
+# Campos por los que se puede ordenar el listado de contactos
+SORT_FIELDS = {
+    "id": models_db.Contact.id,
+    "nombre": models_db.Contact.nombre,
+    "average_rating": models_db.Contact.average_rating,
+}
+
+def parse_sort(sort: str):
+    """'-campo' ordena de forma descendente. Devuelve (columna, descendente)."""
+    descending = sort.startswith("-")
+    return SORT_FIELDS[sort.lstrip("-")], descending
+
+def order_by_sort(query, sort: str):
+    """Orden estable (campo, id) en la dirección indicada por `sort`."""
+    column, descending = parse_sort(sort)
+    id_column = models_db.Contact.id
+    if descending:
+        return query.order_by(None).order_by(column.desc(), id_column.desc())
+    return query.order_by(None).order_by(column, id_column)
+
+class InvalidCursorError(ValueError):
+    pass
+
+def encode_cursor(sort: str, value, last_id: int) -> str:
+    """Codifica la posición (sort_key, id) del último elemento como cadena opaca."""
+    raw = json.dumps([sort, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: str):
+    """Devuelve (value, last_id) o lanza InvalidCursorError si el cursor no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Cursor inválido")
+    if cursor_sort != sort or not isinstance(last_id, int):
+        raise InvalidCursorError("El cursor no corresponde al orden solicitado")
+    return value, last_id
+
+def keyset_filter(column, id_column, value, last_id: int, descending: bool = False):
+    """
+    Condición "estrictamente después de (value, last_id)" para el orden
+    (column, id). SQLite ordena los NULL primero en ASC y al final en DESC.
+    """
+    if column is id_column:
+        return id_column < last_id if descending else id_column > last_id
+    if descending:
+        if value is None:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column < value, and_(column == value, id_column < last_id), column.is_(None))
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > last_id))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+def keyset_page(query, sort: str, cursor, limit: int):
+    """
+    Aplica orden estable y paginación por cursor a una consulta de contactos.
+    `sort` es un campo de SORT_FIELDS, con prefijo "-" para orden descendente.
+    Devuelve (items, next_cursor); next_cursor es None en la última página.
+    """
+    column, descending = parse_sort(sort)
+    id_column = models_db.Contact.id
+    query = order_by_sort(query, sort)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        query = query.filter(keyset_filter(column, id_column, value, last_id, descending))
+
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+    return items, next_cursor
+
+def ratings_page(query, cursor, limit: int):
+    """
+    Paginación por cursor del historial de calificaciones, de la más reciente
+    a la más antigua: orden (fecha DESC, id DESC), cubierto por
+    ix_ratings_contact_fecha. Devuelve (items, next_cursor).
+    """
+    fecha, id_column = models_db.Rating.fecha, models_db.Rating.id
+    query = query.order_by(None).order_by(fecha.desc(), id_column.desc())
+    if cursor:
+        value, last_id = decode_cursor(cursor, "fecha")
+        try:
+            value = datetime.fromisoformat(value) if value is not None else None
+        except (TypeError, ValueError):
+            raise InvalidCursorError("Cursor inválido")
+        query = query.filter(keyset_filter(fecha, id_column, value, last_id, descending=True))
+
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor("fecha", last.fecha.isoformat() if last.fecha else None, last.id)
+    return items, next_cursor
@@ -0,0 +1,199 @@
+from typing import List
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from . import models_db
+from .database import upsert
+from .models import TIPO_EVALUACION_MAPPING, TipoContactoEnum
+
+# Agregados de calificaciones por contacto (ratings_count, ratings_sum y
+# average_rating en contacts) y por categoría (contact_rating_stats).
+# crud.add_ratings los ajusta en la misma transacción que inserta las
+# calificaciones, así enviar calificaciones no recorre las anteriores.
+# Los scorecards y los promedios por categoría del usuario se leen de
+# contact_rating_stats, nunca de la tabla ratings.
+
+def record(db: Session, contact_id: int, ratings) -> None:
+    """
+    Suma al contacto y a sus categorías las calificaciones recién insertadas
+    (dicts con categoria, calificacion y fecha). No hace commit.
+    """
+    if not ratings:
+        return
+    por_categoria = {}
+    for rating in ratings:
+        valor, fecha = rating["calificacion"], rating["fecha"]
+        agregado = por_categoria.get(rating["categoria"])
+        if agregado is None:
+            por_categoria[rating["categoria"]] = {
+                "ratings_count": 1, "ratings_sum": valor,
+                "min_rating": valor, "max_rating": valor, "last_rated_at": fecha,
+            }
+        else:
+            agregado["ratings_count"] += 1
+            agregado["ratings_sum"] += valor
+            agregado["min_rating"] = min(agregado["min_rating"], valor)
+            agregado["max_rating"] = max(agregado["max_rating"], valor)
+            agregado["last_rated_at"] = max(agregado["last_rated_at"], fecha)
+
+    # Un solo INSERT ... ON CONFLICT: crea las filas nuevas y suma a las
+    # existentes sin leerlas antes (sin carreras con otras transacciones)
+    Stat = models_db.ContactRatingStat
+    stmt = upsert(db.get_bind())(Stat).values([
+        {"contact_id": contact_id, "categoria": categoria, **agregado}
+        for categoria, agregado in por_categoria.items()
+    ])
+    nuevo = stmt.excluded
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["contact_id", "categoria"],
+        set_={
+            "ratings_count": Stat.ratings_count + nuevo.ratings_count,
+            "ratings_sum": Stat.ratings_sum + nuevo.ratings_sum,
+            "min_rating": case((Stat.min_rating <= nuevo.min_rating, Stat.min_rating), else_=nuevo.min_rating),
+            "max_rating": case((Stat.max_rating >= nuevo.max_rating, Stat.max_rating), else_=nuevo.max_rating),
+            "last_rated_at": case(
+                (Stat.last_rated_at >= nuevo.last_rated_at, Stat.last_rated_at),
+                else_=nuevo.last_rated_at
+            ),
+        },
+    ))
+
+    # Un solo UPDATE atómico: las expresiones usan los valores previos de la fila
+    count = len(ratings)
+    total = sum(rating["calificacion"] for rating in ratings)
+    Contact = models_db.Contact
+    db.execute(
+        update(Contact)
+        .where(Contact.id == contact_id)
+        .values(
+            ratings_count=Contact.ratings_count + count,
+            ratings_sum=Contact.ratings_sum + total,
+            average_rating=(Contact.ratings_sum + total) * 1.0 / (Contact.ratings_count + count),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.flush()
+
+def rebuild_stats(db: Session) -> int:
+    """
+    Recalcula todos los agregados a partir de la tabla ratings.
+    Se usa para poblar bases de datos existentes. Devuelve el número de
+    contactos con calificaciones.
+    """
+    Contact, Rating = models_db.Contact, models_db.Rating
+    count = select(func.count(Rating.id)).where(Rating.contact_id == Contact.id).scalar_subquery()
+    total = select(func.coalesce(func.sum(Rating.calificacion), 0)).where(
+        Rating.contact_id == Contact.id
+    ).scalar_subquery()
+    db.execute(
+        update(Contact)
+        .values(
+            ratings_count=count,
+            ratings_sum=total,
+            average_rating=select(func.avg(Rating.calificacion)).where(
+                Rating.contact_id == Contact.id
+            ).scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    db.execute(delete(models_db.ContactRatingStat))
+    db.execute(
+        insert(models_db.ContactRatingStat).from_select(
+            ["contact_id", "categoria", "ratings_count", "ratings_sum",
+             "min_rating", "max_rating", "last_rated_at"],
+            select(
+                Rating.contact_id,
+                Rating.categoria,
+                func.count(Rating.id),
+                func.sum(Rating.calificacion),
+                func.min(Rating.calificacion),
+                func.max(Rating.calificacion),
+                func.max(Rating.fecha),
+            ).group_by(Rating.contact_id, Rating.categoria)
+        )
+    )
+    db.commit()
+    return db.scalar(select(func.count(Contact.id)).where(Contact.ratings_count > 0))
+
+def backfill_stats(db: Session) -> int:
+    """
+    Recalcula los agregados al iniciar si hay calificaciones sin contar:
+    la tabla de estadísticas está vacía o un contacto calificado tiene
+    ratings_count 0 (columnas añadidas por upgrade_schema con valor 0).
+    """
+    Contact, Rating = models_db.Contact, models_db.Rating
+    if db.scalar(select(Rating.id).limit(1)) is None:
+        return 0
+    sin_estadisticas = db.scalar(select(models_db.ContactRatingStat.contact_id).limit(1)) is None
+    sin_contar = db.scalar(
+        select(Contact.id).where(
+            Contact.ratings_count == 0,
+            select(Rating.id).where(Rating.contact_id == Contact.id).exists()
+        ).limit(1)
+    ) is not None
+    if not (sin_estadisticas or sin_contar):
+        return 0
+    return rebuild_stats(db)
+
+def _average(total, count):
+    return total / count if count else None
+
+def owner_category_averages(db: Session, owner_id: int) -> dict:
+    """Promedio por categoría de todos los contactos del usuario: {categoria: (conteo, promedio)}."""
+    Stat = models_db.ContactRatingStat
+    rows = db.execute(
+        select(Stat.categoria, func.sum(Stat.ratings_count), func.sum(Stat.ratings_sum))
+        .join(models_db.Contact, models_db.Contact.id == Stat.contact_id)
+        .where(models_db.Contact.owner_id == owner_id)
+        .group_by(Stat.categoria)
+        .order_by(Stat.categoria)
+    ).all()
+    return {categoria: (count, _average(total, count)) for categoria, count, total in rows}
+
+def _categorias_esperadas(tipo_contacto) -> List[str]:
+    try:
+        return [categoria.value for categoria in TIPO_EVALUACION_MAPPING[TipoContactoEnum(tipo_contacto)]]
+    except (KeyError, ValueError):
+        return []
+
+def get_scorecards(db: Session, owner_id: int, contact_ids: List[int], promedios: dict) -> List[dict]:
+    """
+    Scorecards de los contactos del usuario indicados (los ajenos se omiten).
+    Incluye las categorías de TIPO_EVALUACION_MAPPING para el tipo del contacto
+    aunque aún no tengan calificaciones, y cualquier otra categoría calificada.
+    """
+    Contact, Stat = models_db.Contact, models_db.ContactRatingStat
+    contactos = db.execute(
+        select(Contact.id, Contact.tipo_contacto, Contact.ratings_count, Contact.average_rating)
+        .where(Contact.owner_id == owner_id, Contact.id.in_(set(contact_ids)))
+        .order_by(Contact.id)
+    ).all()
+    stats = {}
+    for stat in db.scalars(select(Stat).where(Stat.contact_id.in_([c.id for c in contactos]))):
+        stats.setdefault(stat.contact_id, {})[stat.categoria] = stat
+
+    scorecards = []
+    for contacto in contactos:
+        por_categoria = stats.get(contacto.id, {})
+        categorias = _categorias_esperadas(contacto.tipo_contacto)
+        categorias += sorted(c for c in por_categoria if c not in categorias)
+        detalle = []
+        for categoria in categorias:
+            stat = por_categoria.get(categoria)
+            detalle.append({
+                "categoria": categoria,
+                "ratings_count": stat.ratings_count if stat else 0,
+                "average": _average(stat.ratings_sum, stat.ratings_count) if stat else None,
+                "min_rating": stat.min_rating if stat else None,
+                "max_rating": stat.max_rating if stat else None,
+                "last_rated_at": stat.last_rated_at if stat else None,
+                "owner_average": promedios.get(categoria, (0, None))[1],
+            })
+        scorecards.append({
+            "contact_id": contacto.id,
+            "tipo_contacto": contacto.tipo_contacto,
+            "ratings_count": contacto.ratings_count,
+            "average_rating": contacto.average_rating,
+            "categorias": detalle,
+        })
+    return scorecards
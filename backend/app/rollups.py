@@ -0,0 +1,149 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from . import models_db
+from .database import upsert
+
+# Series de tiempo de calificaciones pre-agrupadas por día, semana (inicia el
+# lunes) y mes en rating_rollups. crud.add_ratings las ajusta en la misma
+# transacción que inserta las calificaciones; las consultas de tendencia solo
+# leen esta tabla.
+
+GRANULARITIES = ("day", "week", "month")
+
+def bucket_start(value, granularity: str) -> date:
+    """Primer día del periodo que contiene `value`."""
+    day = value.date() if isinstance(value, datetime) else value
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def record(db: Session, owner_id: int, contact_id: int, ratings) -> None:
+    """
+    Suma las calificaciones recién insertadas (dicts con categoria,
+    calificacion y fecha) a sus periodos. No hace commit.
+    """
+    if not ratings:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    for rating in ratings:
+        for granularity in GRANULARITIES:
+            key = (rating["categoria"], granularity, bucket_start(rating["fecha"], granularity))
+            deltas[key][0] += 1
+            deltas[key][1] += rating["calificacion"]
+
+    # Un solo INSERT ... ON CONFLICT: dos primeras calificaciones concurrentes
+    # del mismo periodo suman en vez de chocar con la clave primaria
+    Rollup = models_db.RatingRollup
+    stmt = upsert(db.get_bind())(Rollup).values([
+        {
+            "owner_id": owner_id, "contact_id": contact_id, "categoria": categoria,
+            "granularity": granularity, "bucket_start": start,
+            "ratings_count": count, "ratings_sum": total
+        }
+        for (categoria, granularity, start), (count, total) in deltas.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["contact_id", "categoria", "granularity", "bucket_start"],
+        set_={
+            "ratings_count": Rollup.ratings_count + stmt.excluded.ratings_count,
+            "ratings_sum": Rollup.ratings_sum + stmt.excluded.ratings_sum
+        }
+    ))
+
+def get_trend(
+    db: Session,
+    owner_id: int,
+    granularity: str,
+    contact_id: Optional[int] = None,
+    categoria: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    window: int = 1
+) -> list:
+    """
+    Serie (periodo, conteo, promedio, promedio móvil) del usuario, de un
+    contacto y/o de una categoría. El promedio móvil pondera por número de
+    calificaciones sobre los últimos `window` periodos con datos.
+    """
+    Rollup = models_db.RatingRollup
+    query = (
+        select(Rollup.bucket_start, func.sum(Rollup.ratings_count), func.sum(Rollup.ratings_sum))
+        .where(Rollup.owner_id == owner_id, Rollup.granularity == granularity)
+        .group_by(Rollup.bucket_start)
+        .order_by(Rollup.bucket_start)
+    )
+    if contact_id is not None:
+        query = query.where(Rollup.contact_id == contact_id)
+    if categoria:
+        query = query.where(Rollup.categoria == categoria)
+    if desde:
+        query = query.where(Rollup.bucket_start >= bucket_start(desde, granularity))
+    if hasta:
+        query = query.where(Rollup.bucket_start <= hasta)
+
+    rows = db.execute(query).all()
+    points = []
+    for i, (start, count, total) in enumerate(rows):
+        ventana = rows[max(0, i - window + 1):i + 1]
+        window_count = sum(row[1] for row in ventana)
+        points.append({
+            "bucket_start": start,
+            "ratings_count": count,
+            "average": total / count,
+            "rolling_average": sum(row[2] for row in ventana) / window_count,
+        })
+    return points
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recalcula todos los periodos a partir de la tabla ratings: agrega por día
+    en SQL y a partir de ahí arma semanas y meses. Devuelve las filas creadas.
+    """
+    Rating, Contact = models_db.Rating, models_db.Contact
+    day = func.date(Rating.fecha)
+    daily = db.execute(
+        select(
+            Contact.owner_id, Rating.contact_id, Rating.categoria, day,
+            func.count(Rating.id), func.sum(Rating.calificacion)
+        )
+        .join(Contact, Contact.id == Rating.contact_id)
+        .where(Rating.fecha.isnot(None))
+        .group_by(Contact.owner_id, Rating.contact_id, Rating.categoria, day)
+    )
+    totals = defaultdict(lambda: [0, 0])
+    for owner_id, contact_id, categoria, dia, count, total in daily:
+        dia = date.fromisoformat(dia) if isinstance(dia, str) else dia
+        for granularity in GRANULARITIES:
+            key = (owner_id, contact_id, categoria, granularity, bucket_start(dia, granularity))
+            totals[key][0] += count
+            totals[key][1] += total
+
+    db.execute(delete(models_db.RatingRollup))
+    rows = [
+        {
+            "owner_id": owner_id, "contact_id": contact_id, "categoria": categoria,
+            "granularity": granularity, "bucket_start": start,
+            "ratings_count": count, "ratings_sum": total,
+        }
+        for (owner_id, contact_id, categoria, granularity, start), (count, total) in totals.items()
+    ]
+    if rows:
+        db.execute(insert(models_db.RatingRollup), rows)
+    db.commit()
+    return len(rows)
+
+def backfill_rollups(db: Session) -> int:
+    """
+    Llena los periodos si la tabla está vacía pero ya hay calificaciones (base
+    de datos anterior a las tendencias). Se llama al iniciar la aplicación.
+    """
+    if db.scalar(select(models_db.RatingRollup.contact_id).limit(1)) is not None:
+        return 0
+    if db.scalar(select(models_db.Rating.id).limit(1)) is None:
+        return 0
+    return rebuild_rollups(db)
@@ -1,38 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status, File, UploadFile, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status, File, UploadFile, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from pydantic import ValidationError
 import shutil
 import os
+import tempfile
 from pathlib import Path
-from . import crud, models_db, models, schemas
-from .deps import get_db, get_current_user
-from .models import TipoContactoEnum, DetalleTipoEnum
-from .email_utils import EmailSender
+from . import crud, crud_async, schemas, pagination, counters, export, importer, jobs, batch, rating_stats, rollups, images, storage, outbox, mail_merge
+from .deps import get_db, get_current_user, CurrentUser
+from .database import get_async_db
 import json
+from datetime import date, datetime
 
 router = APIRouter()
 
 # Configuración para uploads
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
-ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
 TEMP_UPLOAD_DIR = UPLOAD_DIR / "temp"
 TEMP_UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
 
-def validate_image(file: UploadFile) -> bool:
-    """Valida que el archivo sea una imagen"""
-    ext = Path(file.filename).suffix.lower()
-    if ext not in ALLOWED_EXTENSIONS:
+async def stage_image(imagen: UploadFile) -> storage.StagedUpload:
+    """
+    Recibe la imagen por bloques en un archivo temporal (ver storage.stage_upload).
+    El formato se detecta por el contenido; responde 400 si no es una imagen
+    y 413 si supera MAX_IMAGE_BYTES.
+    """
+    try:
+        return await storage.stage_upload(imagen)
+    except storage.InvalidUpload as e:
         raise HTTPException(
-            status_code=400,
+            status_code=e.status_code,
             detail={
-                "message": f"Formato de archivo no permitido. Use: {', '.join(ALLOWED_EXTENSIONS)}",
+                "message": str(e),
                 "field": "imagen",
-                "type": "validation_error"
+                "type": "upload_error"
             }
         )
-    return True
 
 # ------------------ ENDPOINT DE PRUEBA DE VIDA ------------------
 @router.get("/ping", tags=["Root"])
@@ -48,6 +55,7 @@ def ping():
     tags=["Contactos"]
 )
 async def create_contacto(
+    background_tasks: BackgroundTasks,
     nombre: str = Form(...),
     telefono: str = Form(...),
     email: Optional[str] = Form(None),
@@ -58,37 +66,14 @@ async def create_contacto(
     detalle_tipo: Optional[str] = Form(None),
     detalle_tipo_otro: Optional[str] = Form(None),
     imagen: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    # La imagen queda en un temporal hasta que el contacto se guarda;
+    # se almacena por contenido, así que la misma foto se guarda una sola vez
+    staged = await stage_image(imagen) if imagen else None
+    imagen_path = staged.url if staged else None
     try:
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-            
-        # Procesar imagen si se proporciona
-        imagen_path = None
-        if imagen:
-            try:
-                validate_image(imagen)
-                file_extension = Path(imagen.filename).suffix.lower()
-                file_name = f"{user.id}_{nombre}_{os.urandom(8).hex()}{file_extension}"
-                file_path = UPLOAD_DIR / file_name
-                
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(imagen.file, buffer)
-                
-                imagen_path = f"/uploads/{file_name}"
-            except Exception as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "message": f"Error al procesar la imagen: {str(e)}",
-                        "field": "imagen",
-                        "type": "upload_error"
-                    }
-                )
-
         # Crear los datos del contacto
         contact_data = schemas.ContactCreate(
             nombre=nombre,
@@ -103,18 +88,15 @@ async def create_contacto(
             imagen=imagen_path
         )
 
-        # Crear el contacto
-        try:
-            contact = crud.create_contact(db, contact_data, user.id)
-            return contact
-        except Exception as e:
-            # Si falla la creación del contacto, eliminar la imagen si se subió
-            if imagen_path:
-                try:
-                    os.remove(UPLOAD_DIR / Path(imagen_path).name)
-                except:
-                    pass
-            raise e
+        # Crear el contacto; el archivo pasa a su ruta definitiva tras el commit
+        contact = await crud_async.create_contact(
+            db, contact_data, current_user.id, staged.size if staged else None
+        )
+        if staged:
+            await run_in_threadpool(staged.commit)
+            staged = None
+            background_tasks.add_task(images.process_contact_image, contact.id, imagen_path)
+        return contact
 
     except ValidationError as e:
         raise HTTPException(
@@ -132,12 +114,19 @@ async def create_contacto(
                 "type": "server_error"
             }
         )
+    finally:
+        # Si el contacto no se guardó, el temporal se descarta
+        if staged:
+            staged.discard()
 
 # ------------------ LISTAR CONTACTOS ------------------
 # Ahora acepta GET /api/contactos  y GET /api/contactos/
+# Con pagination=cursor (o enviando `cursor`) se pagina por clave (sort, id):
+# la respuesta trae next_cursor y el total solo se calcula si include_total=true.
+# sort acepta "-" como prefijo para orden descendente (p. ej. -average_rating).
 @router.get(
     "",
-    response_model=schemas.PaginatedContacts,
+    response_model=Union[schemas.PaginatedContacts, schemas.CursorPaginatedContacts],
     tags=["Contactos"]
 )
 def read_contactos(
@@ -146,32 +135,47 @@ def read_contactos(
     q: Optional[str] = None,
     tipo_contacto: Optional[str] = None,
     detalle_tipo: Optional[str] = None,
+    pagination_mode: str = Query("offset", alias="pagination", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^-?(id|nombre|average_rating)$"),
+    include_total: bool = True,
     db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    if cursor:
+        pagination_mode = "cursor"
+        try:
+            pagination.decode_cursor(cursor, sort)
+        except pagination.InvalidCursorError as e:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "message": str(e),
+                    "field": "cursor",
+                    "type": "validation_error"
+                }
+            )
+
     try:
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        query = crud.query_contacts(db, current_user.id, q, tipo_contacto, detalle_tipo)
 
-        query = db.query(models_db.Contact).filter(
-            models_db.Contact.owner_id == user.id
-        )
-        
-        if q:
-            query = query.filter(
-                (models_db.Contact.nombre.ilike(f"%{q}%")) |
-                (models_db.Contact.email.ilike(f"%{q}%")) |
-                (models_db.Contact.telefono.ilike(f"%{q}%"))
+        if pagination_mode == "cursor":
+            total = (
+                crud.count_contacts(db, query, current_user.id, q, tipo_contacto, detalle_tipo)
+                if include_total else None
             )
-        
-        if tipo_contacto:
-            query = query.filter(models_db.Contact.tipo_contacto == tipo_contacto)
-        
-        if detalle_tipo:
-            query = query.filter(models_db.Contact.detalle_tipo == detalle_tipo)
-        
-        total = query.count()
+            items, next_cursor = pagination.keyset_page(query, sort, cursor, limit)
+            return {
+                "total": total,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "data": items
+            }
+
+        if sort != "id":
+            query = pagination.order_by_sort(query, sort)
+
+        total = crud.count_contacts(db, query, current_user.id, q, tipo_contacto, detalle_tipo)
         items = query.offset(skip).limit(limit).all()
         
         return {
@@ -189,6 +193,253 @@ def read_contactos(
             }
         )
 
+# ------------------ RANKING DE CONTACTOS ------------------
+# Mejores (order=best) o peores (order=worst) contactos por calificación
+# promedio. min_ratings descarta contactos con pocas calificaciones.
+@router.get(
+    "/leaderboard",
+    response_model=List[schemas.LeaderboardEntry],
+    tags=["Calificaciones"]
+)
+def read_leaderboard(
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None,
+    order: str = Query("best", pattern="^(best|worst)$"),
+    min_ratings: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        contactos = crud.get_leaderboard(
+            db, current_user.id, tipo_contacto, detalle_tipo,
+            worst=order == "worst", min_ratings=min_ratings, limit=limit
+        )
+        return [
+            {**schemas.ContactInDB.model_validate(contacto).model_dump(),
+             "ratings_count": contacto.ratings_count, "rank": rank}
+            for rank, contacto in enumerate(contactos, start=1)
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al obtener el ranking: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
+# ------------------ FACETAS (CONTEOS POR TIPO) ------------------
+@router.get(
+    "/facets",
+    response_model=schemas.ContactFacets,
+    tags=["Contactos"]
+)
+def read_facets(
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        return counters.get_facets(db, current_user.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al obtener las facetas: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
+# ------------------ EXPORTAR CONTACTOS ------------------
+# Acepta los mismos filtros que el listado y envía el archivo en streaming
+@router.get("/export", tags=["Contactos"])
+def export_contactos(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|vcf)$"),
+    gzip: bool = False,
+    q: Optional[str] = None,
+    tipo_contacto: Optional[str] = None,
+    detalle_tipo: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    media_type, extension = export.FORMATS[export_format]
+    filename = f"contactos.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+
+    # Las filas se leen con otra sesión del mismo motor, abierta al enviar el cuerpo
+    session_factory = sessionmaker(bind=db.get_bind(), autocommit=False, autoflush=False)
+    rows = export.iter_rows(session_factory, current_user.id, q, tipo_contacto, detalle_tipo)
+    return StreamingResponse(
+        export.stream_export(rows, export_format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# ------------------ IMPORTAR CONTACTOS ------------------
+# Archivos pequeños se importan en la misma petición (200 con el reporte);
+# los grandes se encolan y se devuelve 202 con el id del trabajo.
+@router.post(
+    "/import",
+    response_model=schemas.ImportJob,
+    tags=["Contactos"]
+)
+def import_contactos(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    archivo: UploadFile = File(...),
+    import_format: Optional[str] = Form(None, alias="format", pattern="^(csv|ndjson|vcf)$"),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    file_format = importer.detect_format(archivo.filename, import_format)
+    if not file_format:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Formato no reconocido. Use un archivo .csv, .ndjson o .vcf",
+                "field": "archivo",
+                "type": "validation_error"
+            }
+        )
+
+    job = jobs.create_job(current_user.id, "import")
+    try:
+        if archivo.size is not None and archivo.size <= importer.IMPORT_SYNC_MAX_BYTES:
+            return importer.import_contacts(db, job, archivo.file, file_format)
+
+        # El archivo subido se cierra al terminar la petición: se copia a uno temporal
+        fd, temp_path = tempfile.mkstemp(dir=TEMP_UPLOAD_DIR, suffix=f".{file_format}")
+        with os.fdopen(fd, "wb") as buffer:
+            shutil.copyfileobj(archivo.file, buffer)
+        background_tasks.add_task(importer.run_import_job, job, temp_path, file_format)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return job
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al importar contactos: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
+@router.get(
+    "/import/{job_id}",
+    response_model=schemas.ImportJob,
+    tags=["Contactos"]
+)
+def read_import_job(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    job = jobs.get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": "Trabajo de importación no encontrado",
+                "type": "not_found"
+            }
+        )
+    return job
+
+# ------------------ LOTE DE OPERACIONES ------------------
+# Crea, modifica y elimina varios contactos con una sola consulta de propiedad
+# y un solo commit. Cada operación tiene su propio resultado en la respuesta.
+@router.post(
+    "/batch",
+    response_model=schemas.BatchResponse,
+    tags=["Contactos"]
+)
+async def batch_contactos(
+    lote: schemas.BatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    if len(lote.operations) > batch.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "message": f"El lote admite como máximo {batch.BATCH_MAX_OPERATIONS} operaciones",
+                "field": "operations",
+                "type": "validation_error"
+            }
+        )
+    try:
+        return await crud_async.apply_contact_batch(db, lote.operations, current_user.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al procesar el lote: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
+# ------------------ TENDENCIAS DE CALIFICACIONES ------------------
+# Serie por día, semana o mes del usuario, de un contacto (contact_id) y/o de
+# una categoría, leída de rating_rollups.
+@router.get(
+    "/trends",
+    response_model=schemas.RatingTrend,
+    tags=["Calificaciones"]
+)
+def read_rating_trend(
+    granularity: str = Query("week", pattern="^(day|week|month)$"),
+    contact_id: Optional[int] = None,
+    categoria: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    window: int = Query(1, ge=1, le=52),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        points = rollups.get_trend(
+            db, current_user.id, granularity, contact_id, categoria, desde, hasta, window
+        )
+        return {"granularity": granularity, "window": window, "points": points}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al obtener la tendencia: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
+# ------------------ SCORECARDS DE CALIFICACIONES ------------------
+# Se calculan desde contact_rating_stats (sin recorrer las calificaciones).
+# Sin ids solo devuelve los promedios por categoría del usuario.
+@router.get(
+    "/scorecards",
+    response_model=schemas.Scorecards,
+    tags=["Calificaciones"]
+)
+def read_scorecards(
+    ids: List[int] = Query([], max_length=100),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        promedios = rating_stats.owner_category_averages(db, current_user.id)
+        return {
+            "categorias": [
+                {"categoria": categoria, "ratings_count": count, "average": average}
+                for categoria, (count, average) in promedios.items()
+            ],
+            "scorecards": rating_stats.get_scorecards(db, current_user.id, ids, promedios) if ids else [],
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al obtener los scorecards: {str(e)}",
+                "type": "server_error"
+            }
+        )
+
 # ------------------ OBTENER CONTACTO POR ID ------------------
 @router.get(
     "/{contacto_id}",
@@ -198,22 +449,11 @@ def read_contactos(
 def read_contacto(
     contacto_id: int, 
     db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
-        # Obtener el usuario actual
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "message": "Usuario no encontrado",
-                    "type": "not_found"
-                }
-            )
-
         # Obtener el contacto
-        db_contacto = crud.get_contact(db, contacto_id, user.id)
+        db_contacto = crud.get_contact(db, contacto_id, current_user.id)
         if not db_contacto:
             raise HTTPException(
                 status_code=404,
@@ -240,6 +480,7 @@ def read_contacto(
     tags=["Contactos"]
 )
 async def update_contacto(
+    background_tasks: BackgroundTasks,
     contacto_id: int,
     nombre: str = Form(...),
     telefono: str = Form(...),
@@ -251,44 +492,22 @@ async def update_contacto(
     detalle_tipo: Optional[str] = Form(None),
     detalle_tipo_otro: Optional[str] = Form(None),
     imagen: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    staged = None
     try:
-        # Obtener el usuario actual
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
         # Verificar que el contacto existe y pertenece al usuario
-        contacto = crud.get_contact(db, contacto_id, user.id)
+        contacto = await crud_async.get_contact(db, contacto_id, current_user.id)
         if not contacto:
             raise HTTPException(status_code=404, detail="Contacto no encontrado")
 
-        # Procesar imagen si se proporciona una nueva
+        # Procesar imagen si se proporciona una nueva; la anterior se libera
+        # al actualizar (crud.update_contact)
         imagen_path = contacto.imagen
         if imagen:
-            try:
-                validate_image(imagen)
-                # Eliminar imagen anterior si existe
-                if contacto.imagen:
-                    old_image_path = Path("uploads") / Path(contacto.imagen).name
-                    if old_image_path.exists():
-                        old_image_path.unlink()
-
-                file_extension = Path(imagen.filename).suffix.lower()
-                file_name = f"{user.id}_{nombre}_{os.urandom(8).hex()}{file_extension}"
-                file_path = UPLOAD_DIR / file_name
-                
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(imagen.file, buffer)
-                
-                imagen_path = f"/uploads/{file_name}"
-            except Exception as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Error al procesar la imagen: {str(e)}"
-                )
+            staged = await stage_image(imagen)
+            imagen_path = staged.url
 
         # Actualizar datos del contacto
         contact_data = schemas.ContactUpdate(
@@ -304,13 +523,25 @@ async def update_contacto(
             imagen=imagen_path
         )
 
-        return crud.update_contact(db, contacto_id, contact_data, user.id)
-
+        updated = await crud_async.update_contact(
+            db, contacto_id, contact_data, current_user.id, staged.size if staged else None
+        )
+        if staged and updated:
+            await run_in_threadpool(staged.commit)
+            staged = None
+            background_tasks.add_task(images.process_contact_image, contacto_id, imagen_path)
+        return updated
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al actualizar el contacto: {str(e)}"
         )
+    finally:
+        if staged:
+            staged.discard()
 
 # ------------------ ELIMINAR CONTACTO ------------------
 @router.delete(
@@ -320,23 +551,12 @@ async def update_contacto(
 )
 async def delete_contacto(
     contacto_id: int,
-    db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
-        # Obtener el usuario actual
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "message": "Usuario no encontrado",
-                    "type": "not_found"
-                }
-            )
-
         # Intentar eliminar el contacto
-        deleted = crud.delete_contact(db, contacto_id, user.id)
+        deleted = await crud_async.delete_contact(db, contacto_id, current_user.id)
         if not deleted:
             raise HTTPException(
                 status_code=404,
@@ -381,31 +601,24 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
 async def create_rating(
     contact_id: int,
     ratings: List[schemas.RatingCreate],
-    db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    if not ratings:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Debe enviar al menos una calificación",
+                "type": "validation_error"
+            }
+        )
     try:
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-            
-        contact = crud.get_contact(db, contact_id, user.id)
+        contact = await crud_async.get_contact(db, contact_id, current_user.id)
         if not contact:
             raise HTTPException(status_code=404, detail="Contacto no encontrado")
 
-        db_ratings = []
-        total_rating = 0
-
-        for rating in ratings:
-            db_rating = crud.create_rating(db, rating, contact_id)
-            db_ratings.append(db_rating)
-            total_rating += rating.calificacion
-
-        # Calcular y actualizar el promedio
-        average = total_rating / len(ratings)
-        crud.update_contact_rating(db, contact_id, average)
-
-        return db_ratings
+        # Inserción en bloque y agregados (conteo, suma, promedio) en un solo commit
+        return await crud_async.add_ratings(db, contact_id, ratings, current_user.id)
 
     except Exception as e:
         raise HTTPException(
@@ -413,34 +626,48 @@ async def create_rating(
             detail=f"Error al crear calificación: {str(e)}"
         )
 
+# Historial paginado por cursor (más recientes primero). all=true devuelve
+# la lista completa como antes, con los mismos filtros.
 @router.get(
     "/{contact_id}/ratings",
-    response_model=List[schemas.RatingInDB],
+    response_model=Union[schemas.RatingPage, List[schemas.RatingInDB]],
     tags=["Calificaciones"]
 )
 def get_contact_ratings(
     contact_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    categoria: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    all_ratings: bool = Query(False, alias="all"),
     db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
-        # Obtener el usuario actual
-        user = crud.get_user_by_email(db, current_user_email)
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
         # Verificar que el contacto existe y pertenece al usuario
-        contact = crud.get_contact(db, contact_id, user.id)
+        contact = crud.get_contact(db, contact_id, current_user.id)
         if not contact:
             raise HTTPException(status_code=404, detail="Contacto no encontrado")
 
-        # Obtener las calificaciones
-        ratings = db.query(models_db.Rating).filter(
-            models_db.Rating.contact_id == contact_id
-        ).order_by(models_db.Rating.fecha.desc()).all()
+        query = crud.query_ratings(db, contact_id, categoria, desde, hasta)
+        if all_ratings:
+            return query.all()
 
-        return ratings
+        items, next_cursor = pagination.ratings_page(query, cursor, limit)
+        return {"limit": limit, "next_cursor": next_cursor, "data": items}
 
+    except HTTPException:
+        raise
+    except pagination.InvalidCursorError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": str(e),
+                "field": "cursor",
+                "type": "validation_error"
+            }
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -450,54 +677,230 @@ def get_contact_ratings(
             }
         )
 
+@router.get(
+    "/{contact_id}/scorecard",
+    response_model=schemas.ContactScorecard,
+    tags=["Calificaciones"]
+)
+def get_contact_scorecard(
+    contact_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    try:
+        promedios = rating_stats.owner_category_averages(db, current_user.id)
+        scorecards = rating_stats.get_scorecards(db, current_user.id, [contact_id], promedios)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Error al obtener el scorecard: {str(e)}",
+                "type": "server_error"
+            }
+        )
+    if not scorecards:
+        raise HTTPException(status_code=404, detail="Contacto no encontrado")
+    return scorecards[0]
+
 # ------------------ ENVIAR EMAIL ------------------
-@router.post("/send-email", tags=["Email"])
+# El mensaje se guarda en la bandeja de salida y un worker lo entrega en segundo
+# plano con reintentos (ver outbox.py). Responde 202 con el id para consultar
+# el estado de cada destinatario en GET /send-email/{message_id}.
+@router.post(
+    "/send-email",
+    response_model=schemas.OutboxMessage,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Email"]
+)
 async def send_email(
     subject: str = Form(...),
     message: str = Form(...),
     recipients: str = Form(...),
     attachments: List[UploadFile] = File(None),
-    current_user_email: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     try:
         recipients_list = json.loads(recipients)
-        temp_files = []
-
-        if attachments:
-            for file in attachments:
-                temp_path = TEMP_UPLOAD_DIR / file.filename
-                with open(temp_path, "wb") as buffer:
-                    buffer.write(await file.read())
-                temp_files.append(str(temp_path))
+    except ValueError:
+        recipients_list = None
+    if not (
+        isinstance(recipients_list, list) and recipients_list
+        and all(isinstance(r, str) and r.strip() for r in recipients_list)
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "recipients debe ser una lista JSON de emails",
+                "field": "recipients",
+                "type": "validation_error"
+            }
+        )
 
-        try:
-            email_sender = EmailSender()
-            await email_sender.send_email(
-                recipients=recipients_list,
-                subject=subject,
-                message=message,
-                attachments=temp_files if temp_files else None
+    # Asunto y destinatarios van en cabeceras: un salto de línea haría fallar
+    # cada intento de envío hasta que el mensaje quedara "dead"
+    for field, values in (("subject", [subject]), ("recipients", [r.strip() for r in recipients_list])):
+        errors = list(filter(None, map(outbox.header_error, values)))
+        if errors:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "message": errors[0],
+                    "field": field,
+                    "type": "validation_error"
+                }
             )
 
-            # Limpiar archivos temporales
-            for file_path in temp_files:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+    # Los adjuntos se copian por bloques con nombres únicos fuera de uploads/;
+    # 413 si superan EMAIL_ATTACHMENT_MAX_BYTES o EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES
+    try:
+        saved = await outbox.spool_attachments(attachments or [])
+    except outbox.AttachmentTooLarge as e:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "message": str(e),
+                "field": "attachments",
+                "type": "upload_error"
+            }
+        )
 
-            return {"message": "Email enviado correctamente"}
+    try:
+        queued = await crud_async.enqueue_email(
+            db, current_user.id, subject, message, [r.strip() for r in recipients_list], saved
+        )
+    except Exception as e:
+        for attachment in saved:
+            (outbox.OUTBOX_DIR / attachment["path"]).unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al encolar el email: {str(e)}"
+        )
+    outbox.notify()
+    return queued
 
-        except Exception as e:
-            # Limpiar archivos temporales en caso de error
-            for file_path in temp_files:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+# Mensajes que agotaron los reintentos (dead-letter), del más reciente al más antiguo
+@router.get(
+    "/send-email/dead-letter",
+    response_model=List[schemas.OutboxMessage],
+    tags=["Email"]
+)
+async def read_dead_letter(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    return await crud_async.list_dead_emails(db, current_user.id, skip, limit)
+
+@router.get(
+    "/send-email/{message_id}",
+    response_model=schemas.OutboxMessage,
+    tags=["Email"]
+)
+async def read_email_status(
+    message_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    queued = await crud_async.get_outbox_message(db, current_user.id, message_id)
+    if queued is None:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    return queued
+
+# Reencola un mensaje de la dead-letter (también sus destinatarios fallidos)
+@router.post(
+    "/send-email/{message_id}/retry",
+    response_model=schemas.OutboxMessage,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Email"]
+)
+async def retry_email(
+    message_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    queued, requeued = await crud_async.requeue_email(db, current_user.id, message_id)
+    if queued is None:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    if not requeued:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Solo se pueden reintentar mensajes en la dead-letter",
+                "type": "conflict_error"
+            }
+        )
+    outbox.notify()
+    return queued
+
+# ------------------ COMBINACIÓN DE CORRESPONDENCIA ------------------
+# Un correo por contacto filtrado, con la plantilla rellenada con sus datos.
+# Los mensajes se encolan por bloques en segundo plano (ver mail_merge.py) y
+# el progreso se consulta en GET /mail-merge/{job_id}.
+def _mail_merge_status(db: Session, job: jobs.Job) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "processed": job.processed,
+        "queued": job.succeeded,
+        "skipped": job.failed,
+        "message": job.message,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "delivery": outbox.merge_counts(db, job.id),
+    }
+
+@router.post(
+    "/mail-merge",
+    response_model=schemas.MailMergeJob,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Email"]
+)
+def create_mail_merge(
+    background_tasks: BackgroundTasks,
+    datos: schemas.MailMergeRequest,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    for field in ("subject", "template"):
+        errors = mail_merge.template_errors(getattr(datos, field))
+        if field == "subject" and outbox.header_error(datos.subject):
+            errors.append(outbox.header_error(datos.subject))
+        if errors:
             raise HTTPException(
-                status_code=500,
-                detail=f"Error al enviar el email: {str(e)}"
+                status_code=400,
+                detail={
+                    "message": errors[0],
+                    "field": field,
+                    "type": "validation_error"
+                }
             )
 
-    except Exception as e:
+    job = jobs.create_job(current_user.id, "mail_merge")
+    background_tasks.add_task(
+        mail_merge.run_merge_job, job, datos.subject, datos.template,
+        datos.q, datos.tipo_contacto, datos.detalle_tipo
+    )
+    return _mail_merge_status(db, job)
+
+@router.get(
+    "/mail-merge/{job_id}",
+    response_model=schemas.MailMergeJob,
+    tags=["Email"]
+)
+def read_mail_merge(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    job = jobs.get_job(job_id, current_user.id)
+    if not job or job.kind != "mail_merge":
         raise HTTPException(
-            status_code=500,
-            detail=f"Error en el procesamiento: {str(e)}"
+            status_code=404,
+            detail={
+                "message": "Combinación de correspondencia no encontrada",
+                "type": "not_found"
+            }
         )
+    return _mail_merge_status(db, job)
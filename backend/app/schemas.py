@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, validator, ConfigDict
-from typing import Optional, List
+from typing import Any, Dict, List, Literal, Optional
 from .models import TipoContactoEnum, DetalleTipoEnum, TIPO_DETALLE_MAPPING
-from datetime import datetime
+from datetime import date, datetime
 
 # Clase base para Contacto
 class ContactBase(BaseModel):
@@ -57,14 +57,27 @@ class ContactCreate(ContactBase):
 class ContactUpdate(ContactBase):
     pass
 
+# Miniatura de la foto del contacto en el formato original y en WebP
+class Thumbnail(BaseModel):
+    url: str
+    webp: str
+    width: int
+    height: int
+
 # Clase para representar un contacto en la base de datos
 class ContactInDB(ContactBase):
     id: int
     owner_id: int
     average_rating: Optional[float] = None
+    thumbnails: Optional[Dict[str, Thumbnail]] = None  # sm, md, lg; None hasta que se generan
 
     model_config = ConfigDict(from_attributes=True)
 
+# Posición de un contacto en el ranking por calificación
+class LeaderboardEntry(ContactInDB):
+    rank: int
+    ratings_count: int
+
 # Clase de paginación para los contactos
 class PaginatedContacts(BaseModel):
     total: int               # Total de registros disponibles
@@ -74,6 +87,150 @@ class PaginatedContacts(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Página de contactos en modo cursor (paginación por clave)
+class CursorPaginatedContacts(BaseModel):
+    total: Optional[int] = None        # Solo se calcula si include_total=true
+    limit: int                         # Tamaño de página solicitado
+    next_cursor: Optional[str] = None  # Cursor opaco de la página siguiente; None al final
+    data: List[ContactInDB]
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Conteos por tipo de contacto y por detalle dentro de cada tipo
+class DetalleFacet(BaseModel):
+    detalle_tipo: Optional[str] = None
+    total: int
+
+class TipoFacet(BaseModel):
+    tipo_contacto: Optional[str] = None
+    total: int
+    detalles: List[DetalleFacet]
+
+class ContactFacets(BaseModel):
+    total: int
+    tipos: List[TipoFacet]
+
+# Estado de un trabajo de importación
+class ImportRowError(BaseModel):
+    row: int                 # Línea del archivo (o inicio de la vCard)
+    errors: List[dict]
+
+class ImportJob(BaseModel):
+    id: str
+    status: str              # pending | running | done | failed
+    processed: int
+    succeeded: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: int    # Errores no incluidos en la lista por tamaño
+    message: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Lote de operaciones sobre contactos
+class BatchOperation(BaseModel):
+    op: Literal["create", "patch", "delete"]
+    id: Optional[int] = None              # Requerido en patch y delete
+    data: Optional[Dict[str, Any]] = None # Contacto completo (create) o campos a cambiar (patch)
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1)
+
+class BatchOperationResult(BaseModel):
+    index: int                            # Posición de la operación en el lote
+    op: str
+    status: int                           # 201, 200, 204, 404 o 422 como en las rutas individuales
+    id: Optional[int] = None
+    errors: Optional[List[dict]] = None
+    contacto: Optional[ContactInDB] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchOperationResult]
+
+# Scorecard de calificaciones por categoría
+class CategoryStats(BaseModel):
+    categoria: str
+    ratings_count: int
+    average: Optional[float] = None
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+    last_rated_at: Optional[datetime] = None
+    owner_average: Optional[float] = None   # Promedio de la categoría en todos los contactos del usuario
+
+class ContactScorecard(BaseModel):
+    contact_id: int
+    tipo_contacto: Optional[str] = None
+    ratings_count: int
+    average_rating: Optional[float] = None
+    categorias: List[CategoryStats]
+
+class OwnerCategoryAverage(BaseModel):
+    categoria: str
+    ratings_count: int
+    average: Optional[float] = None
+
+class Scorecards(BaseModel):
+    categorias: List[OwnerCategoryAverage]  # Promedios del usuario por categoría
+    scorecards: List[ContactScorecard]
+
+# Serie de tendencia de calificaciones
+class TrendPoint(BaseModel):
+    bucket_start: date        # Primer día del periodo (lunes en semanas)
+    ratings_count: int
+    average: float
+    rolling_average: float    # Promedio de los últimos `window` periodos con datos
+
+class RatingTrend(BaseModel):
+    granularity: str          # day | week | month
+    window: int
+    points: List[TrendPoint]
+
+# Bandeja de salida de correo
+class OutboxRecipient(BaseModel):
+    email: str
+    status: str               # pending | sent | failed
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OutboxMessage(BaseModel):
+    id: int
+    subject: str
+    status: str               # pending | sending | sent | partial | dead
+    attempts: int
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    recipients: List[OutboxRecipient]
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Combinación de correspondencia
+class MailMergeRequest(BaseModel):
+    subject: str = Field(..., min_length=1, max_length=200)
+    template: str = Field(..., min_length=1)   # Marcadores: {nombre}, {lugar}, ...
+    # Mismos filtros que el listado de contactos
+    q: Optional[str] = None
+    tipo_contacto: Optional[str] = None
+    detalle_tipo: Optional[str] = None
+
+class MailMergeJob(BaseModel):
+    id: str
+    status: str               # pending | running | done | failed (encolado)
+    processed: int            # Contactos leídos
+    queued: int               # Correos encolados
+    skipped: int              # Contactos sin email
+    message: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    delivery: Dict[str, int]  # Correos encolados por estado de entrega (pending, sent, dead...)
+
 class UserBase(BaseModel):
     email: EmailStr
     username: str
@@ -90,6 +247,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     username: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -111,6 +272,12 @@ class RatingInDB(RatingBase):
     class Config:
         from_attributes = True
 
+# Página del historial de calificaciones (paginación por cursor)
+class RatingPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None  # None en la última página
+    data: List[RatingInDB]
+
 # Actualizar ContactResponse para incluir ratings
 class ContactResponse(ContactBase):
     id: int
@@ -0,0 +1,152 @@
+import re
+from typing import Optional
+from sqlalchemy import DDL, bindparam, event, column, select, table, text
+from sqlalchemy.orm import Session
+from .database import Base
+
+# Índice de texto completo (SQLite FTS5) sobre los campos buscables del contacto.
+# El rowid de cada fila coincide con contacts.id.
+# remove_diacritics 2 permite que "maria" encuentre "María".
+FTS_TABLE = "contacts_fts"
+SEARCH_FIELDS = ("nombre", "email", "telefono")
+
+contacts_fts = table(FTS_TABLE, column("rowid"), column("rank"), column(FTS_TABLE))
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{', '.join(SEARCH_FIELDS)}, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Base.metadata,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Texto que parece un teléfono: dígitos con +, espacios, guiones, puntos o paréntesis
+_PHONE_RE = re.compile(r"[+\d\s().-]*\d[+\d\s().-]*")
+
+def is_enabled(db: Session) -> bool:
+    """Indica si la base de datos soporta el índice FTS5."""
+    return db.get_bind().dialect.name == "sqlite"
+
+def build_match_query(q: str) -> str:
+    """
+    Convierte el texto del usuario en una expresión MATCH de FTS5.
+    Cada palabra se busca como prefijo y todas deben aparecer ("mar pe" -> "mar"* "pe"*).
+    """
+    tokens = _TOKEN_RE.findall(q)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def phone_digits(q: str) -> Optional[str]:
+    """
+    Dígitos de `q` si parece un teléfono. FTS5 solo busca por prefijo, así
+    que los teléfonos se buscan además como subcadena: "3001112233" debe
+    encontrar "+573001112233".
+    """
+    if not _PHONE_RE.fullmatch(q.strip()):
+        return None
+    return re.sub(r"\D", "", q)
+
+def match_subquery(q: str):
+    """
+    Subconsulta (contact_id, rank) con los contactos que coinciden con `q`.
+    Un rank menor (bm25) indica mayor relevancia.
+    """
+    return (
+        select(
+            contacts_fts.c.rowid.label("contact_id"),
+            contacts_fts.c.rank.label("rank"),
+        )
+        .where(contacts_fts.c[FTS_TABLE].op("MATCH")(build_match_query(q)))
+        .subquery()
+    )
+
+def index_contact(db: Session, contact) -> None:
+    """Inserta o reemplaza la entrada del contacto en el índice (no hace commit)."""
+    if not is_enabled(db):
+        return
+    remove_contact(db, contact.id)
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, nombre, email, telefono) "
+            "VALUES (:id, :nombre, :email, :telefono)"
+        ),
+        {
+            "id": contact.id,
+            "nombre": contact.nombre,
+            "email": contact.email,
+            "telefono": contact.telefono,
+        },
+    )
+
+def index_contacts(db: Session, contacts) -> None:
+    """
+    Indexa en bloque contactos recién insertados (dicts con id, nombre, email
+    y telefono). No hace commit.
+    """
+    if not is_enabled(db) or not contacts:
+        return
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, nombre, email, telefono) "
+            "VALUES (:id, :nombre, :email, :telefono)"
+        ),
+        [
+            {field: contact.get(field) for field in ("id",) + SEARCH_FIELDS}
+            for contact in contacts
+        ],
+    )
+
+def remove_contact(db: Session, contact_id: int) -> None:
+    """Elimina la entrada del contacto del índice (no hace commit)."""
+    if not is_enabled(db):
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": contact_id})
+
+def remove_contacts(db: Session, contact_ids) -> None:
+    """Elimina del índice varios contactos con un solo DELETE (no hace commit)."""
+    if not is_enabled(db) or not contact_ids:
+        return
+    db.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        ),
+        {"ids": list(contact_ids)},
+    )
+
+def rebuild_index(db: Session) -> int:
+    """
+    Reconstruye el índice completo a partir de la tabla contacts.
+    Se usa para poblar bases de datos existentes. Devuelve el número de filas indexadas.
+    """
+    if not is_enabled(db):
+        return 0
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    result = db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, nombre, email, telefono) "
+            "SELECT id, nombre, email, telefono FROM contacts"
+        )
+    )
+    db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    db.commit()
+    return result.rowcount
+
+def backfill_index(db: Session) -> int:
+    """
+    Llena el índice si está vacío pero ya hay contactos (la tabla FTS se
+    acaba de crear sobre una base de datos existente). Se llama al iniciar.
+    """
+    if not is_enabled(db):
+        return 0
+    if db.execute(text(f"SELECT rowid FROM {FTS_TABLE} LIMIT 1")).first() is not None:
+        return 0
+    if db.execute(text("SELECT id FROM contacts LIMIT 1")).first() is None:
+        return 0
+    return rebuild_index(db)
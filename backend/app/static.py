@@ -0,0 +1,65 @@
+"""
+Servidor de /uploads con cabeceras de caché.
+
+Las fotos se guardan por contenido (ab/cd/<sha256>.ext, ver storage), así que
+el contenido de una URL nunca cambia: se sirven con Cache-Control immutable y
+el propio SHA-256 como ETag fuerte. Las miniaturas y las rutas antiguas se
+revalidan con su ETag y reciben 304 si no cambiaron. Si el navegador acepta
+WebP se entrega la variante .webp de la miniatura (Vary: Accept).
+Las peticiones Range las resuelve FileResponse.
+"""
+import os
+from pathlib import Path
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from app import images, storage
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Las miniaturas se regeneran con el mismo nombre si cambian los tamaños
+THUMBNAIL_CACHE_CONTROL = f"public, max-age={os.getenv('THUMBNAIL_CACHE_SECONDS', '86400')}"
+LEGACY_CACHE_CONTROL = f"public, max-age={os.getenv('LEGACY_IMAGE_CACHE_SECONDS', '3600')}, must-revalidate"
+
+def _accepts_webp(headers: Headers) -> bool:
+    return "image/webp" in headers.get("accept", "")
+
+class ImageFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        path = Path(full_path)
+        headers = {}
+
+        if path.parent.name == images.THUMBNAIL_DIR.name:
+            headers["cache-control"] = THUMBNAIL_CACHE_CONTROL
+            if path.suffix != ".webp":
+                webp_path = path.with_suffix(".webp")
+                headers["vary"] = "Accept"
+                if _accepts_webp(request_headers) and webp_path.is_file():
+                    path, stat_result = webp_path, webp_path.stat()
+        elif storage.content_hash(path.name):
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            headers["etag"] = f'"{path.stem}"'
+        else:
+            headers["cache-control"] = LEGACY_CACHE_CONTROL
+
+        response = FileResponse(path, status_code=status_code, headers=headers, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        # Con If-None-Match se ignora If-Modified-Since (RFC 9110, 13.1.3)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is None:
+            return super().is_not_modified(response_headers, request_headers)
+        etag = response_headers.get("etag")
+        return if_none_match.strip() == "*" or etag in [
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ]
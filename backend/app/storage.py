@@ -0,0 +1,249 @@
+"""
+Almacenamiento de imágenes direccionado por contenido.
+
+Cada archivo se guarda una sola vez como uploads/ab/cd/<sha256>.<ext> (los dos
+primeros pares del hash forman los subdirectorios) y stored_images lleva la
+cuenta de contactos que lo usan. crud ajusta la cuenta en la misma transacción
+que crea, modifica o elimina el contacto; el archivo solo se borra cuando deja
+de tener referencias.
+
+Las fotos subidas por la API se reciben con stage_upload: se leen por bloques
+sin bloquear el event loop, se limita su tamaño, se identifica el formato por
+sus primeros bytes y se dejan en un archivo temporal que solo pasa a su ruta
+definitiva (StagedUpload.commit) después del commit en la base de datos.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app import models_db
+from app.database import upsert
+
+UPLOAD_DIR = Path("uploads")
+TEMP_DIR = UPLOAD_DIR / "temp"
+COPY_CHUNK_SIZE = 1024 * 1024
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+
+# Extensiones equivalentes se guardan con un solo nombre
+EXTENSION_ALIASES = {".jpeg": ".jpg"}
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def normalize_extension(extension: str) -> str:
+    extension = extension.lower()
+    return EXTENSION_ALIASES.get(extension, extension)
+
+def relative_path(digest: str, extension: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{normalize_extension(extension)}"
+
+def image_url(relative: str) -> str:
+    return f"/uploads/{relative}"
+
+def local_path(imagen: str) -> Path:
+    """Ruta en disco de una imagen guardada como /uploads/..."""
+    return UPLOAD_DIR / imagen.removeprefix("/uploads/").lstrip("/")
+
+def content_hash(imagen: Optional[str]) -> Optional[str]:
+    """SHA-256 de una imagen direccionada por contenido (None para rutas antiguas)."""
+    if not imagen:
+        return None
+    stem = Path(imagen).stem
+    return stem if _HASH_RE.match(stem) else None
+
+def save_file(fileobj: BinaryIO, extension: str) -> str:
+    """
+    Copia el archivo calculando su SHA-256 y lo deja en su ruta definitiva
+    si aún no existe. Devuelve la URL /uploads/ab/cd/<sha256>.<ext>.
+    """
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=TEMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := fileobj.read(COPY_CHUNK_SIZE):
+                hasher.update(chunk)
+                buffer.write(chunk)
+        relative = relative_path(hasher.hexdigest(), extension)
+        destination = UPLOAD_DIR / relative
+        if destination.exists():
+            os.remove(temp_path)
+        else:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return image_url(relative)
+
+# Firmas (primeros bytes) de los formatos de imagen aceptados
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Extensión según el contenido, o None si no es un formato de imagen aceptado."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head.startswith(b"BM"):
+        return ".bmp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+class InvalidUpload(ValueError):
+    """Archivo rechazado; status_code indica la respuesta HTTP (400 o 413)."""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+@dataclass
+class StagedUpload:
+    """Imagen ya verificada en un archivo temporal, pendiente del commit."""
+    temp_path: str
+    relative: str
+    size: int
+
+    @property
+    def url(self) -> str:
+        return image_url(self.relative)
+
+    def commit(self) -> None:
+        """
+        Mueve el temporal a su ruta definitiva, aunque ya exista: el contenido
+        es el mismo, y si otra petición borró la última referencia anterior
+        entre tanto, el archivo vuelve a quedar en disco.
+        """
+        destination = UPLOAD_DIR / self.relative
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.temp_path, destination)
+
+    def discard(self) -> None:
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+def _write_chunk(buffer, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+async def stage_upload(upload, max_bytes: Optional[int] = None) -> StagedUpload:
+    """
+    Copia un UploadFile a un temporal por bloques: la lectura es asíncrona y la
+    escritura y el SHA-256 se hacen en el threadpool. Lanza InvalidUpload si
+    supera `max_bytes` (MAX_IMAGE_BYTES) o si sus primeros bytes no
+    corresponden a una imagen aceptada; la extensión del nombre se ignora.
+    """
+    max_bytes = MAX_IMAGE_BYTES if max_bytes is None else max_bytes
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TEMP_DIR)
+    buffer = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size, extension = 0, None
+    try:
+        while chunk := await upload.read(COPY_CHUNK_SIZE):
+            if extension is None:
+                extension = sniff_image_type(chunk[:16])
+                if extension is None:
+                    raise InvalidUpload("El archivo no es una imagen JPEG, PNG, GIF, BMP o WebP")
+            size += len(chunk)
+            if size > max_bytes:
+                raise InvalidUpload(
+                    f"La imagen supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB",
+                    status_code=413
+                )
+            await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+        if extension is None:
+            raise InvalidUpload("El archivo está vacío")
+        await run_in_threadpool(buffer.close)
+    except BaseException:
+        buffer.close()
+        os.remove(temp_path)
+        raise
+    return StagedUpload(temp_path, relative_path(hasher.hexdigest(), extension), size)
+
+def acquire(db: Session, imagen: Optional[str], size: Optional[int] = None) -> None:
+    """
+    Suma una referencia a la imagen (no hace commit). Ignora rutas antiguas.
+    `size` se usa si el archivo todavía no está en disco (StagedUpload).
+    """
+    digest = content_hash(imagen)
+    if digest is None:
+        return
+    # Un solo INSERT ... ON CONFLICT: dos subidas simultáneas de la misma
+    # imagen nueva suman referencias en vez de chocar con la clave primaria
+    Stored = models_db.StoredImage
+    path = local_path(imagen)
+    stmt = upsert(db.get_bind())(Stored).values(
+        sha256=digest,
+        path=path.relative_to(UPLOAD_DIR).as_posix(),
+        size=path.stat().st_size if path.exists() else size,
+        refcount=1
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["sha256"],
+        set_={"refcount": Stored.refcount + 1}
+    ))
+
+def release(db: Session, imagen: Optional[str]) -> bool:
+    """
+    Quita una referencia a la imagen (no hace commit). Devuelve True si era la
+    última y el archivo debe borrarse después del commit. Las rutas antiguas no
+    se comparten, así que siempre devuelven True.
+    """
+    if not imagen:
+        return False
+    digest = content_hash(imagen)
+    if digest is None:
+        return True
+    stored = db.get(models_db.StoredImage, digest)
+    if stored is None:
+        return True
+    db.refresh(stored, ["refcount"])
+    if stored.refcount <= 1:
+        db.delete(stored)
+        db.flush()
+        return True
+    stored.refcount = models_db.StoredImage.refcount - 1
+    db.flush()
+    return False
+
+def is_referenced(db: Session, imagen: str) -> bool:
+    """Indica si algún contacto usa la imagen."""
+    return db.scalar(
+        select(func.count(models_db.Contact.id)).where(models_db.Contact.imagen == imagen)
+    ) > 0
+
+def rebuild_refcounts(db: Session) -> int:
+    """
+    Recalcula stored_images a partir de contacts.imagen (fuente de verdad).
+    Devuelve el número de imágenes registradas.
+    """
+    rows = db.execute(
+        select(models_db.Contact.imagen, func.count(models_db.Contact.id))
+        .where(models_db.Contact.imagen.isnot(None))
+        .group_by(models_db.Contact.imagen)
+    ).all()
+    refcounts = {}
+    for imagen, refcount in rows:
+        digest = content_hash(imagen)
+        if digest is not None:
+            previous = refcounts.get(digest, (imagen, 0))
+            refcounts[digest] = (previous[0], previous[1] + refcount)
+
+    db.query(models_db.StoredImage).delete()
+    for digest, (imagen, refcount) in refcounts.items():
+        path = local_path(imagen)
+        db.add(models_db.StoredImage(
+            sha256=digest,
+            path=path.relative_to(UPLOAD_DIR).as_posix(),
+            size=path.stat().st_size if path.exists() else None,
+            refcount=refcount
+        ))
+    db.commit()
+    return len(refcounts)
@@ -1,18 +1,25 @@
+import io
+import os
+# Los tests entregan la bandeja de salida llamando a outbox.deliver_due
+os.environ.setdefault("EMAIL_WORKER_ENABLED", "false")
+# Base de datos de tests. Se fija antes de importar la app para que los motores
+# síncrono y asíncrono de app.database, y los módulos que abren SessionLocal
+# por su cuenta (exportación, importación, miniaturas, outbox...), nunca
+# usen la base de datos configurada en DATABASE_URL o en .env.
+TEST_SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = TEST_SQLALCHEMY_DATABASE_URL
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from PIL import Image
+from app import database, images, routes, storage
+from app.database import Base, get_async_db, get_db
 from app.main import app
-import os
+from app.deps import user_cache
 
-# Usar base de datos en memoria para tests
-TEST_SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(
-    TEST_SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+assert str(database.engine.url) == TEST_SQLALCHEMY_DATABASE_URL
+engine = database.engine
+TestingSessionLocal = database.SessionLocal
+TestingAsyncSessionLocal = database.AsyncSessionLocal
 
 @pytest.fixture(scope="function")
 def db():
@@ -42,7 +49,57 @@ def client(db):
         finally:
             db.rollback()
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    user_cache.clear()
     with TestClient(app) as test_client:
         yield test_client
-    del app.dependency_overrides[get_db]
+    app.dependency_overrides.clear()
+
+@pytest.fixture(scope="function")
+def auth_headers(client):
+    """
+    Registra un usuario, inicia sesión y devuelve sus cabeceras de autorización:
+    headers = auth_headers("ana@example.com", "anauser")
+    """
+    def _auth_headers(email: str, username: str):
+        client.post("/api/auth/signup", json={
+            "email": email,
+            "username": username,
+            "password": "testpass123"
+        })
+        login_response = client.post("/api/auth/login", json={
+            "email": email,
+            "password": "testpass123"
+        })
+        token = login_response.json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return _auth_headers
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """
+    Guarda las imágenes, los temporales y las miniaturas en un directorio
+    temporal del test
+    """
+    monkeypatch.setattr(routes, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(storage, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(storage, "TEMP_DIR", tmp_path / "temp")
+    monkeypatch.setattr(images, "THUMBNAIL_DIR", tmp_path / "thumbs")
+    return tmp_path
+
+@pytest.fixture
+def png():
+    """
+    Genera los bytes de una imagen PNG de un solo color:
+    foto = png(300, 300, (0, 0, 255, 255))
+    """
+    def _png(width: int = 80, height: int = 80, color=(200, 30, 30, 128)) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGBA", (width, height), color).save(buffer, "PNG")
+        return buffer.getvalue()
+    return _png
@@ -0,0 +1,155 @@
+import re
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.database import engine, async_engine
+from app.deps import user_cache
+from app import auth, crud, models_db
+
+@pytest.fixture
+def user_queries():
+    """Cuenta las consultas SQL que leen la tabla users"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"\bFROM users\b", statement):
+            statements.append(statement)
+
+    engines = [engine, async_engine.sync_engine]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for e in engines:
+        event.remove(e, "before_cursor_execute", before_cursor_execute)
+
+def test_usuario_se_resuelve_una_vez(client: TestClient, db: Session, user_queries, auth_headers):
+    """Test para verificar que cada endpoint hace como máximo una consulta de usuario"""
+    headers = auth_headers("cache@example.com", "cacheuser")
+    user_cache.clear()
+    user_queries.clear()
+
+    response = client.post(
+        "/api/contactos/",
+        data={"nombre": "Contacto", "telefono": "+573001234567"},
+        headers=headers
+    )
+    assert response.status_code == 201
+    assert len(user_queries) == 1
+
+    contact_id = response.json()["id"]
+    requests = [
+        ("get", "/api/contactos/", {}),
+        ("get", f"/api/contactos/{contact_id}", {}),
+        ("get", "/api/contactos/facets", {}),
+        ("post", f"/api/contactos/{contact_id}/ratings", {"json": [
+            {"categoria": "Confiabilidad", "calificacion": 5, "comentario": "Bien"}
+        ]}),
+        ("get", f"/api/contactos/{contact_id}/ratings", {}),
+        ("put", f"/api/contactos/{contact_id}", {"data": {"nombre": "Otro", "telefono": "+573001234567"}}),
+        ("delete", f"/api/contactos/{contact_id}", {}),
+    ]
+    for method, url, kwargs in requests:
+        user_queries.clear()
+        response = getattr(client, method)(url, headers=headers, **kwargs)
+        assert response.status_code < 300, url
+        assert user_queries == [], url
+
+def test_cache_se_invalida_al_modificar_usuario(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que la caché descarta al usuario modificado"""
+    headers = auth_headers("cache2@example.com", "cacheuser2")
+    assert client.get("/api/contactos/", headers=headers).status_code == 200
+    assert user_cache.get("cache2@example.com") is not None
+
+    user = crud.get_user_by_email(db, "cache2@example.com")
+    user.username = "renombrado"
+    db.commit()
+    assert user_cache.get("cache2@example.com") is None
+
+def test_login_rechaza_con_429_si_el_pool_esta_lleno(client: TestClient, db: Session, monkeypatch, auth_headers):
+    """Test para verificar el control de admisión del pool de bcrypt"""
+    auth_headers("busy@example.com", "busyuser")
+    monkeypatch.setattr(auth.password_pool, "pending", auth.password_pool.workers + auth.password_pool.queue_depth)
+
+    response = client.post("/api/auth/login", json={
+        "email": "busy@example.com",
+        "password": "testpass123"
+    })
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+def test_login_actualiza_hash_obsoleto(client: TestClient, db: Session):
+    """Test para verificar que el login rehace hashes con menos rondas de las configuradas"""
+    db.add(models_db.User(
+        email="legacy@example.com",
+        username="legacyuser",
+        hashed_password=auth.pwd_context.hash("testpass123", rounds=4)
+    ))
+    db.commit()
+
+    response = client.post("/api/auth/login", json={
+        "email": "legacy@example.com",
+        "password": "testpass123"
+    })
+    assert response.status_code == 200
+
+    db.expire_all()
+    user = crud.get_user_by_email(db, "legacy@example.com")
+    assert not auth.pwd_context.needs_update(user.hashed_password)
+    assert auth.pwd_context.verify("testpass123", user.hashed_password)
+
+    assert client.get("/api/auth/metrics").status_code == 401
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    metrics = client.get("/api/auth/metrics", headers=headers).json()
+    assert metrics["login"]["count"] >= 1
+    assert metrics["login"]["p99_ms"] is not None
+
+def test_refresh_token_rota_y_detecta_reutilizacion(client: TestClient, db: Session):
+    """Test para verificar la rotación y revocación de tokens de refresco"""
+    client.post("/api/auth/signup", json={
+        "email": "refresh@example.com",
+        "username": "refreshuser",
+        "password": "testpass123"
+    })
+    login = client.post("/api/auth/login", json={
+        "email": "refresh@example.com",
+        "password": "testpass123"
+    }).json()
+    first = login["refresh_token"]
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 200
+    renewed = response.json()
+    assert renewed["username"] == "refreshuser"
+    assert renewed["refresh_token"] != first
+    headers = {"Authorization": f"Bearer {renewed['access_token']}"}
+    assert client.get("/api/contactos/", headers=headers).status_code == 200
+
+    # Reutilizar el token ya rotado revoca también el nuevo
+    assert client.post("/api/auth/refresh", json={"refresh_token": first}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": renewed["refresh_token"]}).status_code == 401
+
+def test_logout_revoca_refresh_token(client: TestClient, db: Session):
+    """Test para verificar que el logout invalida el token de refresco"""
+    client.post("/api/auth/signup", json={
+        "email": "logout@example.com",
+        "username": "logoutuser",
+        "password": "testpass123"
+    })
+    token = client.post("/api/auth/login", json={
+        "email": "logout@example.com",
+        "password": "testpass123"
+    }).json()["refresh_token"]
+
+    assert client.post("/api/auth/logout", json={"refresh_token": token}).status_code == 204
+    assert client.post("/api/auth/refresh", json={"refresh_token": token}).status_code == 401
+
+def test_tokens_se_eliminan_con_el_usuario(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que SQLite aplica ON DELETE CASCADE (PRAGMA foreign_keys)"""
+    auth_headers("cascade@example.com", "cascadeuser")
+    user_id = crud.get_user_by_email(db, "cascade@example.com").id
+    assert db.query(models_db.RefreshToken).filter_by(user_id=user_id).count() == 2
+
+    db.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+    db.commit()
+    assert db.query(models_db.RefreshToken).filter_by(user_id=user_id).count() == 0
@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+def _crear(client: TestClient, headers, nombre: str, telefono: str, **extra):
+    response = client.post(
+        "/api/contactos/",
+        data={"nombre": nombre, "telefono": telefono, **extra},
+        headers=headers
+    )
+    return response.json()["id"]
+
+def test_lote_de_operaciones(client: TestClient, db: Session, auth_headers):
+    """Test para verificar creación, modificación y eliminación en un solo lote"""
+    headers = auth_headers("batch@example.com", "batchuser")
+    otros = auth_headers("batch2@example.com", "batchuser2")
+    ana = _crear(client, headers, "Ana Pérez", "+573001234567", tipo_contacto="Cliente", detalle_tipo="Frecuente")
+    luis = _crear(client, headers, "Luis Mora", "+573001234568")
+    ajeno = _crear(client, otros, "Contacto Ajeno", "+573001234569")
+
+    response = client.post("/api/contactos/batch", json={"operations": [
+        {"op": "create", "data": {"nombre": "Marta Ríos", "telefono": "+573001234570",
+                                  "tipo_contacto": "Proveedor", "detalle_tipo": "Software"}},
+        {"op": "create", "data": {"nombre": "M", "telefono": "123"}},
+        {"op": "patch", "id": ana, "data": {"tipo_contacto": "Proveedor", "detalle_tipo": "Software"}},
+        {"op": "patch", "id": ana, "data": {"detalle_tipo": "Frecuente"}},
+        {"op": "patch", "id": luis, "data": {"owner_id": 2}},
+        {"op": "delete", "id": luis},
+        {"op": "delete", "id": ajeno},
+        {"op": "patch", "id": luis, "data": {"nombre": "Luis"}},
+    ]}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [201, 422, 200, 422, 422, 204, 404, 404]
+    assert (body["succeeded"], body["failed"]) == (3, 5)
+    assert body["results"][0]["contacto"]["nombre"] == "Marta Ríos"
+    assert body["results"][2]["contacto"]["detalle_tipo"] == "Software"
+
+    contactos = client.get("/api/contactos/", headers=headers).json()
+    assert contactos["total"] == 2
+    assert {c["nombre"] for c in contactos["data"]} == {"Ana Pérez", "Marta Ríos"}
+    facets = client.get("/api/contactos/facets", headers=headers).json()
+    assert facets["tipos"] == [{"tipo_contacto": "Proveedor", "total": 2,
+                                "detalles": [{"detalle_tipo": "Software", "total": 2}]}]
+    assert client.get("/api/contactos/?q=marta", headers=headers).json()["total"] == 1
+    assert client.get("/api/contactos/?q=luis", headers=headers).json()["total"] == 0
+    assert client.get("/api/contactos/", headers=otros).json()["total"] == 1
+
+def test_lote_demasiado_grande(client: TestClient, db: Session, monkeypatch, auth_headers):
+    """Test para verificar el límite de operaciones por lote"""
+    from app import batch
+    headers = auth_headers("batch3@example.com", "batchuser3")
+    monkeypatch.setattr(batch, "BATCH_MAX_OPERATIONS", 2)
+    response = client.post("/api/contactos/batch", json={"operations": [
+        {"op": "delete", "id": i} for i in range(3)
+    ]}, headers=headers)
+    assert response.status_code == 413
@@ -0,0 +1,106 @@
+import asyncio
+import socket
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app import email_utils, outbox
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+class _Handler:
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("rechazado@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return "250 Message accepted for delivery"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = _Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+def _pool(port: int, **overrides) -> email_utils.SMTPConnectionPool:
+    settings = email_utils.SMTPSettings(
+        host="127.0.0.1", port=port, starttls=False, timeout=5, pool_size=1, **overrides
+    )
+    return email_utils.SMTPConnectionPool(settings)
+
+def test_envios_reutilizan_la_conexion(smtp_server):
+    """Test para verificar que varios envíos usan una sola conexión del pool"""
+    controller, handler = smtp_server
+    pool = _pool(controller.port)
+    sender = email_utils.EmailSender(pool)
+
+    async def enviar():
+        for i in range(3):
+            await sender.send_email([f"destino{i}@example.com"], f"Asunto {i}", "Hola")
+    asyncio.run(enviar())
+    pool.close()
+
+    assert [e.rcpt_tos for e in handler.envelopes] == [[f"destino{i}@example.com"] for i in range(3)]
+    assert pool.connections_opened == 1
+
+def test_reconecta_si_el_servidor_cierra(smtp_server):
+    """Test para verificar que una conexión cerrada por el servidor se reemplaza"""
+    controller, handler = smtp_server
+    pool = _pool(controller.port, idle_check_seconds=0)
+    sender = email_utils.EmailSender(pool)
+
+    asyncio.run(sender.send_email(["uno@example.com"], "Antes", "Hola"))
+    controller.stop()
+    controller.start()
+    asyncio.run(sender.send_email(["dos@example.com"], "Después", "Hola"))
+    pool.close()
+
+    assert [e.rcpt_tos for e in handler.envelopes] == [["uno@example.com"], ["dos@example.com"]]
+    assert pool.connections_opened == 2
+
+def test_endpoint_send_email(client: TestClient, db: Session, smtp_server, tmp_path, monkeypatch, auth_headers):
+    """Test para verificar la entrega desde la bandeja de salida con estado por destinatario"""
+    controller, handler = smtp_server
+    monkeypatch.setattr(outbox, "OUTBOX_DIR", tmp_path)
+    headers = auth_headers("mailer@example.com", "maileruser")
+
+    response = client.post(
+        "/api/contactos/send-email",
+        data={
+            "subject": "Reunión",
+            "message": "Adjunto la agenda",
+            "recipients": '["ana@example.com", "rechazado@example.com"]'
+        },
+        files={"attachments": ("agenda.txt", b"punto 1", "text/plain")},
+        headers=headers
+    )
+    assert response.status_code == 202
+    assert handler.envelopes == []
+
+    pool = _pool(controller.port)
+    assert asyncio.run(outbox.deliver_due(pool)) == 1
+    pool.close()
+    assert len(handler.envelopes) == 1
+    assert handler.envelopes[0].rcpt_tos == ["ana@example.com"]
+    assert b'filename="agenda.txt"' in handler.envelopes[0].content
+
+    estado = client.get(f"/api/contactos/send-email/{response.json()['id']}", headers=headers).json()
+    assert estado["status"] == "partial"
+    assert {r["email"]: r["status"] for r in estado["recipients"]} == {
+        "ana@example.com": "sent", "rechazado@example.com": "failed"
+    }
+    # Entregado: el adjunto ya no se guarda
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,87 @@
+import gzip
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+def _crear_contactos(client: TestClient, headers):
+    for nombre, tipo in [("Ana; Pérez", "Proveedor"), ("Beto", "Cliente"), ("Carla", "Proveedor")]:
+        client.post(
+            "/api/contactos/",
+            data={"nombre": nombre, "telefono": "+573001234567", "tipo_contacto": tipo},
+            headers=headers
+        )
+
+def test_exportar_ndjson_con_filtros(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la exportación NDJSON con los filtros del listado"""
+    headers = auth_headers("export@example.com", "exportuser")
+    _crear_contactos(client, headers)
+
+    response = client.get("/api/contactos/export?format=ndjson&tipo_contacto=Proveedor", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["nombre"] for r in rows] == ["Ana; Pérez", "Carla"]
+
+def test_exportar_csv_y_vcard_comprimidos(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la exportación CSV y vCard con gzip"""
+    headers = auth_headers("export2@example.com", "exportuser2")
+    _crear_contactos(client, headers)
+
+    response = client.get("/api/contactos/export?format=csv&gzip=true", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="contactos.csv.gz"'
+    lines = gzip.decompress(response.content).decode("utf-8-sig").splitlines()
+    assert lines[0].startswith("ID;Nombre;Teléfono")
+    assert len(lines) == 4
+    assert '"Ana; Pérez"' in lines[1]
+
+    response = client.get("/api/contactos/export?format=vcf&q=beto", headers=headers)
+    assert response.text.count("BEGIN:VCARD") == 1
+    assert "FN:Beto" in response.text
+
+def test_exportar_csv_neutraliza_formulas(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que las celdas que empiezan como fórmula se exportan como texto"""
+    headers = auth_headers("export3@example.com", "exportuser3")
+    client.post(
+        "/api/contactos/",
+        data={"nombre": "=HYPERLINK(\"http://x\")", "telefono": "+573001234567", "tipo_contacto": "Cliente"},
+        headers=headers
+    )
+
+    response = client.get("/api/contactos/export?format=csv", headers=headers)
+    assert response.status_code == 200
+    line = response.content.decode("utf-8-sig").splitlines()[1]
+    assert "'=HYPERLINK" in line
+    assert ";+573001234567;" in line
+
+    response = client.get("/api/contactos/export?format=ndjson", headers=headers)
+    assert json.loads(response.text.splitlines()[0])["nombre"] == "=HYPERLINK(\"http://x\")"
+
+def test_exportar_csv_e_importar_de_nuevo(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que el CSV exportado se vuelve a importar sin cambios"""
+    headers = auth_headers("export4@example.com", "exportuser4")
+    _crear_contactos(client, headers)
+    client.post(
+        "/api/contactos/",
+        data={"nombre": "=SUMA(1;2)", "telefono": "+573001112233", "tipo_contacto": "Cliente"},
+        headers=headers
+    )
+    exportado = client.get("/api/contactos/export?format=csv", headers=headers).content
+
+    otros = auth_headers("export5@example.com", "exportuser5")
+    response = client.post(
+        "/api/contactos/import",
+        files={"archivo": ("contactos.csv", exportado, "text/csv")},
+        headers=otros
+    )
+    assert response.status_code == 200
+    assert (response.json()["succeeded"], response.json()["failed"]) == (4, 0)
+
+    importados = client.get("/api/contactos/export?format=ndjson", headers=otros).text.splitlines()
+    rows = [json.loads(line) for line in importados]
+    assert sorted((r["nombre"], r["telefono"]) for r in rows) == [
+        ("=SUMA(1;2)", "+573001112233"),
+        ("Ana; Pérez", "+573001234567"),
+        ("Beto", "+573001234567"),
+        ("Carla", "+573001234567"),
+    ]
@@ -0,0 +1,170 @@
+import hashlib
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+from app import images, models_db, storage
+
+def test_miniaturas_en_segundo_plano(client: TestClient, db: Session, upload_dir, auth_headers, png):
+    """Test para verificar la generación y limpieza de miniaturas"""
+    headers = auth_headers("thumbs@example.com", "thumbsuser")
+    response = client.post(
+        "/api/contactos/",
+        data={"nombre": "Con Foto", "telefono": "+573001234567"},
+        files={"imagen": ("foto.png", png(1200, 800), "image/png")},
+        headers=headers
+    )
+    assert response.status_code == 201
+    contact_id = response.json()["id"]
+
+    # TestClient ejecuta las tareas en segundo plano antes de devolver la respuesta
+    contacto = client.get(f"/api/contactos/{contact_id}", headers=headers).json()
+    thumbnails = contacto["thumbnails"]
+    assert set(thumbnails) == set(images.THUMBNAIL_SIZES)
+    assert (thumbnails["md"]["width"], thumbnails["md"]["height"]) == (160, 160)
+    assert thumbnails["sm"]["url"].endswith("_sm.png")
+    primeras = list((upload_dir / "thumbs").iterdir())
+    assert len(primeras) == 2 * len(images.THUMBNAIL_SIZES)
+    with Image.open(upload_dir / "thumbs" / thumbnails["lg"]["webp"].rsplit("/", 1)[1]) as webp:
+        assert webp.format == "WEBP"
+
+    # Una imagen nueva reemplaza las miniaturas anteriores
+    client.put(
+        f"/api/contactos/{contact_id}",
+        data={"nombre": "Con Foto", "telefono": "+573001234567"},
+        files={"imagen": ("foto.png", png(300, 300), "image/png")},
+        headers=headers
+    )
+    actualizado = client.get(f"/api/contactos/{contact_id}", headers=headers).json()
+    assert actualizado["thumbnails"]["sm"]["url"] != thumbnails["sm"]["url"]
+    assert not any(path.exists() for path in primeras)
+
+    client.delete(f"/api/contactos/{contact_id}", headers=headers)
+    assert list((upload_dir / "thumbs").iterdir()) == []
+
+def test_imagen_invalida_no_genera_miniaturas(client: TestClient, db: Session, upload_dir, auth_headers):
+    """Test para verificar que una imagen corrupta deja thumbnails en None"""
+    headers = auth_headers("thumbs2@example.com", "thumbsuser2")
+    response = client.post(
+        "/api/contactos/",
+        data={"nombre": "Foto Rota", "telefono": "+573001234567"},
+        files={"imagen": ("foto.png", b"\x89PNG\r\n\x1a\n datos corruptos", "image/png")},
+        headers=headers
+    )
+    assert response.status_code == 201
+    contacto = client.get(f"/api/contactos/{response.json()['id']}", headers=headers).json()
+    assert contacto["thumbnails"] is None
+
+def test_subida_validada_por_contenido(client: TestClient, db: Session, upload_dir, monkeypatch, auth_headers, png):
+    """Test para verificar el tipo por contenido, el límite de tamaño y la limpieza del temporal"""
+    headers = auth_headers("uploads@example.com", "uploadsuser")
+    datos = {"nombre": "Subida", "telefono": "+573001234567"}
+
+    # Un PNG con nombre .jpg se guarda como .png
+    response = client.post(
+        "/api/contactos/", data=datos,
+        files={"imagen": ("foto.jpg", png(40, 40), "image/jpeg")},
+        headers=headers
+    )
+    assert response.status_code == 201
+    assert response.json()["imagen"].endswith(".png")
+
+    # Un archivo que no es imagen se rechaza aunque su extensión lo parezca
+    response = client.post(
+        "/api/contactos/", data=datos,
+        files={"imagen": ("foto.jpg", b"no es una imagen", "image/jpeg")},
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json()["message"]["field"] == "imagen"
+
+    monkeypatch.setattr(storage, "MAX_IMAGE_BYTES", 1024)
+    monkeypatch.setattr(storage, "COPY_CHUNK_SIZE", 256)
+    response = client.post(
+        "/api/contactos/", data=datos,
+        files={"imagen": ("grande.png", png(10, 10) + b"\0" * 4096, "image/png")},
+        headers=headers
+    )
+    assert response.status_code == 413
+
+    assert client.get("/api/contactos/", headers=headers).json()["total"] == 1
+    assert len(_files_in(upload_dir)) == 1
+    assert list((upload_dir / "temp").iterdir()) == []
+
+def _files_in(directory):
+    return sorted(p for p in directory.rglob("*") if p.is_file() and "temp" not in p.parts and "thumbs" not in p.parts)
+
+def test_imagenes_deduplicadas(client: TestClient, db: Session, upload_dir, auth_headers, png):
+    """Test para verificar que una misma foto se guarda una vez y se borra con su última referencia"""
+    headers = auth_headers("dedupe@example.com", "dedupeuser")
+    foto = png(100, 100)
+    ids = [
+        client.post(
+            "/api/contactos/",
+            data={"nombre": f"Duplicado {i}", "telefono": f"+57300123456{i}"},
+            files={"imagen": (f"foto{i}.png", foto, "image/png")},
+            headers=headers
+        ).json()["id"]
+        for i in range(2)
+    ]
+    archivos = _files_in(upload_dir)
+    assert len(archivos) == 1
+    digest = archivos[0].stem
+    assert archivos[0].relative_to(upload_dir).as_posix() == f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+    db.expire_all()
+    assert db.get(models_db.StoredImage, digest).refcount == 2
+
+    # Cambiar la foto de uno libera una referencia pero conserva el archivo compartido
+    client.put(
+        f"/api/contactos/{ids[0]}",
+        data={"nombre": "Duplicado 0", "telefono": "+573001234560"},
+        files={"imagen": ("otra.png", png(100, 100, (0, 0, 255, 255)), "image/png")},
+        headers=headers
+    )
+    assert len(_files_in(upload_dir)) == 2
+    client.delete(f"/api/contactos/{ids[1]}", headers=headers)
+    assert not archivos[0].exists()
+    db.expire_all()
+    assert db.get(models_db.StoredImage, digest) is None
+
+def test_commit_restaura_imagen_borrada(upload_dir, png):
+    """Test para verificar que el commit de una subida deja el archivo aunque otra petición lo borre"""
+    foto = png(10, 10)
+    relative = storage.relative_path(hashlib.sha256(foto).hexdigest(), "png")
+
+    def subir():
+        temp_path = upload_dir / "staged.tmp"
+        temp_path.write_bytes(foto)
+        storage.StagedUpload(str(temp_path), relative, len(foto)).commit()
+        assert not temp_path.exists()
+
+    subir()
+    # Otra petición eliminó la última referencia anterior y su archivo
+    # después de que esta subida lo encontrara en disco
+    (upload_dir / relative).unlink()
+    subir()
+    assert (upload_dir / relative).read_bytes() == foto
+
+def test_migracion_de_imagenes_antiguas(client: TestClient, db: Session, upload_dir, auth_headers, png):
+    """Test para verificar la migración de rutas antiguas y la unión de duplicados"""
+    headers = auth_headers("legacy@example.com", "legacyuser")
+    foto = png(50, 50)
+    for i in range(3):
+        (upload_dir / f"1_Camilo Molano_{i}.png").write_bytes(foto)
+        contact_id = client.post(
+            "/api/contactos/",
+            data={"nombre": f"Camilo {i}", "telefono": f"+57300123456{i}"},
+            headers=headers
+        ).json()["id"]
+        db.query(models_db.Contact).filter_by(id=contact_id).update(
+            {"imagen": f"/uploads/1_Camilo Molano_{i}.png"}
+        )
+        db.commit()
+
+    resultado = images.migrate_legacy_images(db)
+    assert resultado == {"migradas": 3, "archivos": 1, "faltantes": 0}
+    archivos = _files_in(upload_dir)
+    assert len(archivos) == 1 and storage.content_hash(archivos[0].name)
+    assert {c.imagen for c in db.query(models_db.Contact)} == {storage.image_url(
+        archivos[0].relative_to(upload_dir).as_posix()
+    )}
+    assert db.get(models_db.StoredImage, archivos[0].stem).refcount == 3
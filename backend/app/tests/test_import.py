@@ -0,0 +1,74 @@
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app import importer
+
+def test_importar_csv_con_reporte_de_errores(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la importación CSV con cabeceras del frontend y filas inválidas"""
+    headers = auth_headers("import@example.com", "importuser")
+    csv_data = (
+        "﻿ID;Nombre;Teléfono;Email;Tipo de Contacto;Detalle del Tipo\n"
+        "1;María Pérez;+57 300 111 2233;maria@example.com;Proveedor;Software\n"
+        "2;X;+573001112233;;;\n"
+        "3;José Gómez;+573001112244;no-es-email;;\n"
+        "4;Ana Ruiz;+573001112255;;Cliente;Software\n"
+        "5;Luis Mora;+573001112266;;Cliente;Frecuente\n"
+    )
+    response = client.post(
+        "/api/contactos/import",
+        files={"archivo": ("contactos.csv", csv_data.encode("utf-8"), "text/csv")},
+        headers=headers
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["status"] == "done"
+    assert (report["processed"], report["succeeded"], report["failed"]) == (5, 2, 3)
+    assert [e["row"] for e in report["errors"]] == [3, 4, 5]
+    assert report["errors"][2]["errors"][0]["field"] == "detalle_tipo"
+
+    # Los contactos importados quedan indexados y contados
+    assert client.get("/api/contactos/?q=maria", headers=headers).json()["total"] == 1
+    facets = client.get("/api/contactos/facets", headers=headers).json()
+    assert facets["total"] == 2
+
+def test_importar_en_segundo_plano(client: TestClient, db: Session, monkeypatch, auth_headers):
+    """Test para verificar que los archivos grandes se importan como trabajo"""
+    headers = auth_headers("import2@example.com", "importuser2")
+    monkeypatch.setattr(importer, "IMPORT_SYNC_MAX_BYTES", 10)
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 2)
+
+    lines = [json.dumps({"nombre": f"Contacto {i}", "telefono": f"+57300123456{i}"}) for i in range(5)]
+    lines.append("{no es json")
+    response = client.post(
+        "/api/contactos/import",
+        files={"archivo": ("contactos.ndjson", "\n".join(lines).encode("utf-8"))},
+        headers=headers
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    # TestClient ejecuta las tareas en segundo plano antes de devolver la respuesta
+    job = client.get(f"/api/contactos/import/{job_id}", headers=headers).json()
+    assert job["status"] == "done"
+    assert (job["succeeded"], job["failed"]) == (5, 1)
+    assert client.get("/api/contactos/", headers=headers).json()["total"] == 5
+
+def test_importar_vcard(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la importación de vCard exportadas por la API"""
+    headers = auth_headers("import3@example.com", "importuser3")
+    client.post(
+        "/api/contactos/",
+        data={"nombre": "Ana Pérez, hija", "telefono": "+573001234567", "lugar": "Bogotá",
+              "tipo_contacto": "Proveedor", "detalle_tipo": "Software"},
+        headers=headers
+    )
+    vcf = client.get("/api/contactos/export?format=vcf", headers=headers).content
+
+    response = client.post(
+        "/api/contactos/import",
+        files={"archivo": ("agenda.vcf", vcf)},
+        headers=headers
+    )
+    assert response.json()["succeeded"] == 1
+    contactos = client.get("/api/contactos/?tipo_contacto=Proveedor", headers=headers).json()["data"]
+    assert [c["lugar"] for c in contactos] == ["Bogotá", "Bogotá"]
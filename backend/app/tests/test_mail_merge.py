@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app import mail_merge, models_db
+
+def test_combinacion_de_correspondencia(client: TestClient, db: Session, monkeypatch, auth_headers):
+    """Test para verificar un correo por contacto filtrado, en bloques y con progreso"""
+    monkeypatch.setattr(mail_merge, "MAIL_MERGE_CHUNK_SIZE", 2)
+    headers = auth_headers("merge@example.com", "mergeuser")
+    contactos = [
+        ("Ana", "ana@example.com", "Bogotá", "Cliente"),
+        ("Luis", "luis@example.com", None, "Cliente"),
+        ("Sin Email", None, "Cali", "Cliente"),
+        ("Marta", "marta@example.com", "Medellín", "Cliente"),
+        ("Proveedor", "prov@example.com", "Cali", "Proveedor"),
+    ]
+    for i, (nombre, email, lugar, tipo) in enumerate(contactos):
+        data = {"nombre": nombre, "telefono": f"+57300123456{i}", "tipo_contacto": tipo}
+        if email:
+            data["email"] = email
+        if lugar:
+            data["lugar"] = lugar
+        assert client.post("/api/contactos/", data=data, headers=headers).status_code == 201
+
+    response = client.post("/api/contactos/mail-merge", json={
+        "subject": "Novedades para {nombre}",
+        "template": "Hola {nombre}, te escribimos desde {lugar}.",
+        "tipo_contacto": "Cliente"
+    }, headers=headers)
+    assert response.status_code == 202
+
+    # TestClient ejecuta la tarea en segundo plano antes de devolver la respuesta
+    job = client.get(f"/api/contactos/mail-merge/{response.json()['id']}", headers=headers).json()
+    assert job["status"] == "done"
+    assert (job["processed"], job["queued"], job["skipped"]) == (4, 3, 1)
+    assert job["delivery"] == {"pending": 3}
+
+    mensajes = {
+        m.recipients[0].email: m for m in db.query(models_db.OutboxMessage).filter_by(merge_id=job["id"])
+    }
+    assert set(mensajes) == {"ana@example.com", "luis@example.com", "marta@example.com"}
+    assert mensajes["ana@example.com"].subject == "Novedades para Ana"
+    assert mensajes["ana@example.com"].body == "Hola Ana, te escribimos desde Bogotá."
+    assert mensajes["luis@example.com"].body == "Hola Luis, te escribimos desde ."
+
+def test_plantilla_invalida(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que se rechazan marcadores desconocidos y llaves mal cerradas"""
+    headers = auth_headers("merge2@example.com", "mergeuser2")
+    for template in (
+        "Hola {apodo}", "Hola {nombre", "Hola {nombre.upper}",
+        "Hola {nombre:d}", "Hola {nombre:>999999999}", "Hola {nombre!r}"
+    ):
+        response = client.post("/api/contactos/mail-merge", json={
+            "subject": "Hola", "template": template
+        }, headers=headers)
+        assert response.status_code == 400
+        assert response.json()["message"]["field"] == "template"
@@ -1,6 +1,7 @@
 from fastapi import status
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from app import counters, models_db
 from app.models import CategoriaEvaluacionEnum
 
 def test_crear_contacto(client: TestClient, db: Session):
@@ -179,4 +180,103 @@ def test_filtrar_contactos(client: TestClient, db: Session):
     assert response.status_code == 200
     data = response.json()
     assert len(data["data"]) >= 1
-    assert data["data"][0]["tipo_contacto"] == "Proveedor"
\ No newline at end of file
+    assert data["data"][0]["tipo_contacto"] == "Proveedor"
+
+def test_paginacion_por_cursor(client: TestClient, db: Session):
+    """Test para verificar la paginación por cursor ordenada por nombre"""
+    signup_data = {
+        "email": "test6@example.com",
+        "username": "testuser6",
+        "password": "testpass123"
+    }
+    client.post("/api/auth/signup", json=signup_data)
+    login_response = client.post("/api/auth/login", json={
+        "email": signup_data["email"],
+        "password": signup_data["password"]
+    })
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    nombres = ["Carla", "Ana", "Beto", "Ana", "Diego"]
+    for i, nombre in enumerate(nombres):
+        client.post(
+            "/api/contactos/",
+            data={"nombre": nombre, "telefono": f"+57300123456{i}"},
+            headers=headers
+        )
+
+    # Primera página sin total
+    response = client.get(
+        "/api/contactos/?pagination=cursor&sort=nombre&limit=2&include_total=false",
+        headers=headers
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert page["total"] is None
+    vistos = [c["nombre"] for c in page["data"]]
+
+    while page["next_cursor"]:
+        page = client.get(
+            f"/api/contactos/?sort=nombre&limit=2&cursor={page['next_cursor']}",
+            headers=headers
+        ).json()
+        vistos += [c["nombre"] for c in page["data"]]
+
+    assert vistos == sorted(nombres)
+
+    # Un cursor inválido se rechaza
+    response = client.get(
+        "/api/contactos/?sort=id&cursor=invalido",
+        headers=headers
+    )
+    assert response.status_code == 400
+
+def test_facetas_por_tipo(client: TestClient, db: Session):
+    """Test para verificar los contadores por tipo y detalle"""
+    signup_data = {
+        "email": "test7@example.com",
+        "username": "testuser7",
+        "password": "testpass123"
+    }
+    client.post("/api/auth/signup", json=signup_data)
+    login_response = client.post("/api/auth/login", json={
+        "email": signup_data["email"],
+        "password": signup_data["password"]
+    })
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    contactos = [
+        {"nombre": "Proveedor A", "telefono": "+573001234561", "tipo_contacto": "Proveedor", "detalle_tipo": "Software"},
+        {"nombre": "Proveedor B", "telefono": "+573001234562", "tipo_contacto": "Proveedor", "detalle_tipo": "Insumos"},
+        {"nombre": "Cliente A", "telefono": "+573001234563", "tipo_contacto": "Cliente"},
+    ]
+    ids = [
+        client.post("/api/contactos/", data=c, headers=headers).json()["id"]
+        for c in contactos
+    ]
+
+    # Cambiar el tipo de un contacto y eliminar otro
+    client.put(
+        f"/api/contactos/{ids[1]}",
+        data={"nombre": "Proveedor B", "telefono": "+573001234562", "tipo_contacto": "Cliente"},
+        headers=headers
+    )
+    client.delete(f"/api/contactos/{ids[2]}", headers=headers)
+
+    response = client.get("/api/contactos/facets", headers=headers)
+    assert response.status_code == 200
+    facets = response.json()
+    assert facets["total"] == 2
+    totales = {t["tipo_contacto"]: t["total"] for t in facets["tipos"]}
+    assert totales == {"Cliente": 1, "Proveedor": 1}
+
+    response = client.get("/api/contactos/?tipo_contacto=Cliente", headers=headers)
+    assert response.json()["total"] == 1
+
+    # Una base de datos anterior a los contadores se rellena al iniciar
+    db.query(models_db.ContactCount).delete()
+    db.commit()
+    assert counters.backfill_counts(db) == 2
+    assert counters.backfill_counts(db) == 0
+    assert client.get("/api/contactos/facets", headers=headers).json() == facets
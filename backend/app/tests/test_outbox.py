@@ -0,0 +1,160 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta
+from email import message_from_bytes, policy
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app import email_utils, models_db, outbox
+
+def _unreachable_pool() -> email_utils.SMTPConnectionPool:
+    # Puerto libre sin servidor: la conexión se rechaza de inmediato
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return email_utils.SMTPConnectionPool(email_utils.SMTPSettings(
+        host="127.0.0.1", port=port, starttls=False, timeout=2, pool_size=1
+    ))
+
+@pytest.fixture
+def outbox_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_DIR", tmp_path)
+    return tmp_path
+
+def test_envio_encolado_con_reintentos_y_dead_letter(client: TestClient, db: Session, outbox_dir, monkeypatch, auth_headers):
+    """Test para verificar la respuesta 202, los reintentos y la dead-letter"""
+    monkeypatch.setattr(outbox, "EMAIL_MAX_ATTEMPTS", 2)
+    headers = auth_headers("outbox@example.com", "outboxuser")
+    response = client.post(
+        "/api/contactos/send-email",
+        data={
+            "subject": "Reunión",
+            "message": "Adjunto la agenda",
+            "recipients": '["ana@example.com", "luis@example.com"]'
+        },
+        files={"attachments": ("agenda.txt", b"punto 1", "text/plain")},
+        headers=headers
+    )
+    assert response.status_code == 202
+    mensaje = response.json()
+    assert mensaje["status"] == "pending"
+    assert [r["status"] for r in mensaje["recipients"]] == ["pending", "pending"]
+    assert len(list(outbox_dir.iterdir())) == 1
+
+    pool = _unreachable_pool()
+    assert asyncio.run(outbox.deliver_due(pool)) == 1
+    estado = client.get(f"/api/contactos/send-email/{mensaje['id']}", headers=headers).json()
+    assert (estado["status"], estado["attempts"]) == ("pending", 1)
+    assert estado["last_error"]
+    # Aún no vence el siguiente intento
+    assert asyncio.run(outbox.deliver_due(pool)) == 0
+
+    db.query(models_db.OutboxMessage).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    asyncio.run(outbox.deliver_due(pool))
+    muertos = client.get("/api/contactos/send-email/dead-letter", headers=headers).json()
+    assert [m["id"] for m in muertos] == [mensaje["id"]]
+    assert muertos[0]["attempts"] == 2
+    # El adjunto se conserva para poder reintentar
+    assert len(list(outbox_dir.iterdir())) == 1
+
+    otro = auth_headers("otro@example.com", "otrouser")
+    assert client.get(f"/api/contactos/send-email/{mensaje['id']}", headers=otro).status_code == 404
+
+    response = client.post(f"/api/contactos/send-email/{mensaje['id']}/retry", headers=headers)
+    assert response.status_code == 202
+    assert (response.json()["status"], response.json()["attempts"]) == ("pending", 0)
+    assert client.post(f"/api/contactos/send-email/{mensaje['id']}/retry", headers=headers).status_code == 409
+
+def test_destinatarios_invalidos(client: TestClient, db: Session, outbox_dir, auth_headers):
+    """Test para verificar que recipients debe ser una lista JSON no vacía"""
+    headers = auth_headers("outbox2@example.com", "outboxuser2")
+    for recipients in ("ana@example.com", "[]", "[1]", '["ana@example.com\\nBcc: luis@example.com"]'):
+        response = client.post(
+            "/api/contactos/send-email",
+            data={"subject": "Hola", "message": "Hola", "recipients": recipients},
+            headers=headers
+        )
+        assert response.status_code == 400
+
+    # Un salto de línea en el asunto no llega a la bandeja de salida
+    response = client.post(
+        "/api/contactos/send-email",
+        data={"subject": "Hola\r\nBcc: luis@example.com", "message": "Hola", "recipients": '["ana@example.com"]'},
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json()["message"]["field"] == "subject"
+    assert db.query(models_db.OutboxMessage).count() == 0
+
+def test_purga_de_mensajes_dead(client: TestClient, db: Session, outbox_dir, auth_headers):
+    """Test para verificar que los mensajes dead antiguos se eliminan con sus adjuntos"""
+    auth_headers("purga@example.com", "purgauser")
+    user_id = db.query(models_db.User).filter_by(email="purga@example.com").one().id
+    mensajes = []
+    for dias in (40, 5):
+        path = outbox.new_attachment_path()
+        path.write_bytes(b"adjunto")
+        mensaje = outbox.enqueue(db, user_id, "Hola", "Hola", ["ana@example.com"], [
+            {"filename": "a.txt", "path": path.name, "size": 7}
+        ])
+        mensaje.status = "dead"
+        mensaje.next_attempt_at = datetime.utcnow() - timedelta(days=dias)
+        mensajes.append((mensaje.id, path))
+    db.commit()
+
+    assert outbox.purge_dead(db, retention_days=30) == 1
+    db.expire_all()
+    assert db.get(models_db.OutboxMessage, mensajes[0][0]) is None
+    assert not mensajes[0][1].exists()
+    assert db.get(models_db.OutboxMessage, mensajes[1][0]).status == "dead"
+    assert mensajes[1][1].exists()
+
+def test_espera_exponencial(monkeypatch):
+    """Test para verificar la espera exponencial con tope entre reintentos"""
+    monkeypatch.setattr(outbox, "EMAIL_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(outbox, "EMAIL_RETRY_MAX_SECONDS", 100)
+    assert 9 <= outbox.retry_delay(1) <= 11
+    assert 36 <= outbox.retry_delay(3) <= 44
+    assert 90 <= outbox.retry_delay(10) <= 110
+
+def test_adjuntos_con_limite_de_tamano(client: TestClient, db: Session, outbox_dir, monkeypatch, auth_headers):
+    """Test para verificar el 413 por adjunto y por mensaje sin dejar archivos"""
+    monkeypatch.setattr(outbox, "EMAIL_ATTACHMENT_MAX_BYTES", 1000)
+    monkeypatch.setattr(outbox, "EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES", 1500)
+    headers = auth_headers("limite@example.com", "limiteuser")
+    data = {"subject": "Adjuntos", "message": "Hola", "recipients": '["ana@example.com"]'}
+
+    grande = client.post(
+        "/api/contactos/send-email", data=data,
+        files={"attachments": ("grande.bin", b"x" * 1001, "application/octet-stream")},
+        headers=headers
+    )
+    total = client.post(
+        "/api/contactos/send-email", data=data,
+        files=[
+            ("attachments", ("uno.bin", b"x" * 800, "application/octet-stream")),
+            ("attachments", ("dos.bin", b"x" * 800, "application/octet-stream")),
+        ],
+        headers=headers
+    )
+    assert grande.status_code == 413
+    assert total.status_code == 413
+    assert total.json()["message"]["field"] == "attachments"
+    assert list(outbox_dir.iterdir()) == []
+
+def test_mensaje_generado_por_bloques(tmp_path):
+    """Test para verificar que el mensaje por bloques conserva adjuntos y escapa los puntos"""
+    contenido = bytes(range(256)) * 1000
+    archivo = tmp_path / "informe"
+    archivo.write_bytes(contenido)
+
+    raw = b"".join(email_utils.iter_message(
+        "yo@example.com", ["ana@example.com"], "Informe", ".línea con punto",
+        [(str(archivo), "informe año.pdf")]
+    ))
+    assert b"\r\n..l" in raw and raw.endswith(b"\r\n")
+    msg = message_from_bytes(raw.replace(b"\r\n..", b"\r\n."), policy=policy.default)
+    adjunto, = msg.iter_attachments()
+    assert adjunto.get_filename() == "informe año.pdf"
+    assert adjunto.get_content() == contenido
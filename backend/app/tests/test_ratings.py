@@ -0,0 +1,239 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from app import models_db, rating_stats
+from app.database import upgrade_schema
+
+def _calificar(client: TestClient, headers, contact_id: int, *ratings):
+    return client.post(
+        f"/api/contactos/{contact_id}/ratings",
+        json=[{"categoria": c, "calificacion": v, "comentario": "ok"} for c, v in ratings],
+        headers=headers
+    )
+
+def test_agregados_incrementales(client: TestClient, db: Session, auth_headers):
+    """Test para verificar conteo, suma, promedio y agregados por categoría"""
+    headers = auth_headers("ratings@example.com", "ratingsuser")
+    contact_id = client.post(
+        "/api/contactos/",
+        data={"nombre": "Proveedor Uno", "telefono": "+573001234567"},
+        headers=headers
+    ).json()["id"]
+
+    response = _calificar(client, headers, contact_id, ("CALIDAD", 4), ("PRECIO", 2))
+    assert response.status_code == 200
+    assert [r["calificacion"] for r in response.json()] == [4, 2]
+    _calificar(client, headers, contact_id, ("CALIDAD", 5))
+
+    contacto = client.get(f"/api/contactos/{contact_id}", headers=headers).json()
+    assert contacto["average_rating"] == (4 + 2 + 5) / 3
+    db.expire_all()
+    stats = {
+        s.categoria: (s.ratings_count, s.ratings_sum)
+        for s in db.query(models_db.ContactRatingStat).filter_by(contact_id=contact_id)
+    }
+    assert stats == {"CALIDAD": (2, 9), "PRECIO": (1, 2)}
+    assert _calificar(client, headers, contact_id).status_code == 400
+
+    # Columnas recién agregadas (en 0) con calificaciones previas: el
+    # recálculo al iniciar deja los mismos valores
+    db.query(models_db.Contact).update({"ratings_count": 0, "ratings_sum": 0})
+    db.commit()
+    assert rating_stats.backfill_stats(db) == 1
+    assert rating_stats.backfill_stats(db) == 0
+    contacto_db = db.get(models_db.Contact, contact_id)
+    assert (contacto_db.ratings_count, contacto_db.ratings_sum) == (3, 11)
+    assert contacto_db.average_rating == 11 / 3
+    _calificar(client, headers, contact_id, ("PRECIO", 5))
+    db.expire_all()
+    contacto = client.get(f"/api/contactos/{contact_id}", headers=headers).json()
+    assert contacto["average_rating"] == 16 / 4
+
+def test_upgrade_schema_agrega_columnas(tmp_path):
+    """Test para verificar que las columnas nuevas se agregan a tablas existentes"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE contacts (id INTEGER PRIMARY KEY, nombre VARCHAR, owner_id INTEGER)"))
+        connection.execute(text("INSERT INTO contacts (id, nombre, owner_id) VALUES (1, 'Ana', 1)"))
+    upgrade_schema(engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("contacts")}
+    assert {"ratings_count", "ratings_sum", "average_rating"} <= columns
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT ratings_count FROM contacts")).scalar() == 0
+    engine.dispose()
+
+def test_scorecards_por_categoria(client: TestClient, db: Session, auth_headers):
+    """Test para verificar los scorecards y los promedios por categoría del usuario"""
+    headers = auth_headers("scorecard@example.com", "scorecarduser")
+    otros = auth_headers("scorecard2@example.com", "scorecarduser2")
+    ids = [
+        client.post(
+            "/api/contactos/",
+            data={"nombre": f"Proveedor {i}", "telefono": f"+57300123456{i}", "tipo_contacto": "Proveedor"},
+            headers=headers
+        ).json()["id"]
+        for i in range(2)
+    ]
+    _calificar(client, headers, ids[0], ("Confiabilidad", 5), ("Precio / beneficio", 2))
+    _calificar(client, headers, ids[0], ("Confiabilidad", 3))
+    _calificar(client, headers, ids[1], ("Confiabilidad", 1), ("Fuera de catálogo", 4))
+
+    scorecard = client.get(f"/api/contactos/{ids[0]}/scorecard", headers=headers).json()
+    categorias = {c["categoria"]: c for c in scorecard["categorias"]}
+    assert len(categorias) == 6  # Todas las categorías de un proveedor
+    confiabilidad = categorias["Confiabilidad"]
+    assert (confiabilidad["ratings_count"], confiabilidad["average"]) == (2, 4)
+    assert (confiabilidad["min_rating"], confiabilidad["max_rating"]) == (3, 5)
+    assert confiabilidad["last_rated_at"] is not None
+    assert confiabilidad["owner_average"] == 3
+    assert categorias["Soporte postventa"]["ratings_count"] == 0
+
+    response = client.get(
+        "/api/contactos/scorecards",
+        params={"ids": ids + [ids[1] + 100]},
+        headers=headers
+    ).json()
+    assert [s["contact_id"] for s in response["scorecards"]] == ids
+    assert response["scorecards"][1]["categorias"][-1]["categoria"] == "Fuera de catálogo"
+    assert {c["categoria"]: c["ratings_count"] for c in response["categorias"]} == {
+        "Confiabilidad": 3, "Fuera de catálogo": 1, "Precio / beneficio": 1
+    }
+
+    assert client.get(f"/api/contactos/{ids[0]}/scorecard", headers=otros).status_code == 404
+    assert client.get("/api/contactos/scorecards", params={"ids": ids}, headers=otros).json() == {
+        "categorias": [], "scorecards": []
+    }
+
+def test_historial_paginado(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la paginación por cursor y los filtros del historial"""
+    headers = auth_headers("history@example.com", "historyuser")
+    contact_id = client.post(
+        "/api/contactos/",
+        data={"nombre": "Proveedor Historial", "telefono": "+573001234567"},
+        headers=headers
+    ).json()["id"]
+    for i in range(3):
+        _calificar(client, headers, contact_id, ("Confiabilidad", 1 + i), ("Precio / beneficio", 5))
+
+    vistos, cursor = [], None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/api/contactos/{contact_id}/ratings", params=params, headers=headers).json()
+        vistos += page["data"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(vistos) == 6
+    assert len({r["id"] for r in vistos}) == 6
+    claves = [(r["fecha"], r["id"]) for r in vistos]
+    assert claves == sorted(claves, reverse=True)
+
+    filtrado = client.get(
+        f"/api/contactos/{contact_id}/ratings",
+        params={"categoria": "Confiabilidad", "desde": "2000-01-01T00:00:00"},
+        headers=headers
+    ).json()
+    assert [r["calificacion"] for r in filtrado["data"]] == [3, 2, 1]
+
+    completo = client.get(f"/api/contactos/{contact_id}/ratings?all=true", headers=headers).json()
+    assert isinstance(completo, list) and len(completo) == 6
+    assert client.get(
+        f"/api/contactos/{contact_id}/ratings?cursor=roto", headers=headers
+    ).status_code == 400
+    assert client.get(
+        f"/api/contactos/{contact_id}/ratings?hasta=2000-01-01T00:00:00", headers=headers
+    ).json()["data"] == []
+
+def test_ranking_y_orden_descendente(client: TestClient, db: Session, auth_headers):
+    """Test para verificar el ranking con mínimo de calificaciones y sort=-average_rating"""
+    headers = auth_headers("ranking@example.com", "rankinguser")
+    notas = {"Uno": [5], "Dos": [4, 4], "Tres": [2, 3], "Cuatro": [5, 5, 4], "Cinco": []}
+    for i, (nombre, valores) in enumerate(notas.items()):
+        contact_id = client.post(
+            "/api/contactos/",
+            data={"nombre": f"Proveedor {nombre}", "telefono": f"+57300123456{i}",
+                  "tipo_contacto": "Proveedor" if nombre != "Dos" else "Cliente"},
+            headers=headers
+        ).json()["id"]
+        if valores:
+            _calificar(client, headers, contact_id, *[("Confiabilidad", v) for v in valores])
+
+    mejores = client.get("/api/contactos/leaderboard", headers=headers).json()
+    assert [c["nombre"] for c in mejores] == [
+        "Proveedor Uno", "Proveedor Cuatro", "Proveedor Dos", "Proveedor Tres"
+    ]
+    assert [c["rank"] for c in mejores] == [1, 2, 3, 4]
+
+    filtrado = client.get(
+        "/api/contactos/leaderboard",
+        params={"tipo_contacto": "Proveedor", "min_ratings": 2, "order": "worst", "limit": 1},
+        headers=headers
+    ).json()
+    assert [(c["nombre"], c["ratings_count"]) for c in filtrado] == [("Proveedor Tres", 2)]
+
+    nombres, cursor = [], None
+    while True:
+        params = {"sort": "-average_rating", "limit": 2, "pagination": "cursor", **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/contactos/", params=params, headers=headers).json()
+        nombres += [c["nombre"] for c in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert nombres == [
+        "Proveedor Uno", "Proveedor Cuatro", "Proveedor Dos", "Proveedor Tres", "Proveedor Cinco"
+    ]
+    offset = client.get("/api/contactos/?sort=-average_rating&limit=2", headers=headers).json()
+    assert [c["nombre"] for c in offset["data"]] == nombres[:2]
+
+def test_tendencias_por_periodo(client: TestClient, db: Session, auth_headers):
+    """Test para verificar las series por periodo y su reconstrucción histórica"""
+    from datetime import datetime, timedelta
+    from app import rollups
+    headers = auth_headers("trends@example.com", "trendsuser")
+    contact_id = client.post(
+        "/api/contactos/",
+        data={"nombre": "Proveedor Tendencia", "telefono": "+573001234567"},
+        headers=headers
+    ).json()["id"]
+    _calificar(client, headers, contact_id, ("Confiabilidad", 4), ("Precio / beneficio", 2))
+
+    hoy = client.get("/api/contactos/trends?granularity=day", headers=headers).json()
+    assert [(p["ratings_count"], p["average"]) for p in hoy["points"]] == [(2, 3)]
+
+    # Segunda calificación del mismo día: suma sobre la fila existente del periodo
+    _calificar(client, headers, contact_id, ("Confiabilidad", 5), ("Precio / beneficio", 1))
+    hoy = client.get("/api/contactos/trends?granularity=day", headers=headers).json()
+    assert [(p["ratings_count"], p["average"]) for p in hoy["points"]] == [(4, 3)]
+
+    # Calificaciones históricas cargadas sin pasar por la API
+    ahora = datetime.utcnow()
+    for semanas, valor in ((9, 1), (5, 3), (5, 5)):
+        db.add(models_db.Rating(contact_id=contact_id, categoria="Confiabilidad",
+                                calificacion=valor, comentario="", fecha=ahora - timedelta(weeks=semanas)))
+    db.commit()
+    assert rollups.rebuild_rollups(db) > 0
+
+    semanal = client.get(
+        "/api/contactos/trends",
+        params={"granularity": "week", "contact_id": contact_id, "categoria": "Confiabilidad", "window": 2},
+        headers=headers
+    ).json()
+    assert [(p["ratings_count"], p["average"]) for p in semanal["points"]] == [(1, 1), (2, 4), (2, 4.5)]
+    assert [p["rolling_average"] for p in semanal["points"]] == [1, 3, 4.25]
+    assert all(datetime.fromisoformat(p["bucket_start"]).weekday() == 0 for p in semanal["points"])
+
+    # Base de datos anterior a las tendencias: se llenan al iniciar
+    db.query(models_db.RatingRollup).delete()
+    db.commit()
+    assert rollups.backfill_rollups(db) > 0
+    assert rollups.backfill_rollups(db) == 0
+    assert client.get(
+        "/api/contactos/trends",
+        params={"granularity": "week", "contact_id": contact_id, "categoria": "Confiabilidad", "window": 2},
+        headers=headers
+    ).json() == semanal
+
+    mensual = client.get("/api/contactos/trends?granularity=month", headers=headers).json()
+    assert sum(p["ratings_count"] for p in mensual["points"]) == 7
+    otros = auth_headers("trends2@example.com", "trendsuser2")
+    assert client.get("/api/contactos/trends", headers=otros).json()["points"] == []
@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app import search
+
+def test_busqueda_por_prefijo_sin_tildes(client: TestClient, db: Session, auth_headers):
+    """Test para verificar la búsqueda de texto completo con prefijos y sin tildes"""
+    headers = auth_headers("search@example.com", "searchuser")
+
+    for nombre, telefono in [("María Pérez", "+573001112233"), ("José Gómez", "+573009998877")]:
+        response = client.post(
+            "/api/contactos/",
+            data={"nombre": nombre, "telefono": telefono},
+            headers=headers
+        )
+        assert response.status_code == 201
+
+    response = client.get("/api/contactos/?q=mari per", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["data"][0]["nombre"] == "María Pérez"
+
+    response = client.get("/api/contactos/?q=573009", headers=headers)
+    assert [c["nombre"] for c in response.json()["data"]] == ["José Gómez"]
+
+    # Un teléfono sin prefijo de país se busca como subcadena
+    response = client.get("/api/contactos/?q=300 111-2233", headers=headers)
+    assert [c["nombre"] for c in response.json()["data"]] == ["María Pérez"]
+
+    # Solo signos de puntuación: ningún resultado
+    response = client.get("/api/contactos/?q=%2A%21", headers=headers)
+    assert (response.json()["total"], response.json()["data"]) == (0, [])
+
+def test_indice_se_llena_si_esta_vacio(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que el índice vacío de una base de datos existente se llena al iniciar"""
+    headers = auth_headers("search3@example.com", "searchuser3")
+    client.post("/api/contactos/", data={"nombre": "Luisa Rey", "telefono": "+573001234567"}, headers=headers)
+    db.execute(text(f"DELETE FROM {search.FTS_TABLE}"))
+    db.commit()
+    assert client.get("/api/contactos/?q=luisa", headers=headers).json()["total"] == 0
+
+    assert search.backfill_index(db) == 1
+    assert search.backfill_index(db) == 0
+    assert client.get("/api/contactos/?q=luisa", headers=headers).json()["total"] == 1
+
+def test_busqueda_refleja_actualizacion_y_borrado(client: TestClient, db: Session, auth_headers):
+    """Test para verificar que el índice se mantiene al actualizar y eliminar"""
+    headers = auth_headers("search2@example.com", "searchuser2")
+
+    created = client.post(
+        "/api/contactos/",
+        data={"nombre": "Lucía Núñez", "telefono": "+573001234567"},
+        headers=headers
+    ).json()
+
+    client.put(
+        f"/api/contactos/{created['id']}",
+        data={"nombre": "Ramón Núñez", "telefono": "+573001234567"},
+        headers=headers
+    )
+    assert client.get("/api/contactos/?q=lucia", headers=headers).json()["total"] == 0
+    assert client.get("/api/contactos/?q=ramon", headers=headers).json()["total"] == 1
+
+    client.delete(f"/api/contactos/{created['id']}", headers=headers)
+    assert client.get("/api/contactos/?q=nunez", headers=headers).json()["total"] == 0
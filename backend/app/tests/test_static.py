@@ -0,0 +1,60 @@
+import hashlib
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import static, storage
+
+@pytest.fixture
+def uploads(tmp_path):
+    contenido = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+    digest = hashlib.sha256(contenido).hexdigest()
+    foto = tmp_path / storage.relative_path(digest, ".png")
+    foto.parent.mkdir(parents=True)
+    foto.write_bytes(contenido)
+    (tmp_path / "thumbs").mkdir()
+    (tmp_path / "thumbs" / f"{digest}_sm.png").write_bytes(b"png pequeno")
+    (tmp_path / "thumbs" / f"{digest}_sm.webp").write_bytes(b"webp")
+    (tmp_path / "1_Antiguo_0.png").write_bytes(b"ruta antigua")
+
+    app = FastAPI()
+    app.mount("/uploads", static.ImageFiles(directory=tmp_path), name="uploads")
+    return TestClient(app), digest, contenido
+
+def test_imagen_por_contenido_inmutable(uploads):
+    """Test para verificar Cache-Control immutable, ETag fuerte, 304 y Range"""
+    client, digest, contenido = uploads
+    url = "/uploads/" + storage.relative_path(digest, ".png")
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == static.IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{digest}"'
+
+    response = client.get(url, headers={"If-None-Match": f'"{digest}"'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == f'"{digest}"'
+
+    response = client.get(url, headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206
+    assert response.content == contenido[:8]
+    assert response.headers["content-range"] == f"bytes 0-7/{len(contenido)}"
+
+def test_miniatura_negocia_webp(uploads):
+    """Test para verificar que las miniaturas se entregan en WebP si el navegador lo acepta"""
+    client, digest, _ = uploads
+    url = f"/uploads/thumbs/{digest}_sm.png"
+
+    response = client.get(url, headers={"Accept": "image/webp,image/*"})
+    assert response.content == b"webp"
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    assert response.headers["cache-control"] == static.THUMBNAIL_CACHE_CONTROL
+
+    response = client.get(url, headers={"Accept": "image/png"})
+    assert response.content == b"png pequeno"
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"Accept": "image/png", "If-None-Match": etag}).status_code == 304
+
+    response = client.get("/uploads/1_Antiguo_0.png")
+    assert response.headers["cache-control"] == static.LEGACY_CACHE_CONTROL
@@ -0,0 +1,76 @@
+import io
+import os
+import time
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app import images, models_db, storage, upload_gc
+
+def _age(path, hours=48):
+    old = time.time() - hours * 3600
+    os.utime(path, (old, old))
+
+def test_recolector_de_uploads(client: TestClient, db: Session, upload_dir, auth_headers, png):
+    """Test para verificar que solo se eliminan archivos huérfanos fuera del periodo de gracia"""
+    headers = auth_headers("gc@example.com", "gcuser")
+    contacto = client.post(
+        "/api/contactos/",
+        data={"nombre": "Con Foto", "telefono": "+573001234567"},
+        files={"imagen": ("foto.png", png(color=(10, 200, 10)), "image/png")},
+        headers=headers
+    ).json()
+    usada = storage.local_path(contacto["imagen"])
+
+    # Foto huérfana con sus miniaturas, una ruta antigua sin contacto y un temporal abandonado
+    with io.BytesIO(png(color=(200, 10, 10))) as fileobj:
+        huerfana = storage.local_path(storage.save_file(fileobj, ".png"))
+    images.generate_variants(storage.image_url(huerfana.relative_to(upload_dir).as_posix()))
+    antigua = upload_dir / "1_Sin Contacto_0.jpg"
+    antigua.write_bytes(b"foto antigua")
+    temporal = upload_dir / "temp" / "adjunto.pdf"
+    temporal.write_bytes(b"adjunto")
+    reciente = upload_dir / "2_Subida En Curso_0.png"
+    reciente.write_bytes(b"recien subida")
+    for path in list(upload_dir.rglob("*")):
+        if path.is_file() and path != reciente:
+            _age(path)
+    tamanos = huerfana.stat().st_size + antigua.stat().st_size + temporal.stat().st_size + sum(
+        thumb.stat().st_size for thumb in (upload_dir / "thumbs").glob(f"{huerfana.stem}_*")
+    )
+
+    simulado = upload_gc.collect_garbage(db, grace_hours=24, dry_run=True)
+    assert (simulado["huerfanos"], simulado["temporales"]) == (2, 1)
+    assert simulado["miniaturas"] == 2 * len(images.THUMBNAIL_SIZES)
+    assert simulado["bytes"] == tamanos
+    assert huerfana.exists() and antigua.exists() and temporal.exists()
+
+    resultado = upload_gc.collect_garbage(db, grace_hours=24)
+    assert {k: v for k, v in resultado.items() if k != "dry_run"} == {
+        k: v for k, v in simulado.items() if k != "dry_run"
+    }
+    assert not huerfana.exists() and not antigua.exists() and not temporal.exists()
+    assert usada.exists() and reciente.exists()
+    assert len(list((upload_dir / "thumbs").iterdir())) == 2 * len(images.THUMBNAIL_SIZES)
+    assert db.get(models_db.StoredImage, usada.stem).refcount == 1
+
+def test_recolector_respeta_referencia_nueva(client: TestClient, db: Session, upload_dir, auth_headers, png):
+    """Test para verificar que una foto antigua que gana una referencia durante la pasada no se borra"""
+    headers = auth_headers("gc2@example.com", "gcuser2")
+    with io.BytesIO(png(color=(20, 20, 200))) as fileobj:
+        foto = storage.local_path(storage.save_file(fileobj, ".png"))
+    _age(foto)
+    entry = next(e for e in os.scandir(foto.parent) if e.name == foto.name)
+
+    # Después de la consulta por bloques, una subida se deduplica sobre el archivo
+    contacto = client.post(
+        "/api/contactos/",
+        data={"nombre": "Deduplicado", "telefono": "+573001234567"},
+        files={"imagen": ("foto.png", foto.read_bytes(), "image/png")},
+        headers=headers
+    ).json()
+    assert storage.local_path(contacto["imagen"]) == foto
+
+    collector = upload_gc._Collector(db, grace_hours=24, dry_run=False, batch_size=10)
+    assert not collector._remove_orphan(contacto["imagen"], entry)
+    assert foto.exists()
+    db.expire_all()
+    assert db.get(models_db.StoredImage, foto.stem).refcount == 1
@@ -0,0 +1,189 @@
+"""
+Recolector de archivos huérfanos en uploads/.
+
+Recorre la carpeta con os.scandir (sin cargar el listado completo) y elimina,
+si son más antiguos que el periodo de gracia:
+- fotos que ningún contacto referencia (se consultan en bloques contra
+  contacts.imagen, que es la fuente de verdad),
+- miniaturas cuya foto original ya no existe,
+- archivos temporales abandonados (subidas interrumpidas, adjuntos de correo).
+
+El periodo de gracia protege las subidas en curso: un archivo recién escrito
+puede no tener todavía su contacto guardado.
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import images, models_db, storage
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_GC_GRACE_HOURS = float(os.getenv("UPLOAD_GC_GRACE_HOURS", "24"))
+UPLOAD_GC_BATCH_SIZE = int(os.getenv("UPLOAD_GC_BATCH_SIZE", "500"))
+# 0 desactiva la tarea periódica (ver main.py)
+UPLOAD_GC_INTERVAL_HOURS = float(os.getenv("UPLOAD_GC_INTERVAL_HOURS", "0"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+
+def _walk(directory: Path, skip=()) -> Iterator[os.DirEntry]:
+    """Archivos bajo `directory` (sin los ocultos ni las carpetas de `skip`)."""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in skip:
+                    yield from _walk(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+def _batches(entries: Iterator[os.DirEntry], size: int) -> Iterator[List[os.DirEntry]]:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _original_exists(stem: str, directory: Path) -> bool:
+    return any((directory / f"{stem}{ext}").exists() for ext in IMAGE_EXTENSIONS)
+
+class _Collector:
+    def __init__(self, db: Session, grace_hours: float, dry_run: bool, batch_size: int):
+        self.db = db
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.cutoff = time.time() - grace_hours * 3600
+        # Fotos borradas (o que se borrarían en dry-run): sus miniaturas también sobran
+        self.removed_stems = set()
+        self.report = {
+            "revisados": 0, "huerfanos": 0, "miniaturas": 0,
+            "temporales": 0, "bytes": 0, "dry_run": dry_run,
+        }
+
+    def _remove(self, entry: os.DirEntry, kind: str) -> None:
+        size = entry.stat().st_size
+        if not self.dry_run:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                return
+        self.report[kind] += 1
+        self.report["bytes"] += size
+
+    def _is_old(self, entry: os.DirEntry) -> bool:
+        return entry.stat().st_mtime < self.cutoff
+
+    def originals(self) -> None:
+        skip = {storage.TEMP_DIR.name, images.THUMBNAIL_DIR.name}
+        for batch in _batches(_walk(storage.UPLOAD_DIR, skip), self.batch_size):
+            self.report["revisados"] += len(batch)
+            candidates = {
+                storage.image_url(Path(entry.path).relative_to(storage.UPLOAD_DIR).as_posix()): entry
+                for entry in batch if self._is_old(entry)
+            }
+            if not candidates:
+                continue
+            referenced = set(self.db.scalars(
+                select(models_db.Contact.imagen).where(models_db.Contact.imagen.in_(list(candidates)))
+            ))
+            for url, entry in candidates.items():
+                if url in referenced:
+                    continue
+                if self.dry_run:
+                    self._remove(entry, "huerfanos")
+                elif not self._remove_orphan(url, entry):
+                    continue
+                self.removed_stems.add(Path(entry.name).stem)
+
+    def _remove_orphan(self, url: str, entry: os.DirEntry) -> bool:
+        """
+        Borra una foto huérfana y su fila de stored_images en una transacción.
+        El DELETE toma el bloqueo de escritura antes de volver a comprobar la
+        referencia, así una subida deduplicada sobre este archivo durante la
+        pasada (que suma su referencia en stored_images) espera al commit y
+        después repone el archivo (StagedUpload.commit), o ya se ve aquí y la
+        foto se conserva. El mtime no protege a un archivo antiguo.
+        """
+        digest = storage.content_hash(url)
+        try:
+            if digest:
+                self.db.execute(delete(models_db.StoredImage).where(models_db.StoredImage.sha256 == digest))
+            if storage.is_referenced(self.db, url):
+                self.db.rollback()
+                return False
+            self._remove(entry, "huerfanos")
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return True
+
+    def thumbnails(self) -> None:
+        for entry in _walk(images.THUMBNAIL_DIR):
+            self.report["revisados"] += 1
+            if not self._is_old(entry):
+                continue
+            stem = Path(entry.name).stem.rpartition("_")[0]
+            digest = storage.content_hash(stem)
+            directory = storage.UPLOAD_DIR / digest[:2] / digest[2:4] if digest else storage.UPLOAD_DIR
+            if stem in self.removed_stems or not _original_exists(stem, directory):
+                self._remove(entry, "miniaturas")
+
+    def temporary(self) -> None:
+        for entry in _walk(storage.TEMP_DIR):
+            self.report["revisados"] += 1
+            if self._is_old(entry):
+                self._remove(entry, "temporales")
+
+def collect_garbage(
+    db: Session,
+    grace_hours: Optional[float] = None,
+    dry_run: bool = False,
+    batch_size: Optional[int] = None
+) -> dict:
+    """
+    Elimina los archivos huérfanos de uploads/ más antiguos que `grace_hours`.
+    Con dry_run solo informa. Devuelve el número de archivos revisados y
+    eliminados por tipo y los bytes recuperados.
+    """
+    collector = _Collector(
+        db,
+        UPLOAD_GC_GRACE_HOURS if grace_hours is None else grace_hours,
+        dry_run,
+        batch_size or UPLOAD_GC_BATCH_SIZE
+    )
+    collector.originals()
+    collector.thumbnails()
+    collector.temporary()
+    return collector.report
+
+def run_collection() -> dict:
+    db = SessionLocal()
+    try:
+        return collect_garbage(db)
+    finally:
+        db.close()
+
+async def run_periodically(interval_hours: float) -> None:
+    """Tarea en segundo plano de la aplicación: recolecta cada `interval_hours`."""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            report = await run_in_threadpool(run_collection)
+            logger.info("Limpieza de uploads: %s", report)
+        except Exception as e:
+            logger.warning("La limpieza de uploads falló: %s", e)
@@ -0,0 +1,103 @@
+"""
+Prueba de carga: escrituras concurrentes de contactos y latencia de /api/ping.
+
+Levanta uvicorn con una base de datos temporal, crea un usuario y lanza
+--requests creaciones de contacto con --concurrency clientes a la vez mientras
+mide la latencia de /api/ping. Si las rutas async bloquean el event loop, la
+latencia de ping crece con la carga de escritura.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_async_load.py --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+async def wait_until_up(client):
+    for _ in range(100):
+        try:
+            await client.get("/api/ping")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("El servidor no respondió")
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await wait_until_up(client)
+        credentials = {"email": "load@example.com", "username": "load", "password": "loadpass123"}
+        await client.post("/api/auth/signup", json=credentials)
+        login = await client.post("/api/auth/login", json={
+            "email": credentials["email"], "password": credentials["password"]
+        })
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(i)
+
+        async def writer():
+            while not queue.empty():
+                i = queue.get_nowait()
+                await client.post(
+                    "/api/contactos",
+                    data={"nombre": f"Contacto {i}", "telefono": f"+57300{i:07d}"},
+                    headers=headers
+                )
+
+        ping_latencies = []
+        done = asyncio.Event()
+
+        async def pinger():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/ping")
+                ping_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        ping_task = asyncio.create_task(pinger())
+        start = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ping_task
+
+    ping_latencies.sort()
+    print(f"{args.requests} escrituras con concurrencia {args.concurrency}: "
+          f"{elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"/api/ping durante la carga: p50={statistics.median(ping_latencies):.1f}ms "
+          f"p99={ping_latencies[int(len(ping_latencies) * 0.99) - 1]:.1f}ms "
+          f"({len(ping_latencies)} muestras)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_load.db'}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de adjuntos: memoria máxima (tracemalloc) y tiempo para generar el
+DATA de un correo con adjuntos de varios MB, construyendo el mensaje entero
+en memoria (MIMEApplication + as_bytes, lo que hacía smtplib.send_message)
+frente a email_utils.iter_message, que codifica los archivos por bloques.
+
+El DATA se escribe en os.devnull para medir sólo el lado del cliente.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_attachments.py --sizes-mb 1 10 50 --attachments 2
+"""
+import argparse
+import os
+import smtplib
+import sys
+import tempfile
+import time
+import tracemalloc
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_attachments.db'}")
+
+from app import email_utils
+
+SENDER, RECIPIENTS = "bench@example.com", ["destino@example.com"]
+
+def in_memory(paths):
+    msg = MIMEMultipart()
+    msg['From'] = SENDER
+    msg['To'] = ', '.join(RECIPIENTS)
+    msg['Subject'] = "Benchmark"
+    msg.attach(MIMEText("Adjuntos", 'plain'))
+    for path in paths:
+        with open(path, 'rb') as f:
+            part = MIMEApplication(f.read(), Name=os.path.basename(path))
+        part['Content-Disposition'] = f'attachment; filename="{os.path.basename(path)}"'
+        msg.attach(part)
+    # Lo mismo que hace smtplib antes de enviar el DATA
+    yield smtplib._quote_periods(msg.as_bytes(policy=msg.policy.clone(linesep="\r\n")))
+
+def streaming(paths):
+    return email_utils.iter_message(SENDER, RECIPIENTS, "Benchmark", "Adjuntos", [str(p) for p in paths])
+
+def measure(generate, paths):
+    tracemalloc.start()
+    start = time.perf_counter()
+    sent = 0
+    with open(os.devnull, "wb") as sink:
+        for chunk in generate(paths):
+            sink.write(chunk)
+            sent += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sent, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--attachments", type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp())
+    print(f"{'modo':>12}{'adjuntos':>10}{'MB c/u':>8}{'DATA MB':>9}{'s':>8}{'pico MB':>10}")
+    for size_mb in args.sizes_mb:
+        paths = []
+        for i in range(args.attachments):
+            path = workdir / f"adjunto{i}.bin"
+            with open(path, "wb") as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            paths.append(path)
+        for name, generate in [("en memoria", in_memory), ("por bloques", streaming)]:
+            sent, elapsed, peak = measure(generate, paths)
+            print(f"{name:>12}{args.attachments:>10}{size_mb:>8}{sent / 2**20:>9.1f}"
+                  f"{elapsed:>8.2f}{peak / 2**20:>10.1f}")
+        for path in paths:
+            path.unlink()
+    workdir.rmdir()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark del lote de contactos: N peticiones POST/PUT/DELETE individuales frente
+a POST /api/contactos/batch con las mismas operaciones.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_batch.py --ops 600 --batch-size 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_batch.db'}")
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+def login(client, n):
+    user = {"email": f"bench{n}@example.com", "username": f"bench{n}", "password": "benchpass123"}
+    client.post("/api/auth/signup", json=user)
+    token = client.post("/api/auth/login", json=user).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def contacto(i):
+    return {"nombre": f"Contacto {i}", "telefono": f"+57300{i:07d}", "lugar": "Bogotá"}
+
+def one_by_one(client, headers, ops):
+    ids = []
+    for i in range(ops):
+        ids.append(client.post("/api/contactos/", data=contacto(i), headers=headers).json()["id"])
+    for i, contacto_id in enumerate(ids):
+        client.put(f"/api/contactos/{contacto_id}", data={**contacto(i), "lugar": "Medellín"}, headers=headers)
+    for contacto_id in ids:
+        client.delete(f"/api/contactos/{contacto_id}", headers=headers)
+
+def batched(client, headers, ops, batch_size):
+    ids = []
+    for start in range(0, ops, batch_size):
+        body = {"operations": [{"op": "create", "data": contacto(i)} for i in range(start, min(start + batch_size, ops))]}
+        ids += [r["id"] for r in client.post("/api/contactos/batch", json=body, headers=headers).json()["results"]]
+    for kind, data in (("patch", {"lugar": "Medellín"}), ("delete", None)):
+        for start in range(0, ops, batch_size):
+            body = {"operations": [{"op": kind, "id": i, "data": data} for i in ids[start:start + batch_size]]}
+            client.post("/api/contactos/batch", json=body, headers=headers)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=600, help="Contactos a crear, modificar y eliminar")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        for name, run in (
+            ("individual", lambda h: one_by_one(client, h, args.ops)),
+            ("lote", lambda h: batched(client, h, args.ops, args.batch_size)),
+        ):
+            headers = login(client, name)
+            start = time.perf_counter()
+            run(headers)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>10}: {3 * args.ops / elapsed:>8.0f} operaciones/s ({elapsed:.2f} s)")
+
+if __name__ == "__main__":
+    main()
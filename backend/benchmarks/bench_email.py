@@ -0,0 +1,81 @@
+"""
+Benchmark de envío de correo: mensajes por segundo con el pool SMTP frente a
+una conexión nueva por mensaje, contra un servidor aiosmtpd local.
+
+--data-delay-ms simula la latencia del servidor al aceptar cada mensaje.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_email.py --messages 500 --concurrency 20 --pool-size 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_email.db'}")
+
+from aiosmtpd.controller import Controller
+from app import email_utils
+
+class Handler:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def send_all(sender, messages: int, concurrency: int):
+    queue = asyncio.Queue()
+    for i in range(messages):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            await sender.send_email([f"destino{i}@example.com"], f"Mensaje {i}", "Hola " * 200)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--data-delay-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    handler = Handler(args.data_delay_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        print(f"{'modo':>22}{'mensajes':>10}{'conexiones':>12}{'s':>8}{'msg/s':>9}")
+        for name, per_connection in [("conexión por mensaje", 1), ("pool", 0)]:
+            pool = email_utils.SMTPConnectionPool(email_utils.SMTPSettings(
+                host="127.0.0.1", port=controller.port, starttls=False,
+                pool_size=args.pool_size, max_messages_per_connection=per_connection
+            ))
+            start = time.perf_counter()
+            asyncio.run(send_all(email_utils.EmailSender(pool), args.messages, args.concurrency))
+            elapsed = time.perf_counter() - start
+            pool.close()
+            print(f"{name:>22}{args.messages:>10}{pool.connections_opened:>12}"
+                  f"{elapsed:>8.2f}{args.messages / elapsed:>9.1f}")
+    finally:
+        controller.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark de exportación: tiempo y memoria pico (tracemalloc) según el tamaño de la agenda.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_export.py --sizes 10000 100000 300000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_export.db'}")
+
+from sqlalchemy import insert
+from app.database import SessionLocal, engine
+from app.models_db import Base, Contact, User
+from app import export
+
+def seed(owner_id, total):
+    db = SessionLocal()
+    db.execute(insert(User), [{"id": owner_id, "email": f"u{owner_id}@example.com",
+                               "username": f"u{owner_id}", "hashed_password": "x"}])
+    for start in range(0, total, 10000):
+        db.execute(insert(Contact), [{
+            "nombre": f"Contacto {i}", "telefono": f"+57300{i:07d}", "email": f"c{i}@example.com",
+            "direccion": "Calle 1 # 2-3", "lugar": "Bogotá", "tipo_contacto": "Cliente",
+            "owner_id": owner_id,
+        } for i in range(start, min(start + 10000, total))])
+    db.commit()
+    db.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"{'contactos':>10}{'formato':>8}{'gzip':>6}{'MB':>8}{'s':>7}{'pico MB':>9}")
+    for owner_id, size in enumerate(args.sizes, start=1):
+        seed(owner_id, size)
+        for fmt, gz in [("csv", False), ("ndjson", False), ("vcf", True)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            total_bytes = sum(len(chunk) for chunk in export.stream_export(export.iter_rows(SessionLocal, owner_id), fmt, gz))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{size:>10}{fmt:>8}{str(gz):>6}{total_bytes / 1e6:>8.1f}{elapsed:>7.2f}{peak / 1e6:>9.2f}")
+
+if __name__ == "__main__":
+    main()
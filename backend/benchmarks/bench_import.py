@@ -0,0 +1,62 @@
+"""
+Benchmark de importación: inserción fila a fila (crud.create_contact) frente a
+la importación por bloques (importer.import_contacts).
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_import.py --rows 50000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_import.db'}")
+
+from sqlalchemy import insert
+from app.database import SessionLocal, engine
+from app.models_db import Base, User
+from app import crud, importer, jobs, schemas
+
+def make_csv(rows):
+    lines = ["nombre;telefono;email;lugar;tipo_contacto"]
+    lines += [f"Contacto {i};+57300{i:07d};c{i}@example.com;Bogotá;Cliente" for i in range(rows)]
+    return "\n".join(lines).encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--row-by-row", type=int, default=2000,
+                        help="Filas para la medición fila a fila (se extrapola)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(insert(User), [
+        {"id": owner_id, "email": f"u{owner_id}@example.com", "username": f"u{owner_id}", "hashed_password": "x"}
+        for owner_id in (1, 2)
+    ])
+    db.commit()
+
+    start = time.perf_counter()
+    for i in range(args.row_by_row):
+        crud.create_contact(db, schemas.ContactCreate(
+            nombre=f"Contacto {i}", telefono=f"+57300{i:07d}", email=f"c{i}@example.com",
+            lugar="Bogotá", tipo_contacto="Cliente"
+        ), 1)
+    per_row = (time.perf_counter() - start) / args.row_by_row
+    print(f"fila a fila: {1 / per_row:>10.0f} filas/s (estimado {per_row * args.rows:.1f} s para {args.rows})")
+
+    job = jobs.create_job(2, "import")
+    start = time.perf_counter()
+    importer.import_contacts(db, job, io.BytesIO(make_csv(args.rows)), "csv")
+    elapsed = time.perf_counter() - start
+    print(f"por bloques: {job.succeeded / elapsed:>10.0f} filas/s ({elapsed:.1f} s para {job.succeeded}, "
+          f"bloque {importer.IMPORT_CHUNK_SIZE})")
+    db.close()
+
+if __name__ == "__main__":
+    main()
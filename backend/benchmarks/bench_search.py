@@ -0,0 +1,89 @@
+"""
+Benchmark de búsqueda de contactos: ilike('%q%') frente al índice FTS5.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_search.py --contacts 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_search.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import insert, text
+from app.database import SessionLocal, engine
+from app.models_db import Base, Contact, User
+from app import crud, search
+
+NOMBRES = ["María", "José", "Andrés", "Camilo", "Lucía", "Sofía", "Julián", "Ana", "Pedro", "Ramón"]
+APELLIDOS = ["Pérez", "Gómez", "Molano", "Rodríguez", "Núñez", "Sánchez", "Martínez", "López"]
+QUERIES = ["maria perez", "mol", "3001", "gomez", "ana lo", "zzz"]
+
+def seed(db, total):
+    db.execute(insert(User), [{"email": "bench@example.com", "username": "bench", "hashed_password": "x"}])
+    user_id = db.execute(text("SELECT id FROM users")).scalar()
+    batch = []
+    for i in range(total):
+        nombre = f"{random.choice(NOMBRES)} {random.choice(APELLIDOS)} {i}"
+        batch.append({
+            "nombre": nombre,
+            "telefono": f"+57300{i:07d}",
+            "email": f"contacto{i}@example.com",
+            "owner_id": user_id,
+        })
+        if len(batch) == 10000:
+            db.execute(insert(Contact), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Contact), batch)
+    db.commit()
+    return user_id
+
+def ilike_query(db, user_id, q):
+    return db.query(Contact).filter(
+        Contact.owner_id == user_id,
+        Contact.nombre.ilike(f"%{q}%") | Contact.email.ilike(f"%{q}%") | Contact.telefono.ilike(f"%{q}%")
+    )
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contacts", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user_id = seed(db, args.contacts)
+    start = time.perf_counter()
+    search.rebuild_index(db)
+    print(f"{args.contacts} contactos, índice construido en {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'q':<14}{'ilike count+page (ms)':>24}{'fts count+page (ms)':>22}")
+    for q in QUERIES:
+        def run_ilike():
+            query = ilike_query(db, user_id, q)
+            query.count()
+            query.limit(100).all()
+
+        def run_fts():
+            query = crud.query_contacts(db, user_id, q)
+            query.count()
+            query.limit(100).all()
+
+        print(f"{q:<14}{timed(run_ilike, args.repeat):>24.1f}{timed(run_fts, args.repeat):>22.1f}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
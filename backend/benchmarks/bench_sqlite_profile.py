@@ -0,0 +1,94 @@
+"""
+Benchmark de concurrencia: motor SQLite por defecto frente al perfil de database.py
+(WAL, synchronous=NORMAL, busy_timeout, cache, mmap, temp_store y pool).
+
+Varios hilos escriben contactos en transacciones cortas mientras otros leen
+el listado. Se cuentan operaciones completadas y errores "database is locked".
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_sqlite_profile.py --writers 8 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_unused.db'}")
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from app.database import configure_engine, engine_options
+from app.models_db import Base, Contact, User
+
+def build_engines(directory):
+    plain_url = f"sqlite:///{directory / 'plain.db'}"
+    tuned_url = f"sqlite:///{directory / 'tuned.db'}"
+    plain = create_engine(plain_url, connect_args={"check_same_thread": False})
+    tuned = configure_engine(create_engine(tuned_url, **engine_options(tuned_url)))
+    return {"por defecto": plain, "perfil": tuned}
+
+def run(engine, writers, readers, seconds):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"email": "bench@example.com", "username": "bench", "hashed_password": "x"}])
+
+    stats = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def bump(key):
+        with lock:
+            stats[key] += 1
+
+    def writer(n):
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(Contact), [{
+                        "nombre": f"Contacto {n}-{i}", "telefono": "+573001234567", "owner_id": 1
+                    }])
+                bump("writes")
+            except OperationalError:
+                bump("locked")
+            i += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(func.count()).select_from(Contact).where(Contact.owner_id == 1)).scalar()
+                    conn.execute(select(Contact).where(Contact.owner_id == 1).limit(100)).all()
+                bump("reads")
+            except OperationalError:
+                bump("locked")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp())
+    print(f"{'motor':<14}{'escrituras/s':>14}{'lecturas/s':>12}{'bloqueos':>10}")
+    for name, engine in build_engines(directory).items():
+        stats = run(engine, args.writers, args.readers, args.seconds)
+        print(f"{name:<14}{stats['writes'] / args.seconds:>14.0f}"
+              f"{stats['reads'] / args.seconds:>12.0f}{stats['locked']:>10}")
+
+if __name__ == "__main__":
+    main()
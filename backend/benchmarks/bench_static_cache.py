@@ -0,0 +1,97 @@
+"""
+Benchmark de caché de /uploads: bytes y peticiones de varias cargas de una
+página de la lista con un navegador simulado.
+
+Genera --contacts fotos con sus miniaturas y carga --loads veces una página
+que pide la miniatura sm de cada contacto y la foto original del primero.
+El navegador simulado guarda las respuestas: no pide lo que sigue fresco según
+max-age y revalida lo demás con If-None-Match. Se compara el StaticFiles plano
+(sin Cache-Control: se supone que el navegador revalida en cada carga) con
+ImageFiles (app/static.py).
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_static_cache.py --contacts 50 --loads 10
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_static.db'}")
+
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+from PIL import Image
+from app import images, static, storage
+
+ACCEPT = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+def seed(upload_dir: Path, total: int):
+    storage.UPLOAD_DIR = upload_dir
+    storage.TEMP_DIR = upload_dir / "temp"
+    images.THUMBNAIL_DIR = upload_dir / "thumbs"
+    fotos = []
+    for i in range(total):
+        buffer = io.BytesIO()
+        imagen = Image.new("RGB", (800, 600), (random.randrange(256), i % 256, 90))
+        imagen.putdata([(x % 256, (x // 7 + i) % 256, 90) for x in range(800 * 600)])
+        imagen.save(buffer, "JPEG", quality=85)
+        buffer.seek(0)
+        url = storage.save_file(buffer, ".jpg")
+        fotos.append((url, images.generate_variants(url)))
+    return fotos
+
+def page_urls(fotos):
+    return [variants["sm"]["url"] for _, variants in fotos] + [fotos[0][0]]
+
+def simulate(client: TestClient, urls, loads: int):
+    cache = {}
+    requests = transferred = 0
+    for _ in range(loads):
+        for url in urls:
+            entry = cache.get(url)
+            if entry and entry["fresh"]:
+                continue
+            headers = {"Accept": ACCEPT}
+            if entry:
+                headers["If-None-Match"] = entry["etag"]
+            response = client.get(url, headers=headers)
+            requests += 1
+            transferred += len(response.content)
+            max_age = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+            cache[url] = {
+                "etag": response.headers.get("etag"),
+                # Todas las cargas caen dentro de max-age
+                "fresh": bool(max_age) and int(max_age.group(1)) > 0,
+            }
+    return requests, transferred
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contacts", type=int, default=50)
+    parser.add_argument("--loads", type=int, default=10)
+    args = parser.parse_args()
+
+    upload_dir = Path(tempfile.mkdtemp())
+    fotos = seed(upload_dir, args.contacts)
+    urls = page_urls(fotos)
+
+    print(f"{args.loads} cargas de una página con {len(urls)} imágenes")
+    print(f"{'servidor':>12}{'peticiones':>12}{'KB':>10}")
+    for name, files in [
+        ("StaticFiles", StaticFiles(directory=upload_dir)),
+        ("ImageFiles", static.ImageFiles(directory=upload_dir)),
+    ]:
+        app = FastAPI()
+        app.mount("/uploads", files, name="uploads")
+        requests, transferred = simulate(TestClient(app), urls, args.loads)
+        print(f"{name:>12}{requests:>12}{transferred / 1024:>10.1f}")
+
+if __name__ == "__main__":
+    main()
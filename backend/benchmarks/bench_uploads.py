@@ -0,0 +1,116 @@
+"""
+Prueba de carga: subidas concurrentes de fotos grandes y latencia de /api/ping.
+
+Levanta uvicorn en una carpeta temporal (base de datos y uploads propios), crea
+un usuario y sube --requests fotos de --size-mb MB con --concurrency clientes a
+la vez mientras mide la latencia de /api/ping. Si la copia y el hash de la
+imagen bloquean el event loop, la latencia de ping crece con el tamaño.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_uploads.py --requests 40 --concurrency 8 --size-mb 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+async def wait_until_up(client):
+    for _ in range(100):
+        try:
+            await client.get("/api/ping")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("El servidor no respondió")
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        await wait_until_up(client)
+        credentials = {"email": "uploads@example.com", "username": "uploads", "password": "loadpass123"}
+        await client.post("/api/auth/signup", json=credentials)
+        login = await client.post("/api/auth/login", json={
+            "email": credentials["email"], "password": credentials["password"]
+        })
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(i)
+        size = int(args.size_mb * 1024 * 1024)
+        statuses = []
+
+        async def uploader():
+            while not queue.empty():
+                i = queue.get_nowait()
+                # Contenido distinto en cada subida para que no se deduplique
+                foto = PNG_SIGNATURE + os.urandom(size - len(PNG_SIGNATURE))
+                response = await client.post(
+                    "/api/contactos",
+                    data={"nombre": f"Foto {i}", "telefono": f"+57300{i:07d}"},
+                    files={"imagen": (f"foto{i}.png", foto, "image/png")},
+                    headers=headers
+                )
+                statuses.append(response.status_code)
+
+        ping_latencies = []
+        done = asyncio.Event()
+
+        async def pinger():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/ping")
+                ping_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        ping_task = asyncio.create_task(pinger())
+        start = time.perf_counter()
+        await asyncio.gather(*(uploader() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ping_task
+
+    ping_latencies.sort()
+    total_mb = args.requests * args.size_mb
+    print(f"{args.requests} subidas de {args.size_mb} MB con concurrencia {args.concurrency}: "
+          f"{elapsed:.2f}s ({total_mb / elapsed:.1f} MB/s); "
+          f"{statuses.count(201)} creadas, {len(statuses) - statuses.count(201)} rechazadas")
+    print(f"/api/ping durante la carga: p50={statistics.median(ping_latencies):.1f}ms "
+          f"p99={ping_latencies[int(len(ping_latencies) * 0.99) - 1]:.1f}ms "
+          f"({len(ping_latencies)} muestras)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    # Los archivos subidos quedan en la carpeta temporal, no en backend/uploads
+    workdir = Path(tempfile.mkdtemp())
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{workdir / 'bench_uploads.db'}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", str(BACKEND_DIR),
+         "--port", str(args.port), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import { Component, Input } from '@angular/core';
 import { CommonModule } from '@angular/common';
-import { Contacto, Review } from '../../models/contacto.model'; // Importar Review del modelo
+import { Contacto, Review, ReviewPage } from '../../models/contacto.model'; // Importar Review del modelo
 import { environment } from '../../../environments/environment';
 import { ReviewsModalComponent } from '../reviews-modal/reviews-modal.component';
 import { ContactService } from '../../services/contact.service';
@@ -18,24 +18,41 @@ export class ContactDetailsComponent {
   
   showReviews = false;
   reviews: Review[] = [];
+  reviewsCursor: string | null = null;
+  loadingReviews = false;
 
   constructor(private contactService: ContactService) {}
 
   onShowReviews() {
     if (this.contact?.id) {
-      this.contactService.getRatings(this.contact.id).subscribe({
-        next: (ratings: Review[]) => {
-          console.log('Reseñas cargadas:', ratings); // Debug
-          this.reviews = ratings;
-          this.showReviews = true;
-        },
-        error: (error) => {
-          console.error('Error al cargar las reseñas:', error);
-        }
-      });
+      this.reviews = [];
+      this.reviewsCursor = null;
+      this.loadReviews(() => this.showReviews = true);
     }
   }
 
+  onLoadMoreReviews() {
+    if (this.reviewsCursor && !this.loadingReviews) {
+      this.loadReviews();
+    }
+  }
+
+  private loadReviews(onLoaded?: () => void) {
+    this.loadingReviews = true;
+    this.contactService.getRatings(this.contact.id!, this.reviewsCursor).subscribe({
+      next: (page: ReviewPage) => {
+        this.reviews = [...this.reviews, ...page.data];
+        this.reviewsCursor = page.next_cursor;
+        this.loadingReviews = false;
+        onLoaded?.();
+      },
+      error: (error) => {
+        this.loadingReviews = false;
+        console.error('Error al cargar las reseñas:', error);
+      }
+    });
+  }
+
   onCloseReviews() {
     this.showReviews = false;
   }
@@ -47,6 +64,15 @@ export class ContactDetailsComponent {
       `${environment.apiUrl.replace('/api/contactos', '')}${imageUrl}`;
   }
 
+  // srcset con las miniaturas mediana y grande; el navegador elige según la densidad
+  getSrcset(format: 'url' | 'webp'): string {
+    const thumbnails = this.contact?.thumbnails || {};
+    return ['md', 'lg']
+      .filter(size => thumbnails[size])
+      .map(size => `${this.getImageUrl(thumbnails[size][format])} ${thumbnails[size].width}w`)
+      .join(', ');
+  }
+
   onImageError(event: any) {
     event.target.src = 'assets/images/default-avatar.png';
   }
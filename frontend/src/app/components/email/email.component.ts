@@ -85,7 +85,7 @@ export class EmailComponent implements OnInit {
       this.emailService.sendEmail(formData).subscribe({
         next: (response) => {
           this.loading = false;
-          this.successMessage = 'Correo enviado exitosamente';
+          this.successMessage = 'Correo en cola de envío';
           this.emailForm.reset();
           this.selectedRecipients = [];
           this.selectedFiles = [];
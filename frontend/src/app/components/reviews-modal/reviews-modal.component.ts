@@ -23,7 +23,10 @@ export class ReviewsModalComponent implements OnInit {
       this.processReviews(value);
     }
   }
+  @Input() hasMore = false;
+  @Input() loading = false;
   @Output() close = new EventEmitter<void>();
+  @Output() loadMore = new EventEmitter<void>();
 
   groupedReviews: GroupedRating[] = [];
 
@@ -64,6 +67,10 @@ export class ReviewsModalComponent implements OnInit {
     this.groupedReviews.sort((a, b) => b.fecha.getTime() - a.fecha.getTime());
   }
 
+  onLoadMore() {
+    this.loadMore.emit();
+  }
+
   onClose() {
     this.close.emit();
   }
@@ -1,5 +1,6 @@
-import { HttpInterceptorFn } from '@angular/common/http';
+import { HttpErrorResponse, HttpInterceptorFn } from '@angular/common/http';
 import { inject } from '@angular/core';
+import { catchError, switchMap, throwError } from 'rxjs';
 import { AuthService } from '../services/auth.service';
 
 export const authInterceptor: HttpInterceptorFn = (req, next) => {
@@ -14,5 +15,28 @@ export const authInterceptor: HttpInterceptorFn = (req, next) => {
     });
   }
 
-  return next(req);
+  // Las rutas de autenticación no se reintentan
+  if (req.url.includes('/auth/')) {
+    return next(req);
+  }
+
+  return next(req).pipe(
+    catchError((error: HttpErrorResponse) => {
+      if (error.status !== 401) {
+        return throwError(() => error);
+      }
+      // Access token vencido: renovar con el refresh token y reintentar una vez
+      return authService.refresh().pipe(
+        catchError(() => {
+          authService.logout();
+          return throwError(() => error);
+        }),
+        switchMap(response => next(req.clone({
+          setHeaders: {
+            Authorization: `Bearer ${response.access_token}`
+          }
+        })))
+      );
+    })
+  );
 };
@@ -21,10 +21,19 @@ export interface Contacto {
     detalle_tipo?: string;
     detalle_tipo_otro?: string;
     imagen?: string;
+    thumbnails?: Record<string, Thumbnail> | null;  // sm, md, lg (se generan en segundo plano)
     averageRating?: number;
     average_rating?: number;
 }
 
+// Miniatura de la foto en el formato original y en WebP
+export interface Thumbnail {
+    url: string;
+    webp: string;
+    width: number;
+    height: number;
+}
+
 export interface Rating {
     id?: number;
     contactId: number;
@@ -44,6 +53,13 @@ export interface Review {
     fecha: Date;
 }
 
+// Página del historial de calificaciones
+export interface ReviewPage {
+    limit: number;
+    next_cursor: string | null;
+    data: Review[];
+}
+
 export interface FilterCriteria {
     searchTerm: string;
     tipoContacto: TipoContacto | '';
@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { BehaviorSubject, Observable, tap } from 'rxjs';
+import { BehaviorSubject, Observable, finalize, shareReplay, tap, throwError } from 'rxjs';
 import { Router } from '@angular/router';
 import { environment } from '../../environments/environment';
 
@@ -8,6 +8,7 @@ interface AuthResponse {
   access_token: string;
   token_type: string;
   username: string;
+  refresh_token?: string;
 }
 
 interface UserData {
@@ -22,6 +23,8 @@ export class AuthService {
   private authUrl = environment.authUrl;
   private userSubject = new BehaviorSubject<UserData | null>(null);
   user$ = this.userSubject.asObservable();
+  // Renovación en curso; las peticiones que reciban 401 a la vez la comparten
+  private refreshInProgress: Observable<AuthResponse> | null = null;
 
   constructor(private http: HttpClient, private router: Router) {}
 
@@ -32,18 +35,41 @@ export class AuthService {
 
   login(credentials: any): Observable<AuthResponse> {
     return this.http.post<AuthResponse>(`${this.authUrl}/login`, credentials).pipe(
-      tap(response => {
-        const userData: UserData = {
-          token: response.access_token,
-          username: response.username
-        };
-        localStorage.setItem('token', response.access_token);
-        localStorage.setItem('user', JSON.stringify(userData));
-        this.userSubject.next(userData);
-      })
+      tap(response => this.storeSession(response))
     );
   }
 
+  // Renueva el access token con el refresh token (rotativo) sin volver a pedir la contraseña
+  refresh(): Observable<AuthResponse> {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+      return throwError(() => new Error('No hay refresh token'));
+    }
+    if (!this.refreshInProgress) {
+      this.refreshInProgress = this.http.post<AuthResponse>(
+        `${this.authUrl}/refresh`, { refresh_token: refreshToken }
+      ).pipe(
+        tap(response => this.storeSession(response)),
+        finalize(() => this.refreshInProgress = null),
+        shareReplay(1)
+      );
+    }
+    return this.refreshInProgress;
+  }
+
+  private storeSession(response: AuthResponse) {
+    const userData: UserData = {
+      token: response.access_token,
+      username: response.username
+    };
+    localStorage.setItem('token', response.access_token);
+    localStorage.setItem('user', JSON.stringify(userData));
+    if (response.refresh_token) {
+      localStorage.setItem('refresh_token', response.refresh_token);
+    }
+    this.userSubject.next(userData);
+  }
+
   checkAndRestoreSession() {
     const token = localStorage.getItem('token');
     const userData = localStorage.getItem('user');
@@ -59,8 +85,13 @@ export class AuthService {
       const expirationDate = new Date(tokenData.exp * 1000);
 
       if (expirationDate < new Date()) {
-        this.clearSession();
-        this.router.navigate(['/login']);
+        // El access token venció: se intenta renovar antes de pedir login
+        this.refresh().subscribe({
+          error: () => {
+            this.clearSession();
+            this.router.navigate(['/login']);
+          }
+        });
       } else {
         // Restaurar la sesión si el token es válido
         this.userSubject.next(JSON.parse(userData));
@@ -77,6 +108,10 @@ export class AuthService {
   }
 
   logout() {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      this.http.post(`${this.authUrl}/logout`, { refresh_token: refreshToken }).subscribe({ error: () => {} });
+    }
     localStorage.clear();
     this.userSubject.next(null);
     this.router.navigate(['/login']);
@@ -85,6 +120,8 @@ export class AuthService {
   isLoggedIn(): boolean {
     const token = localStorage.getItem('token');
     if (!token) return false;
+    // Con refresh token la sesión sigue viva aunque el access token haya vencido
+    if (localStorage.getItem('refresh_token')) return true;
 
     try {
       const tokenData = JSON.parse(atob(token.split('.')[1]));
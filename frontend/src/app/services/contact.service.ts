@@ -2,7 +2,7 @@ import { Injectable } from '@angular/core';
 import { HttpClient, HttpErrorResponse } from '@angular/common/http';
 import { Observable, throwError, from } from 'rxjs';
 import { catchError, map, concatMap } from 'rxjs/operators';
-import { Contacto, Rating, Review } from '../models/contacto.model';
+import { Contacto, Rating, Review, ReviewPage } from '../models/contacto.model';
 import { environment } from '../../environments/environment';
 
 type ErrorType = 'defaultError' | 'validation' | 'notFound' | 'unauthorized' | 'serverError';
@@ -205,8 +205,13 @@ export class ContactService {
     );
   }
 
-  getRatings(contactId: number): Observable<Review[]> {
-    return this.http.get<Review[]>(`${this.API}/${contactId}/ratings`);
+  // Historial paginado por cursor; pasar el next_cursor de la página anterior
+  getRatings(contactId: number, cursor?: string | null, limit = 50): Observable<ReviewPage> {
+    const params: Record<string, string> = { limit: String(limit) };
+    if (cursor) {
+      params['cursor'] = cursor;
+    }
+    return this.http.get<ReviewPage>(`${this.API}/${contactId}/ratings`, { params });
   }
 
   importFromCSV(file: File): Observable<any> {